@@ -160,6 +160,28 @@ def main():
                         type=str,
                         default='USD',
                         help='Define the priority currency. Use the ISO4217 for currency (`USD`, `EUR`). Default: `USD`.')
+    parser.add_argument('--processes',
+                        nargs='?',
+                        type=int,
+                        default=None,
+                        metavar='NUM',
+                        help='Maximum number of processes used to read multiple BOM files and group the parts of big designs. Default: number of CPUs.')
+    parser.add_argument('--no_cache',
+                        action='store_true',
+                        help='Do not use the cache of the BOM files read in previous runs.')
+    parser.add_argument('--incremental',
+                        action='store_true',
+                        help='Reuse the groups and the distributors data of the previous run with the same output file, scraping only the changed parts and the ones scraped more than a day ago.')
+    parser.add_argument('--part_details',
+                        choices=['comments', 'sheet', 'none'],
+                        default='comments',
+                        help='Where to write the price breaks and extra distributor information of each part: cell comments, a separated "Price Breaks" worksheet or nowhere. The last two are faster and smaller on big BOMs. Default: `comments`.')
+    parser.add_argument('--format',
+                        nargs='+',
+                        choices=['xlsx', 'ods', 'jsonl', 'csv', 'parquet'],
+                        default=['xlsx'],
+                        metavar='FORMAT',
+                        help='Output formats: `xlsx` or `ods` (cost spreadsheet), `jsonl` (JSON Lines), `csv` or `parquet` reports, written with the output file name and their extension. Default: `xlsx`.')
     parser.add_argument('--gui',
                         nargs='+',
                         type=str,
@@ -302,7 +324,9 @@ def main():
         user_fields=args.fields, ignore_fields=args.ignore_fields,
         group_fields=args.group_fields, translate_fields=args.translate_fields,
         variant=args.variant,
-        dist_list=dist_list, currency=args.currency)
+        dist_list=dist_list, currency=args.currency, num_processes=args.processes, use_cache=not args.no_cache,
+        incremental=args.incremental, part_details=args.part_details,
+        out_formats=args.format)
     #except Exception as e:
     #    sys.exit(e)
 
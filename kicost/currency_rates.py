@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+# MIT license
+#
+# Copyright (C) 2019 by XESS Corporation / Hildo Guillardi Júnior
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+# Author information.
+__author__ = 'Hildo Guillardi Junior'
+__webpage__ = 'https://github.com/hildogjr/'
+__company__ = 'University of Campinas - Brazil'
+
+
+# Currency conversion rates of the European Central Bank (ECB), loaded only
+# when a price have to be converted. The rates are taken, in this order, from:
+#  1. The file pinned by the `KICOST_CURRENCY_RATES` environment variable;
+#  2. The local cache, while not older than `RATES_REFRESH_TIME`;
+#  3. The ECB site, saved in the local cache;
+#  4. The old local cache, or the table distributed with the `CurrencyConverter`
+#     package, when the download fails (these are not cached).
+
+# Libraries.
+import os
+import io
+import time
+import zipfile
+import pkgutil # Read the rates of the `CurrencyConverter` package.
+import requests
+from .global_vars import logger, DEBUG_OVERVIEW, DEBUG_DETAILED
+from .edas.bom_cache import bom_cache_dir, cache_file_load, cache_file_save
+
+__all__ = ['currency_convert', 'get_rates']
+
+ECB_URL = 'https://www.ecb.europa.eu/stats/eurofxref/eurofxref.zip' # Rates of the last day.
+RATES_CACHE_FILE = 'currency_rates.pkl'
+RATES_REFRESH_TIME = 24 * 3600 # Seconds, the ECB publish the rates once a day.
+RATES_DOWNLOAD_TIMEOUT = 5 # Seconds.
+# Rates files of the `CurrencyConverter` package, the newest first (the
+# last day one is not distributed by the old versions).
+PACKAGE_RATES_FILES = ['eurofxref.csv', 'eurofxref-hist.zip']
+
+RATES = None # `dict()` of the rates by currency, in EUR, loaded by `get_rates()`.
+
+
+def currency_convert(amount, currency, new_currency):
+    ''' @brief Convert an amount of money to another currency.
+
+    The rates are not loaded when the currencies are the same.
+    @param amount Value in `currency`.
+    @param currency `str()` ISO 4217 code of the currency of `amount`.
+    @param new_currency `str()` ISO 4217 code of the currency to convert.
+    @return `float()` value in `new_currency`.
+    '''
+    if currency == new_currency:
+        return float(amount)
+    rates = get_rates()
+    for c in (currency, new_currency):
+        if c not in rates:
+            raise ValueError('{} is not a supported currency'.format(c))
+    return amount / rates[currency] * rates[new_currency]
+
+
+def get_rates():
+    ''' @brief Rates of the currencies, loaded at the first use.
+    @return `dict()` of the value of one EUR in each currency.
+    '''
+    global RATES
+    if RATES is None:
+        pinned_file = os.environ.get('KICOST_CURRENCY_RATES')
+        if pinned_file:
+            logger.log(DEBUG_OVERVIEW, 'Using the currency rates of {}...'.format(pinned_file))
+            with open(pinned_file, 'rb') as f:
+                RATES = parse_rates(f.read())
+        else:
+            RATES = cached_rates()
+    return RATES
+
+
+def cached_rates():
+    ''' @brief Rates of the local cache, downloaded again when too old.
+
+    Only the downloaded rates are cached, so the download is tried again
+    at the next run when it fails.
+    @return `dict()` of the rates.
+    '''
+    file_name = os.path.join(bom_cache_dir(), RATES_CACHE_FILE)
+    cache = cache_file_load(file_name)
+    if cache is not None and time.time() - cache['time'] < RATES_REFRESH_TIME:
+        return cache['rates']
+    try:
+        logger.log(DEBUG_OVERVIEW, 'Downloading the currency rates from {}...'.format(ECB_URL))
+        response = requests.get(ECB_URL, timeout=RATES_DOWNLOAD_TIMEOUT)
+        response.raise_for_status()
+        new_rates = parse_rates(response.content)
+    except Exception as e:
+        logger.log(DEBUG_OVERVIEW, 'Could not download the currency rates: {}'.format(e))
+        if cache is not None:
+            return cache['rates'] # Old, but newer than the package ones.
+        return package_rates()
+    if cache_file_save(file_name, {'time': time.time(), 'rates': new_rates}):
+        logger.log(DEBUG_DETAILED, 'Currency rates cached at {}.'.format(file_name))
+    return new_rates
+
+
+def package_rates():
+    ''' @brief Rates distributed with the `CurrencyConverter` package.
+    @return `dict()` of the rates, just EUR if no table is found.
+    '''
+    for rates_file in PACKAGE_RATES_FILES:
+        try:
+            data = pkgutil.get_data('currency_converter', rates_file)
+        except (ImportError, IOError, OSError):
+            data = None
+        if data: # `None` if the package loader can't read files.
+            return parse_rates(data)
+    logger.warning('No currency rates available to convert the prices.')
+    return {'EUR': 1.0}
+
+
+def parse_rates(data):
+    ''' @brief Parse the ECB rates file.
+
+    The ECB CSV, or the ZIP with it, as downloaded from their site. On
+    historical files, the first date is used (the newest).
+    @param data `bytes()` of the file.
+    @return `dict()` of the value of one EUR in each currency.
+    '''
+    if data[:2] == b'PK':
+        with zipfile.ZipFile(io.BytesIO(data)) as z:
+            data = z.read(z.namelist()[0])
+    lines = data.decode('utf-8').splitlines()
+    currencies = [c.strip() for c in lines[0].split(',')[1:]]
+    values = [v.strip() for v in lines[1].split(',')[1:]]
+    rates = {'EUR': 1.0}
+    for c, v in zip(currencies, values):
+        if c and v not in ('', 'N/A'):
+            rates[c] = float(v)
+    return rates
@@ -37,7 +37,7 @@ from collections import Counter
 from .global_vars import * # Debug information, `distributor_dict` and `SEPRTR`.
 
 # Distributors definitions.
-from .distributor import distributor_class
+from .distributor import distributor_class, DistributorOffer
 
 MAX_PARTS_PER_QUERY = 20 # Maximum number of parts in a single query.
 
@@ -252,6 +252,9 @@ class api_partinfo_kitspace(distributor_class):
                         # price/qty info to the parts list if its one of the accepted distributors.
                         dist = dist_xlate.get(offer['sku']['vendor'], '')
                         if dist in distributors:
+                            if not dist in part.offers:
+                                part.offers[dist] = DistributorOffer()
+                            dist_offer = part.offers[dist]
 
                             # Get pricing information from this distributor.
                             try:
@@ -265,15 +268,15 @@ class api_partinfo_kitspace(distributor_class):
                                 prices = None
                                 if currency in dist_currency and offer['prices'][currency]:
                                     prices = offer['prices'][currency]
-                                    part.currency[dist] = currency
+                                    dist_offer.currency = currency
                                 elif DEFAULT_CURRENCY in dist_currency and offer['prices'][DEFAULT_CURRENCY]:# and DEFAULT_CURRENCY!=currency:
                                     prices = offer['prices'][DEFAULT_CURRENCY]
-                                    part.currency[dist] = DEFAULT_CURRENCY
+                                    dist_offer.currency = DEFAULT_CURRENCY
                                 else:
                                     for dist_c in dist_currency:
                                         if offer['prices'][dist_c]:
                                             prices = offer['prices'][dist_c]
-                                            part.currency[dist] = dist_c
+                                            dist_offer.currency = dist_c
                                             break
                                 
                                 if prices:
@@ -282,9 +285,7 @@ class api_partinfo_kitspace(distributor_class):
                                                   }
                                 # Combine price lists for multiple offers from the same distributor
                                 # to build a complete list of cut-tape and reeled components.
-                                if not dist in part.price_tiers:
-                                    part.price_tiers[dist] = {}
-                                part.price_tiers[dist].update(price_tiers)
+                                dist_offer.price_tiers.update(price_tiers)
                             except TypeError:
                                 pass  # Price list is probably missing so leave empty default dict in place.
 
@@ -301,14 +302,14 @@ class api_partinfo_kitspace(distributor_class):
 
                             # Use the qty increment to select the part SKU, web page, and available quantity.
                             # Do this if this is the first part offer from this dist.
-                            part.part_num[dist] = offer.get('sku', '').get('part', '')
-                            part.url[dist] = offer.get('product_url', '') # Page to purchase.
-                            part.qty_avail[dist] = offer.get('in_stock_quantity', None) # In stock.
-                            part.moq[dist] = offer.get('moq', None) # Minimum order qty.s
-                            part.qty_increment[dist] = part_qty_increment
+                            dist_offer.part_num = offer.get('sku', '').get('part', '')
+                            dist_offer.url = offer.get('product_url', '') # Page to purchase.
+                            dist_offer.qty_avail = offer.get('in_stock_quantity', None) # In stock.
+                            dist_offer.moq = offer.get('moq', None) # Minimum order qty.s
+                            dist_offer.qty_increment = part_qty_increment
 
                             # Don't bother with any extra info from the distributor.
-                            part.info_dist[dist] = {}
+                            dist_offer.info_dist = {}
 
         # Get the valid distributor names used by them part catalog
         # that may be index by PartInfo. This is used to remove the
@@ -25,7 +25,7 @@ import copy, re
 import logging
 
 # Distributors definitions.
-from .distributor import distributor_class
+from .distributor import distributor_class, DistributorOffer
 from .global_vars import *
 
 __all__ = ['dist_local_template']
@@ -82,15 +82,8 @@ class dist_local_template(distributor_class):
 
         # Set part info to default blank values for all the distributors.
         for part in parts:
-            # These bellow variable are all the data the each distributor/local API/scrap module needs to fill.
-            part.part_num = {dist: '' for dist in distributors} # Ditributor catalogue number.
-            part.url = {dist: '' for dist in distributors} # Purchase distributor URL for the spefic part.
-            part.price_tiers = {dist: {} for dist in distributors} # Price break tiers; [[qty1, price1][qty2, price2]...]
-            part.qty_avail = {dist: None for dist in distributors} # Available quantity.
-            part.qty_increment = {dist: None for dist in distributors}
-            part.info_dist = {dist: {} for dist in distributors}
-            part.currency = {dist: DEFAULT_CURRENCY for dist in distributors} # Default currency.
-            part.moq = {dist: 1 for dist in distributors} # Minimum order quantity allowd by the distributor.
+            # All the data the each distributor/local API/scrap module needs to fill.
+            part.offers = {dist: DistributorOffer() for dist in distributors}
 
         # Loop through the parts looking for those sourced by local distributors
         # that won't be found online. Place any user-added info for these parts
@@ -108,16 +101,17 @@ class dist_local_template(distributor_class):
                     continue
 
                 def make_random_catalog_number(p):
+                    from ..edas.tools import group_key # Here to avoid a circular import.
                     FIELDS_MANFCAT = ([d + '#' for d in distributor_dict] + ['manf#'])
                     FIELDS_NOT_HASH = (['manf#_qty', 'manf'] + FIELDS_MANFCAT + [d + '#_qty' for d in distributor_dict])
                     #TODO unify the `FIELDS_NOT_HASH` configuration (used also in `edas/tools.py`).
                     hash_fields = {k: p.fields[k] for k in p.fields if k not in FIELDS_NOT_HASH}
                     hash_fields['dist'] = dist
-                    return '#{0:08X}'.format(abs(hash(tuple(sorted(hash_fields.items())))))
+                    return '#' + group_key(hash_fields.items())[:16].upper()
 
                 cat_num = cat_num or pn or make_random_catalog_number(p)
                 p.fields[dist + ':cat#'] = cat_num  # Store generated cat#.
-                p.part_num[dist] = cat_num
+                p.offers[dist].part_num = cat_num
 
                 try:
                     url_parts = list(urlsplit(link))
@@ -127,7 +121,7 @@ class dist_local_template(distributor_class):
                 except Exception:
                     # This happens when no part URL is found.
                     logger.log(DEBUG_OBSESSIVE, 'No part URL found to local \'{}\' distributor!'.format(dist))
-                p.url[dist] = link
+                p.offers[dist].url = link
 
                 price_tiers = {}
                 try:
@@ -139,12 +133,12 @@ class dist_local_template(distributor_class):
                     for qty_price in pricing.split(';'):
                         qty, price = qty_price.split(SEPRTR)
                         if local_currency:
-                            p.currency[dist] = local_currency
+                            p.offers[dist].currency = local_currency
                         price_tiers[int(qty)] = float(price)
                 except AttributeError:
                     # This happens when no pricing info is found.
                     logger.log(DEBUG_OBSESSIVE, 'No pricing information found to local \'{}\' distributor!'.format(dist))
-                p.price_tiers[dist] = price_tiers
+                p.offers[dist].price_tiers = price_tiers
 
         # Remove the local distributor template so it won't be processed later on.
         # It has served its purpose.
@@ -28,6 +28,7 @@ __webpage__ = 'https://github.com/mmmaisel/'
 
 # Libraries.
 import sys, time, os, re
+import copy
 import logging
 
 #from . import fake_browser
@@ -39,10 +40,14 @@ from ..edas.tools import order_refs # To better print the warnings about the par
 
 from .global_vars import *
 
-from currency_converter import CurrencyConverter
 
+__all__ = ['distributor_class', 'DistributorOffer', 'pricing_key', 'pricing_save', 'pricing_restore',
+           'pricing_expired']
 
-__all__ = ['distributor_class']
+# Part attributes filled by the web distributors modules, besides the offers.
+PART_INFO_ATTRIBUTES = ['datasheet', 'lifecycle']
+
+PRICING_MAX_AGE = 24 * 3600 # Seconds the data scraped on the web is reused, prices and stocks change.
 
 
 class distributor_class(object):
@@ -75,3 +80,81 @@ class distributor_class(object):
     def query_part_info():
         ''' Get the parts info of one distributor class.'''
         raise NotImplementedError()
+
+
+class DistributorOffer(object):
+    ''' @brief Data of a part in one distributor, filled by the distributors modules.
+
+    `part_num` Distributor catalogue number.
+    `url` Purchase distributor URL of the part.
+    `price_tiers` `dict()` of the price breaks {qty: price}.
+    `qty_avail` Available quantity, `None` if not stocked.
+    `qty_increment` Quantity increment between the price breaks.
+    `info_dist` `dict()` of extra information given by the distributor.
+    `currency` Currency of the prices in ISO4217.
+    `moq` Minimum order quantity allowed by the distributor.
+    '''
+    __slots__ = ('part_num', 'url', 'price_tiers', 'qty_avail', 'qty_increment', 'info_dist', 'currency', 'moq')
+
+    def __init__(self):
+        self.part_num = ''
+        self.url = ''
+        self.price_tiers = {}
+        self.qty_avail = None
+        self.qty_increment = None
+        self.info_dist = {}
+        self.currency = DEFAULT_CURRENCY
+        self.moq = 1
+
+    def __repr__(self):
+        return 'DistributorOffer({})'.format(', '.join('{}={!r}'.format(a, getattr(self, a)) for a in self.__slots__))
+
+
+def web_distributors(distributors):
+    ''' @brief Names of the distributors scraped on the web.'''
+    return sorted(d for d in distributors if distributors[d]['type'] == 'web')
+
+
+def pricing_key(part, distributors):
+    ''' @brief Key of the data scraped on the web for a part.
+
+    The web distributors modules query the parts by their manufacture
+    and distributors catalogue codes, so parts with the same codes get
+    the same data.
+    @param part Part group.
+    @param distributors `dict()` of the distributors.
+    @return `tuple()` of the codes.
+    '''
+    return tuple([part.fields.get('manf#')] + [part.fields.get(d + '#') for d in web_distributors(distributors)])
+
+
+def pricing_save(part, distributors):
+    ''' @brief Data scraped on the web for a part, to be reused by `pricing_restore()`.
+    @param part Part group, after the query of the distributors modules.
+    @param distributors `dict()` of the distributors.
+    @return `dict()` of the part attributes and the 'time' they were scraped.
+    '''
+    pricing = {a: getattr(part, a) for a in PART_INFO_ATTRIBUTES}
+    pricing['offers'] = {d: part.offers[d] for d in web_distributors(distributors) if d in part.offers}
+    pricing['time'] = time.time()
+    return pricing
+
+
+def pricing_expired(pricing, max_age=PRICING_MAX_AGE):
+    ''' @brief Check if the data of `pricing_save()` is too old to be reused.
+    @param pricing `dict()` from `pricing_save()`.
+    @param max_age Maximum age in seconds.
+    @return `True` if the part have to be queried again.
+    '''
+    return time.time() - pricing.get('time', 0) > max_age
+
+
+def pricing_restore(part, pricing):
+    ''' @brief Fill a part with the data of `pricing_save()`, instead of query it again.
+    @param part Part group, with the default distributors data already set.
+    The offers are copied, so the parts with the same codes don't share them.
+    @param pricing `dict()` from `pricing_save()` of a part with the same `pricing_key()`.
+    '''
+    for a in PART_INFO_ATTRIBUTES:
+        setattr(part, a, pricing[a])
+    part.offers.update(copy.deepcopy(pricing['offers']))
@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+# MIT license
+#
+# Copyright (C) 2019 by XESS Corporation / Hildo Guillardi Júnior
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+# Author information.
+__author__ = 'Hildo Guillardi Junior'
+__webpage__ = 'https://github.com/hildogjr/'
+__company__ = 'University of Campinas - Brazil'
+
+# Libraries.
+import sys, os
+import hashlib # Hash of the BOM file content and read options.
+import tempfile # Write the cache entries atomically.
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+from ..global_vars import logger, DEBUG_OVERVIEW, DEBUG_DETAILED
+from ..distributors.global_vars import distributor_dict
+from .tools import field_name_translations
+from .. import __version__
+
+__all__ = ['bom_cache_dir', 'bom_cache_key', 'bom_cache_load', 'bom_cache_save',
+           'state_load', 'state_save']
+
+BOM_CACHE_MAX_FILES = 64 # Maximum number of parsed BOMs kept, the oldest are removed.
+BOM_CACHE_FORMAT = 2 # Change when the parsed BOM content change, so old entries are not used.
+BOM_CACHE_EXT = '.pkl'
+STATE_EXT = '.state' # State of the last run of each output file, used by the incremental mode.
+HASH_BLOCK_SIZE = 1 << 20 # Read the BOM file in blocks of 1MB to hash it.
+
+
+def bom_cache_dir():
+    ''' @brief Directory of the parsed BOM cache.
+
+    Use the `KICOST_CACHE_DIR` environment variable if defined, or the
+    user cache directory of the OS.
+    @return Path `str()` of the directory (may not exist yet).
+    '''
+    cache_dir = os.environ.get('KICOST_CACHE_DIR')
+    if cache_dir:
+        return cache_dir
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or os.environ.get('APPDATA') or os.path.expanduser('~')
+    elif sys.platform == 'darwin':
+        base = os.path.expanduser(os.path.join('~', 'Library', 'Caches'))
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser(os.path.join('~', '.cache'))
+    return os.path.join(base, 'kicost', 'bom')
+
+
+def bom_cache_key(in_file, eda_name, ignore_fields, variant):
+    ''' @brief Key of a parsed BOM in the cache.
+
+    The key is the hash of the file content plus every option that change
+    the result of `get_part_groups()` + `subpartqty_split()`: the EDA
+    module, fields ignored, variant, field name translations and the
+    distributors (used to identify the catalogue number fields).
+    The path and modification time of the file are also part of the key,
+    because some EDA modules take the title and date of the project
+    information from them.
+    @param in_file `str()` with the BOM file name.
+    @param eda_name `str()` of the EDA module used to read the file.
+    @param ignore_fields `list()` of the fields to ignore.
+    @param variant `str()` regular expression of the variant.
+    @return `str()` hexadecimal key.
+    '''
+    h = hashlib.sha256()
+    with open(in_file, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            h.update(block)
+    options = (__version__, BOM_CACHE_FORMAT, sys.version_info[0],
+               os.path.abspath(in_file), os.path.getmtime(in_file), eda_name,
+               sorted(ignore_fields or []), variant,
+               sorted(field_name_translations.items()),
+               sorted(distributor_dict.keys()))
+    h.update(repr(options).encode('utf-8'))
+    return h.hexdigest()
+
+
+def bom_cache_load(key):
+    ''' @brief Load a parsed BOM from the cache.
+    @param key `str()` from `bom_cache_key()`.
+    @return (parts, prj_info) or `None` if not cached.
+    '''
+    file_name = os.path.join(bom_cache_dir(), key + BOM_CACHE_EXT)
+    bom = cache_file_load(file_name)
+    if bom is not None:
+        logger.log(DEBUG_OVERVIEW, 'Using the cached BOM {}...'.format(file_name))
+    return bom
+
+
+def bom_cache_save(key, bom):
+    ''' @brief Save a parsed BOM into the cache.
+
+    Failures are just logged, the cache is never needed to run KiCost.
+    @param key `str()` from `bom_cache_key()`.
+    @param bom (parts, prj_info) to save.
+    '''
+    cache_dir = bom_cache_dir()
+    file_name = os.path.join(cache_dir, key + BOM_CACHE_EXT)
+    if cache_file_save(file_name, bom):
+        logger.log(DEBUG_DETAILED, 'BOM cached at {}.'.format(file_name))
+        bom_cache_prune(cache_dir)
+
+
+def bom_cache_prune(cache_dir, max_files=BOM_CACHE_MAX_FILES):
+    ''' @brief Remove the least recently used entries of the cache.
+    @param cache_dir `str()` path of the cache.
+    @param max_files `int()` number of entries to keep.
+    '''
+    entries = [os.path.join(cache_dir, f) for f in os.listdir(cache_dir) if f.endswith(BOM_CACHE_EXT)]
+    if len(entries) <= max_files:
+        return
+    entries.sort(key=os.path.getmtime)
+    for f in entries[:-max_files]:
+        try:
+            os.remove(f)
+        except OSError:
+            pass
+
+
+def state_file_name(out_filename):
+    ''' @brief File of the state saved for an output spreadsheet.
+    @param out_filename `str()` name of the output spreadsheet.
+    @return Path `str()` of the state file.
+    '''
+    name = os.path.abspath(out_filename).encode('utf-8')
+    return os.path.join(bom_cache_dir(), 'state-' + hashlib.sha256(name).hexdigest()[:32] + STATE_EXT)
+
+
+def state_load(out_filename):
+    ''' @brief Load the state of the last run that created an output spreadsheet.
+    @param out_filename `str()` name of the output spreadsheet.
+    @return The saved state or `None` if there is none.
+    '''
+    file_name = state_file_name(out_filename)
+    state = cache_file_load(file_name)
+    if state is not None:
+        logger.log(DEBUG_OVERVIEW, 'Using the state of the last run {}...'.format(file_name))
+    return state
+
+
+def state_save(out_filename, state):
+    ''' @brief Save the state of the run that created an output spreadsheet.
+
+    One state by output file is kept, overwritten at each run.
+    @param out_filename `str()` name of the output spreadsheet.
+    @param state Any picklable object.
+    '''
+    file_name = state_file_name(out_filename)
+    if cache_file_save(file_name, state):
+        logger.log(DEBUG_DETAILED, 'State saved at {}.'.format(file_name))
+
+
+def cache_file_load(file_name):
+    ''' @brief Load a pickled cache file.
+    @param file_name `str()` path of the file.
+    @return The object saved or `None` if not possible to load it.
+    '''
+    try:
+        with open(file_name, 'rb') as f:
+            data = pickle.load(f)
+    except (IOError, OSError):
+        return None
+    except Exception as e:
+        # Corrupted or incompatible entry, do the work again.
+        logger.log(DEBUG_OVERVIEW, 'Ignoring invalid cache entry {}: {}'.format(file_name, e))
+        return None
+    try:
+        os.utime(file_name, None) # Mark as recently used.
+    except OSError:
+        pass
+    return data
+
+
+def cache_file_save(file_name, data):
+    ''' @brief Save a pickled cache file.
+
+    Failures are just logged, the cache is never needed to run KiCost.
+    @param file_name `str()` path of the file.
+    @param data Any picklable object.
+    @return `True` if saved.
+    '''
+    try:
+        cache_dir = os.path.dirname(file_name)
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        # Write in a temporary file and rename, so a concurrent run
+        # never load a partial entry.
+        fd, temp_name = tempfile.mkstemp(suffix='.tmp', dir=cache_dir)
+    except Exception as e:
+        logger.log(DEBUG_OVERVIEW, 'Could not save the cache file {}: {}'.format(file_name, e))
+        return False
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(data, f, pickle.HIGHEST_PROTOCOL)
+        if os.path.exists(file_name):
+            os.remove(file_name) # `rename()` doesn't overwrite on Windows.
+        os.rename(temp_name, file_name)
+        return True
+    except Exception as e:
+        logger.log(DEBUG_OVERVIEW, 'Could not save the cache file {}: {}'.format(file_name, e))
+        try:
+            os.remove(temp_name) # Don't leave partial entries behind.
+        except OSError:
+            pass
+        return False
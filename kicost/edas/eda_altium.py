@@ -29,16 +29,14 @@ __company__ = 'University of Campinas - Brazil'
 
 # Libraries.
 import sys, os, time
-if sys.version_info < (3,0):
-    import copy # Necessary because Py2 doesn't have copy in list.
 from datetime import datetime
-from bs4 import BeautifulSoup # To Read XML files.
+from lxml import etree # To stream read the XML files.
 import re # Regular expression parser.
 import logging
 from ..global_vars import logger, DEBUG_OVERVIEW, DEBUG_DETAILED, DEBUG_OBSESSIVE # Debug configurations.
 from ..global_vars import SEPRTR
 from ..distributors.global_vars import distributor_dict
-from .tools import field_name_translations, remove_dnp_parts
+from .tools import field_name_translations, remove_dnp_parts, intern_field
 from .tools import PART_REF_REGEX_NOT_ALLOWED
 
 # Add to deal with the fileds of Altium and WEB tools.
@@ -52,7 +50,10 @@ field_name_translations.update(
 )
 
 ALTIUM_NONE = '[NoParam]' # Value of Altium to `None`.
-ALTIUM_PART_SEPRTR = r'(?<!\\),\s*' # Separator for the part numbers in a list, remove the lateral spaces.
+ALTIUM_PART_SEPRTR = re.compile(r'(?<!\\),\s*') # Separator for the part numbers in a list, remove the lateral spaces.
+# Runs of "-" and not allowed characters in the designators, cleaned
+# in a single pass by `clean_ref()`.
+ALTIUM_REF_CLEAN = re.compile(r'(?:\-|{})+'.format(PART_REF_REGEX_NOT_ALLOWED))
 
 __all__ = ['get_part_groups']
 
@@ -74,8 +75,39 @@ eda_dict.update(
     }
 )
 
+def clean_ref(ref):
+    '''@brief Clean an Altium designator to a KiCost compatible reference.
+       
+       Finishing "+" is replaced by "p", the not allowed characters are
+       removed, repeated "-" are merged, starting "-" is removed and a
+       finishing one replaced by "n". A "0" is appended if the reference
+       do not finish with a number. Everything is done in a single pass
+       over the `ALTIUM_REF_CLEAN` runs of the designator.
+       e.g. 'R(1)' -> 'R1', 'TP--5' -> 'TP-5', 'C7+' -> 'C7p0', 'D3-' -> 'D3n0'
+       @param ref Designator `str()` as read from the Altium file.
+       @return Reference `str()`.
+    '''
+    def clean_run(match):
+        run = match.group(0)
+        at_end = match.end() == len(match.string)
+        if at_end and run[-1] == '+':
+            tail, run = 'p', run[:-1] # Finishing "+".
+        else:
+            tail = ''
+        if '-' not in run or match.start() == 0:
+            return tail # Not allowed characters or starting "-".
+        return ('n' if at_end and not tail else '-') + tail # Single or finishing "-".
+    ref = ALTIUM_REF_CLEAN.sub(clean_run, ref)
+    if not ref[-1:].isdigit():
+        ref += '0'
+    return ref
+
+
 def get_part_groups(in_file, ignore_fields, variant):
     '''@brief Get groups of identical parts from an XML file and return them as a dictionary.
+       
+       The file is stream read, so the table header is translated just
+       once and each row is released after used.
        @param in_file `str()` with the file name.
        @param ignore_fields `list()` fields do be ignored on the read action.
        @param variant `str()` in regular expression to match with the design version of the BOM.
@@ -86,115 +118,119 @@ def get_part_groups(in_file, ignore_fields, variant):
 
     def extract_field(xml_entry, field_name):
         '''Extract XML fields from XML entry given.'''
-        try:
-            if sys.version_info>=(3,0):
-                return xml_entry[field_name]
-            else:
-                return xml_entry[field_name].encode('ascii', 'ignore')
-        except KeyError:
-            return None
-
-    def extract_fields_row(row, variant, header):
-        '''Extract XML fields from the part in a library or schematic.'''
-        
-        # First get the references and the quantities of elements in each rwo group.
+        value = xml_entry.get(field_name)
+        if value is not None and sys.version_info<(3,0):
+            value = value.encode('ascii', 'ignore')
+        return value
+
+    def header_columns(header, row):
+        '''Translate the XML table header, done once for each file.
+           Return the column of the references, the column of the quantity
+           (or `None`) and a `list()` of (column, field name) to read.'''
+        # The row attributes are looked by the case used in the first row.
+        row_keys = {k.lower(): k for k in row.keys()}
+        header = [row_keys.get(hdr.lower(), hdr) for hdr in header]
         header_translated = [field_name_translations.get(hdr.lower(),hdr.lower()) for hdr in header]
-        hdr_refs = [i for i, x in enumerate(header_translated) if x == "refs"]
-        if not hdr_refs:
+        try:
+            hdr_refs = header[header_translated.index('refs')]
+        except ValueError:
             raise ValueError('Not founded the part designators/references in the BOM.\nTry to generate the file again at Altium.')
-        else:
-            hdr_refs = hdr_refs[0]
-        refs = re.split(ALTIUM_PART_SEPRTR, extract_field(row, header[hdr_refs].lower()) )
-        if sys.version_info >= (3,0):
-            header_valid = header.copy()
-        else:
-            header_valid = copy.copy(header)
-        header_valid.remove(header[hdr_refs])
         try:
-            hdr_qty = [i for i, x in enumerate(header_translated) if x == "qty"][0]
-            qty = int( extract_field(row, header[hdr_qty].lower()) )
-            header_valid.remove(header[hdr_qty])
-            if qty!=len(refs):
-                raise ValueError('Not recognize the division elements in the Altium BOM.\nIf you are using subparts, try to replace the separator from `, ` to `,` or better, use `;` instead `,`.')
-        except:
-            qty = len(refs)
-        
+            hdr_qty = header[header_translated.index('qty')]
+        except ValueError:
+            hdr_qty = None
+        key_re = re.compile('kicost(\.{})?:(?P<name>.*)'.format(variant), flags=re.IGNORECASE)
+        columns = []
+        for hdr, name in zip(header, header_translated):
+            if hdr in (hdr_refs, hdr_qty) or hdr.lower() in ign_fields:
+                continue
+            if SEPRTR in hdr:
+                # Now look for fields that start with 'kicost' and possibly
+                # another dot-separated variant field and store their values.
+                # Anything else is in a non-kicost namespace.
+                mtch = key_re.match(hdr.lower())
+                if not mtch:
+                    continue
+                # The field name is anything that came after the leading
+                # 'kicost' and variant field.
+                name = mtch.group('name')
+                name = field_name_translations.get(name, name)
+                # If the field name isn't for a manufacturer's part
+                # number or a distributors catalog number, then add
+                # it to 'local' if it doesn't start with a distributor
+                # name and colon.
+                if name not in ('manf#', 'manf') and name[:-1] not in distributor_dict:
+                    if SEPRTR not in name: # This field has no distributor.
+                        name = 'local:' + name # Assign it to a local distributor.
+            columns.append((hdr, intern_field(name)))
+        return hdr_refs, hdr_qty, columns
+
+    def extract_fields_row(row, hdr_refs, hdr_qty, columns):
+        '''Extract XML fields from the part in a library or schematic.'''
+
+        # First get the references and the quantities of elements in each row group.
+        refs = ALTIUM_PART_SEPRTR.split(extract_field(row, hdr_refs) or '')
+        qty = len(refs)
+        if hdr_qty:
+            try:
+                if int(extract_field(row, hdr_qty)) != qty:
+                    logger.warning('Not recognize the division elements in the Altium BOM.\nIf you are using subparts, try to replace the separator from `, ` to `,` or better, use `;` instead `,`.')
+            except (TypeError, ValueError):
+                pass
+
         # After the others fields.
         fields = [dict() for x in range(qty)]
-        for hdr in header_valid:
+        for hdr, name in columns:
             # Extract each information, by the the header given, for each
             # row part, spliting it in a list.
-            value = extract_field(row, hdr.lower())
-            value = re.split(ALTIUM_PART_SEPRTR, value)
-            if hdr.lower() in ign_fields:
+            value = extract_field(row, hdr)
+            if not value:
                 continue
-            elif not SEPRTR in hdr.lower():
+            value = ALTIUM_PART_SEPRTR.split(value)
+            if len(value)==qty:
                 for i in range(qty):
-                    if len(value)==qty:
-                        v = value[i]
-                    else:
-                        v = value[0] # Footprint is just one for group.
+                    v = value[i]
                     # Do not create empty fields. This is useful
                     # when used more than one `manf#` alias in one designator.
                     if v and v!=ALTIUM_NONE:
-                        fields[i][field_name_translations.get(hdr.lower(),hdr.lower())] = v.strip()
+                        fields[i][name] = intern_field(v.strip())
             else:
-                # Now look for fields that start with 'kicost' and possibly
-                # another dot-separated variant field and store their values.
-                # Anything else is in a non-kicost namespace.
-                key_re = 'kicost(\.{})?:(?P<name>.*)'.format(variant)
-                mtch = re.match(key_re, name, flags=re.IGNORECASE)
-                if mtch:
-                    # The field name is anything that came after the leading
-                    # 'kicost' and variant field.
-                    name = mtch.group('name')
-                    name = field_name_translations.get(name, name)
-                    # If the field name isn't for a manufacturer's part
-                    # number or a distributors catalog number, then add
-                    # it to 'local' if it doesn't start with a distributor
-                    # name and colon.
-                    if name not in ('manf#', 'manf') and name[:-1] not in distributor_dict:
-                        if SEPRTR not in name: # This field has no distributor.
-                            name = 'local:' + name # Assign it to a local distributor.
+                v = value[0] # Footprint is just one for group.
+                if v and v!=ALTIUM_NONE:
+                    v = intern_field(v.strip())
                     for i in range(qty):
-                        if len(value)==qty:
-                            v = value[i]
-                        else:
-                            v = value[0] # Footprint is just one for group.
-                        # Do not create empty fields. This is useful
-                        # when used more than one `manf#` alias in one designator.
-                        if v and v!=ALTIUM_NONE:
-                            fields[i][field_name_translations.get(hdr.lower(),hdr.lower())] = v.strip()
+                        fields[i][name] = v
         return refs, fields
 
-    # Read-in the schematic XML file to get a tree and get its root.
+    # Stream read the XML file, using the table header as soon it is
+    # complete and cleaning each row after used, so the whole file tree
+    # is never kept in memory.
     logger.log(DEBUG_OVERVIEW, '# Getting from XML \'{}\' Altium BoM...'.format(
                                     os.path.basename(in_file)) )
-    file_h = open(in_file)
-    root = BeautifulSoup(file_h, 'lxml')
-    file_h.close()
-
-    # Get the header of the XML file of Altium, so KiCost is able to to
-    # to get all the informations in the file.
-    logger.log(DEBUG_OVERVIEW, 'Getting the XML table header...')
-    header = [ extract_field(entry, 'name') for entry in root.find('columns').find_all('column') ]
-
-    logger.log(DEBUG_OVERVIEW, 'Getting components...')
+    header = []
+    columns = None
     accepted_components = {}
-    for row in root.find('rows').find_all('row'):
-
-        # Get the values for the fields in each library part (if any).
-        refs, fields = extract_fields_row(row, variant, header)
-        for i in range(len(refs)):
-            ref = refs[i]
-            ref = re.sub('\+$', 'p', ref) # Finishing "+".
-            ref = re.sub(PART_REF_REGEX_NOT_ALLOWED, '', ref) # Generic special characters not allowed. To work around #ISSUE #89.
-            ref = re.sub('\-+', '-', ref) # Double "-".
-            ref = re.sub('^\-', '', ref) # Starting "-".
-            ref = re.sub('\-$', 'n', ref) # Finishing "-".
-            if not re.search('\d$', ref):
-                ref += '0'
-            accepted_components[ re.sub(PART_REF_REGEX_NOT_ALLOWED, '', ref) ] = fields[i]
+    for event, entry in etree.iterparse(in_file, events=('end',), recover=True, huge_tree=True):
+        tag = entry.tag.lower() if isinstance(entry.tag, str) else None
+        if tag == 'column':
+            # Get the header of the XML file of Altium, so KiCost is able to to
+            # to get all the informations in the file.
+            header.append( extract_field(entry, 'Name') or extract_field(entry, 'name') )
+        elif tag == 'row':
+            if columns is None:
+                logger.log(DEBUG_OVERVIEW, 'Getting the XML table header...')
+                columns = header_columns(header, entry)
+                logger.log(DEBUG_OVERVIEW, 'Getting components...')
+            # Get the values for the fields in each library part (if any).
+            refs, fields = extract_fields_row(entry, *columns)
+            for i in range(len(refs)):
+                accepted_components[ clean_ref(refs[i]) ] = fields[i]
+        else:
+            continue
+        # Release the already read entries.
+        entry.clear()
+        while entry.getprevious() is not None:
+            del entry.getparent()[0]
 
     # Not founded project information at the file content.
     prj_info = {'title': os.path.basename( in_file ),
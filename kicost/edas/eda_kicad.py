@@ -28,7 +28,7 @@ from bs4 import BeautifulSoup
 from ..global_vars import logger, DEBUG_OVERVIEW, DEBUG_DETAILED, DEBUG_OBSESSIVE
 from ..global_vars import SEPRTR
 from ..distributors.global_vars import distributor_dict
-from .tools import field_name_translations, remove_dnp_parts
+from .tools import field_name_translations, remove_dnp_parts, LayeredFields, intern_field
 
 
 __all__ = ['get_part_groups']
@@ -69,12 +69,12 @@ def get_part_groups(in_file, ignore_fields, variant):
             for f in part.find('fields').find_all('field'):
                 # Store the name and value for each kicost-related field.
                 # Remove case of field name along with leading/trailing whitespace.
-                name = str(f['name']).lower().strip()
+                name = intern_field(str(f['name']).lower().strip())
                 if name in ign_fields:
                     continue  # Ignore fields in the ignore list.
                 elif SEPRTR not in name: # No separator, so get global field value.
                     name = field_name_translations.get(name, name)
-                    value = str(f.string)
+                    value = intern_field(str(f.string))
                     if value:
                         fields[name] = value # Do not create empty fields. This is usefull
                                              # when used more than one `manf#` alias in one designator.
@@ -95,8 +95,8 @@ def get_part_groups(in_file, ignore_fields, variant):
                         # name and colon.
                         if name not in ('manf#', 'manf') and name[:-1] not in distributor_dict:
                             if SEPRTR not in name: # This field has no distributor.
-                                name = 'local:' + name # Assign it to a local distributor.
-                        value = str(f.string)
+                                name = intern_field('local:' + name) # Assign it to a local distributor.
+                        value = intern_field(str(f.string))
                         if value:
                             fields[name] = value
 
@@ -117,7 +117,8 @@ def get_part_groups(in_file, ignore_fields, variant):
     def title_find_all(data, field):
         '''Helper function for finding title info, especially if it is absent.'''
         try:
-            return data.find_all(field)[0].string
+            string = data.find_all(field)[0].string
+            return str(string) if string is not None else None # Not keep a reference to the XML tree.
         except (AttributeError, IndexError):
             return None
     prj_info = dict()
@@ -158,7 +159,7 @@ def get_part_groups(in_file, ignore_fields, variant):
         if libsource:
             # Create the key to look up the part in the libparts dict.
             #libpart = str(libsource['lib'] + SEPRTR + libsource['part'])
-            libpart = str(libsource['lib']) + SEPRTR + str(libsource['part'])
+            libpart = intern_field(str(libsource['lib']) + SEPRTR + str(libsource['part']))
         else:
             libpart = '???'
             logger.log(DEBUG_OVERVIEW, 'Fottprint library not assigned to {}'.format(''))#TODO
@@ -166,7 +167,9 @@ def get_part_groups(in_file, ignore_fields, variant):
         # Initialize the fields from the global values in the libparts dict entry.
         # (These will get overwritten by any local values down below.)
         # (Use an empty dict if no part exists in the library.)
-        fields = libparts.get(libpart, dict()).copy() # Make a copy! Don't use reference!
+        # The library fields are shared by all the components of the part,
+        # just the fields changed are stored by the component.
+        fields = LayeredFields(libparts.get(libpart))
         try:
             del fields['refs'] # Delete this entry that was creating problem
                                # to group parts of differents sheets ISSUE #97.
@@ -178,9 +181,9 @@ def get_part_groups(in_file, ignore_fields, variant):
 
         # Get the footprint for the part (if any) from the schematic.
         try:
-            fields['value'] = str(c.find('value').string)
-            fields['footprint'] = str(c.find('footprint').string)
-            fields['datasheet'] = str(c.find('datasheet').string)
+            fields['value'] = intern_field(str(c.find('value').string))
+            fields['footprint'] = intern_field(str(c.find('footprint').string))
+            fields['datasheet'] = intern_field(str(c.find('datasheet').string))
         except AttributeError:
             pass
 
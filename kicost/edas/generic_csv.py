@@ -35,7 +35,7 @@ import csv # CSV file reader.
 import re # Regular expression parser.
 import logging
 from ..global_vars import logger, DEBUG_OVERVIEW, DEBUG_DETAILED, DEBUG_OBSESSIVE # Debug configurations.
-from .tools import field_name_translations, remove_dnp_parts, split_refs
+from .tools import field_name_translations, remove_dnp_parts, split_refs, intern_field
 from ..distributors.global_vars import distributor_dict
 
 # Add to deal with the generic CSV header purchase list.
@@ -129,7 +129,7 @@ def get_part_groups(in_file, ignore_fields, variant):
 
     # Standardize the header titles and remove the spaces before
     # and after, striping the text imrpove the user experience.
-    header = [field_name_translations.get(hdr.strip().lower(),hdr.strip().lower()) for hdr in header_file]
+    header = [intern_field(field_name_translations.get(hdr.strip().lower(),hdr.strip().lower())) for hdr in header_file]
 
     # Examine the first line to see if it really is a header.
     # If the first line contains a column header that is not in the list of
@@ -212,6 +212,7 @@ def get_part_groups(in_file, ignore_fields, variant):
                     # For Python 2, create unicode versions of strings.
                     value = vals.get(h_file, '').decode('utf-8')
                 if value:
+                    value = intern_field(value)
                     try:
                         if fields[h] != value:
                             logger.warning('Found different duplicated information for {} in the titles [\'{}\', \'{}\']: \'{}\'=!\'{}\'. Will be used \'{}\'.'.format(
@@ -28,17 +28,40 @@ __company__ = 'University of Campinas - Brazil'
 
 # Libraries.
 import re, os # Regular expression parser and matches.
+import json, hashlib # Deterministic group keys.
+import functools
+import math
+from fractions import Fraction # Exact quantities of the subparts (e.g. 4/5).
+from decimal import Decimal
+from multiprocessing import Pool # Group big designs in parallel.
+try:
+    from sys import intern # Python 3.
+except ImportError:
+    pass # Python 2, built-in `intern()`.
+try:
+    from collections.abc import MutableMapping
+except ImportError:
+    from collections import MutableMapping # Python 2.
 from ..global_vars import logger, DEBUG_OVERVIEW, DEBUG_DETAILED, DEBUG_OBSESSIVE # Debug configurations.
 from ..global_vars import SEPRTR
 from ..distributors.global_vars import distributor_dict
 from . import eda_dict # EDA dictionary with the features.
 
-__all__ = ['file_eda_match', 'partgroup_qty', 'groups_sort', 'order_refs', 'subpartqty_split', 'group_parts']
+__all__ = ['file_eda_match', 'partgroup_qty', 'partgroup_qty_value', 'groups_sort', 'groups_sort_key', 'order_refs', 'subpartqty_split', 'group_parts', 'group_parts_sharded', 'regroup_parts', 'init_process']
 
 # Qty and part separators are escaped by preceding with '\' = (?<!\\)
 QTY_SEPRTR  = r'(?<!\\)\s*[:]\s*'  # Separator for the subpart quantity and the part number, remove the lateral spaces.
 PART_SEPRTR = r'(?<!\\)\s*[;,]\s*' # Separator for the part numbers in a list, remove the lateral spaces.
 ESC_FIND = r'\\\s*([;,:])\s*'      # Used to remove backslash from escaped qty & manf# separators.
+# Compiled versions, used for each code of each part.
+QTY_SEPRTR_REGEX = re.compile(QTY_SEPRTR)
+PART_SEPRTR_REGEX = re.compile(PART_SEPRTR)
+ESC_FIND_REGEX = re.compile(ESC_FIND)
+QTY_NUM_REGEX = re.compile(r'^\s*[\-\+]?\s*[0-9]*\s*[\.\/]*\s*?[0-9]*\s*$') # Simple, fraction and decimal numbers.
+QTY_MARKS_REGEX = re.compile(r'[\.\/]')
+CODE_CACHE_SIZE = 4096 # Manufacture/distributor codes parsed kept, the BOMs repeat a lot of them.
+REF_CACHE_SIZE = 1024 # Groups of references ordered kept.
+GROUP_SHARD_MIN_COMPONENTS = 50000 # Designs with less components are grouped in just one process.
 REPLICATE_MANF = '~' # Character used to replicate the last manufacture name (`manf` field) in multi-parts.
 SGROUP_SEPRTR = '\n' # Separator of the semi identical parts groups (parts that have the filed ignored to group).
 PRJ_STR_DECLARE = 'prj' # Project string declaration attached to the beginning of each reference correspondent to one project in the multi-project files case.
@@ -51,9 +74,18 @@ PRJ_SEPRTR = ';' # Separator between projects when collapsed and grouped the par
 # Reference string order to the spreadsheet. Use this to
 # group the elements in sequential rows.
 BOM_ORDER = 'u,q,d,t,y,x,c,r,s,j,p,cnn,con'
+# Position of each reference identifier of BOM_ORDER, used by `groups_sort_key()`.
+BOM_ORDER_RANK = {identifier: rank for rank, identifier in enumerate(
+                  re.split(r'(?<![\W\*\/])\s*,\s*|\s*,\s*(?![\W\*\/])', BOM_ORDER.lower()))}
 
 # Characters removed from references when read the files.
-PART_REF_REGEX_NOT_ALLOWED = '[\+\(\)\*\{}]'.format(SEPRTR)
+PART_REF_REGEX_NOT_ALLOWED = r'[\+\(\)\*\{}]'.format(SEPRTR)
+PART_REF_NOT_ALLOWED_REGEX = re.compile(PART_REF_REGEX_NOT_ALLOWED)
+# Used to split the grouped references in `split_refs()`.
+SPLIT_REFS_REGEX = re.compile(' *[,; ] *')
+GROUPED_REF_REGEX = re.compile(r'^\w+\d')
+REF_NUM_SEPRTR_REGEX = re.compile(r'[/\\]')
+REF_NUMS_REGEX = re.compile(r'\d+') # Integers of a reference number, used to sort.
 # Regular expression for detecting part reference ids consisting of a
 # prefix of letters followed by a sequence of digits, such as 'LED10'
 # or a sequence of digits followed by a subpart number like 'CONN1#3'.
@@ -65,8 +97,8 @@ PART_REF_REGEX_NOT_ALLOWED = '[\+\(\)\*\{}]'.format(SEPRTR)
 # In the case of multiple project BOM files, the references are
 # modified by adding the project number identification followed
 # by `SEPRTR` definition.
-PART_REF_REGEX_SPECIAL_CHAR_REF = '\+\-\=\s\_\.\(\)\$\*\&' # Used in next definition only (because repeat).
-PART_REF_REGEX = re.compile('(?P<prefix>({p_str}(?P<prj>\d+){p_sp})?(?P<ref>[a-z{sc}\d]*[a-z{sc}]))(?P<num>((?P<ref_num>\d+(\.\d+)?)({sp}(?P<subpart_num>\d+))?)?)'.format(p_str=PRJ_STR_DECLARE, p_sp=PRJPART_SPRTR,
+PART_REF_REGEX_SPECIAL_CHAR_REF = r'\+\-\=\s\_\.\(\)\$\*\&' # Used in next definition only (because repeat).
+PART_REF_REGEX = re.compile(r'(?P<prefix>({p_str}(?P<prj>\d+){p_sp})?(?P<ref>[a-z{sc}\d]*[a-z{sc}]))(?P<num>((?P<ref_num>\d+(\.\d+)?)({sp}(?P<subpart_num>\d+))?)?)'.format(p_str=PRJ_STR_DECLARE, p_sp=PRJPART_SPRTR,
                                 sc=PART_REF_REGEX_SPECIAL_CHAR_REF, sp=SUB_SEPRTR), re.IGNORECASE)
 
 # Generate a dictionary to translate all the different ways people might want
@@ -120,6 +152,112 @@ field_name_translations.update(
 )
 
 
+try:
+    from functools import lru_cache
+except ImportError: # Python 2.
+    def lru_cache(maxsize=128):
+        '''@brief Simple memo of functions, cleared when full.'''
+        def decorator(function):
+            cache = {}
+            @functools.wraps(function)
+            def wrapper(*args):
+                try:
+                    return cache[args]
+                except KeyError:
+                    if len(cache) >= maxsize:
+                        cache.clear()
+                    result = cache[args] = function(*args)
+                    return result
+            return wrapper
+        return decorator
+
+
+def intern_field(string):
+    '''@brief Intern the field names and values read by the EDA modules.
+       
+       The same names (`value`, `footprint`, ...) and values (`100nF`,
+       `C_0402_1005Metric`, ...) repeat in thousands of components, so
+       keep just one object of each and compare them by identity.
+       @param string Field name or value `str()`.
+       @return The interned `str()`, or the same if it can't be interned (Python 2 unicode).
+    '''
+    try:
+        return intern(string)
+    except TypeError:
+        return string
+
+
+class LayeredFields(MutableMapping):
+    '''@brief Fields of a component as a layer over shared fields.
+       
+       The fields of the library part are shared by all the components
+       that use it (the `base`, never modified here) and each component
+       just keep a small `dict()` with the fields that differ from it.
+       So the memory grow with the number of distinct fields and not
+       with the number of components. It behaves as the `dict()` used
+       by the other EDA modules and `copy()` keep sharing the base.
+    '''
+    __slots__ = ('base', 'local', 'removed')
+
+    def __init__(self, base=None, local=None, removed=None):
+        self.base = base if base is not None else {}
+        self.local = local if local is not None else {}
+        self.removed = removed # `set()` of base fields deleted, `None` if none.
+
+    def __getitem__(self, key):
+        try:
+            return self.local[key]
+        except KeyError:
+            if self.removed and key in self.removed:
+                raise
+            return self.base[key]
+
+    def __setitem__(self, key, value):
+        if self.removed and key in self.removed:
+            self.removed.discard(key)
+        elif key in self.base and self.base[key] == value:
+            self.local.pop(key, None) # Same of the library, don't duplicate.
+            return
+        self.local[key] = value
+
+    def __delitem__(self, key):
+        found = self.local.pop(key, self) is not self
+        if key in self.base and not (self.removed and key in self.removed):
+            if self.removed is None:
+                self.removed = set()
+            self.removed.add(key)
+            found = True
+        if not found:
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        if key in self.local:
+            return True
+        return key in self.base and not (self.removed and key in self.removed)
+
+    def __iter__(self):
+        for key in self.local:
+            yield key
+        for key in self.base:
+            if key not in self.local and not (self.removed and key in self.removed):
+                yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def copy(self):
+        return LayeredFields(self.base, self.local.copy(), set(self.removed) if self.removed else None)
+
+
 def file_eda_match(file_name):
     '''@brief Verify with which EDA the file matches.
        
@@ -166,10 +304,73 @@ def organize_parts(components, fields_merge):
     return components
 
 
-# Temporary class for storing part group information.
-class IdenticalComponents(object):
-    '''@brief Class to group components.'''
-    pass
+class PartGroup(object):
+    '''@brief Group of identical components, a row of the spreadsheet.
+       
+       Created by `group_parts()`:
+       `refs` `list()` of the references of the components.
+       `manfcat_codes` manufacture/distributors codes found in the components.
+       `key` `group_key()` of the group, the same in every run for the same
+       components fields and codes.
+       `fields` `dict()` of the fields, common to all the components.
+       Filled by `kicost()` and the distributors modules:
+       `offers` `dict()` of `DistributorOffer` by distributor name.
+       `datasheet` and `lifecycle` got from the web distributors.
+       Filled by the spreadsheet:
+       `collapsed_refs` `str()` of the ordered references.
+    '''
+    __slots__ = ('refs', 'manfcat_codes', 'key', 'fields', 'offers', 'datasheet', 'lifecycle', 'collapsed_refs')
+
+    def __init__(self):
+        self.refs = []
+        self.manfcat_codes = None
+        self.key = None
+        self.fields = {}
+        self.offers = {}
+        self.datasheet = None
+        self.lifecycle = None
+        self.collapsed_refs = None
+
+
+def group_key(fields):
+    '''@brief Deterministic key of a group of components.
+       
+       Digest of a canonical encoding of the fields, so, different of
+       `hash()`, it doesn't change between Python runs and can be used
+       to cache or compare the groups.
+       @param fields Iterable of (name, value) of the fields.
+       @return `str()` hexadecimal digest.
+    '''
+    data = json.dumps(sorted(fields), separators=(',', ':'), default=str).encode('utf-8')
+    try:
+        return hashlib.blake2b(data, digest_size=16).hexdigest()
+    except AttributeError: # Python 2 and before 3.6.
+        return hashlib.sha256(data).hexdigest()[:32]
+
+
+def fields_not_hash(fields_merge):
+    '''@brief Fields not used to find the seemingly identical components.
+       
+       @param fields_merge Data fields to be merged, same as `group_parts()`.
+       @return `list()` of the field names.
+    '''
+    # All codes to scrape, do not include code field name of distributors
+    # that will not be scraped.
+    FIELDS_MANFCAT = ([d + '#' for d in distributor_dict] + ['manf#'])
+    # Calculated all the fields that never have to be used to create the hash keys.
+    # These include all the manufacture company and codes, distributors codes 
+    # recognized by the installed modules and, quantity and sub quantity of the part.
+    FIELDS_NOT_HASH = (['manf#_qty', 'manf'] + FIELDS_MANFCAT + [d + '#_qty' for d in distributor_dict])
+
+    # Check if was asked to merge some not allowed fields (as `manf`, `manf# ...
+    # other ones as `desc` and even `value` and `footprint` may be merged due
+    # the different typed (1uF and 1u) or footprint library names to the same one.
+    fields_merge = list( [field_name_translations.get(f.lower(),f.lower()) for f in fields_merge] )
+    for c in FIELDS_NOT_HASH:
+        if c in fields_merge:
+             raise ValueError('Manufacturer/distributor codes and manufacture company "{}" can\'t be ignored to create the components groups.'.format(c))
+    return FIELDS_NOT_HASH + fields_merge # Not use the fields do merge to create the hash.
+
 
 def group_parts(components, fields_merge):
     '''@brief Group common parts after preprocessing from XML or CSV files.
@@ -194,19 +395,7 @@ def group_parts(components, fields_merge):
     # that will not be scraped. This definition is used to create and check
     # the identical groups or subsplit the seemingly identical parts.
     FIELDS_MANFCAT = ([d + '#' for d in distributor_dict] + ['manf#'])
-    # Calculated all the fields that never have to be used to create the hash keys.
-    # These include all the manufacture company and codes, distributors codes 
-    # recognized by the installed modules and, quantity and sub quantity of the part.
-    FIELDS_NOT_HASH = (['manf#_qty', 'manf'] + FIELDS_MANFCAT + [d + '#_qty' for d in distributor_dict])
-
-    # Check if was asked to merge some not allowed fields (as `manf`, `manf# ...
-    # other ones as `desc` and even `value` and `footprint` may be merged due
-    # the different typed (1uF and 1u) or footprint library names to the same one.
-    fields_merge = list( [field_name_translations.get(f.lower(),f.lower()) for f in fields_merge] )
-    for c in FIELDS_NOT_HASH:
-        if c in fields_merge:
-             raise ValueError('Manufacturer/distributor codes and manufacture company "{}" can\'t be ignored to create the components groups.'.format(c))
-    FIELDS_NOT_HASH = FIELDS_NOT_HASH + fields_merge # Not use the fields do merge to create the hash.
+    FIELDS_NOT_HASH = fields_not_hash(fields_merge)
 
     # Now partition the parts into groups of like components.
     # First, get groups of identical components but ignore any manufacturer's
@@ -222,8 +411,9 @@ def group_parts(components, fields_merge):
         # Don't use the manufacturer's part number when calculating the hash!
         # Also, don't use any fields with SEPRTR in the label because that indicates
         # a field used by a specific tool (including KiCost).
+        # The fields themselves are the key, so there is no hash collision.
         hash_fields = {k: fields[k] for k in fields if k not in FIELDS_NOT_HASH and SEPRTR not in k}
-        h = hash(tuple(sorted(hash_fields.items())))
+        h = tuple(sorted(hash_fields.items()))
 
         # Now add the hashed component to the group with the matching hash
         # or create a new group if the hash hasn't been seen before.
@@ -237,7 +427,7 @@ def group_parts(components, fields_merge):
         except KeyError:
             # This happens if it is the first part in a group, so the group
             # doesn't exist yet.
-            component_groups[h] = IdenticalComponents()  # Add empty structure.
+            component_groups[h] = PartGroup()  # Add empty structure.
             component_groups[h].refs = [ref]  # Init list of refs with first ref.
             # Now add the manf. part code (or None) and each distributor stock
             # catologue code for this part to the group set.
@@ -275,6 +465,8 @@ def group_parts(components, fields_merge):
     for g, grp in list(component_groups.items()):
         num_manfcat_codes = {f:len(grp.manfcat_codes[f]) for f in FIELDS_MANFCAT}
         if all([num_manfcat_codes[f]==1 or (num_manfcat_codes[f]==2 and None in grp.manfcat_codes[f]) for f in FIELDS_MANFCAT]):
+            # The group key uses the code that will be propagated.
+            grp.key = group_key(g + tuple((f, next((c for c in grp.manfcat_codes[f] if c is not None), None)) for f in FIELDS_MANFCAT))
             new_component_groups.append(grp)
             continue  # CASE ONE and TWO:
                       # Single manf# and distributor catalogue. Or a seemingly
@@ -283,6 +475,7 @@ def group_parts(components, fields_merge):
                       # will be replaced with the propagated manufacture /
                       # distributor catalogue code.
         elif all([(num_manfcat_codes[f]==1 and grp.manfcat_codes[f]==None) for f in FIELDS_MANFCAT]):
+            grp.key = group_key(g + tuple((f, None) for f in FIELDS_MANFCAT))
             new_component_groups.append(grp)
             continue  # CASE THREE:
                       # One manf# or cat# that is `None`. Don't split this
@@ -291,25 +484,22 @@ def group_parts(components, fields_merge):
         # Otherwise, split the group into subgroups, each with the
         # same manf# and distributors catalogue codes (for that one
         # that will be scraped, the other ones are not considered).
-        for i_manfcat in range(max([len(grp.manfcat_codes.get(f)) for f in FIELDS_MANFCAT])):
-            manfcat_num = {}
-            for f in FIELDS_MANFCAT:
-                try:
-                    manfcat_num[f] = list(grp.manfcat_codes.get(f))[i_manfcat]
-                except IndexError:
-                    # If not have more code in the set list, is because just
-                    # exist one. So use this as general.
-                    manfcat_num[f] = list(grp.manfcat_codes.get(f))[0]
-            sub_group = IdenticalComponents()
-            sub_group.manfcat_codes = [manfcat_num]
-            sub_group.refs = []
-            for ref in grp.refs:
-                # Use get() which returns `None` if the component has no
-                # manf# or distributor# field. That will match if the
-                # group manf_num is also None. So append the par to the group.
-                if all([components[ref].get(f)==manfcat_num[f] for f in FIELDS_MANFCAT]):
-                    sub_group.refs.append(ref)
-            new_component_groups.append(sub_group) # Append one part of the split group.
+        # Done in one pass, putting each ref in the bucket of its codes
+        # tuple. The subgroups keep the order of the first ref of each.
+        sub_groups = {}
+        for ref in grp.refs:
+            # Use get() which returns `None` if the component has no
+            # manf# or distributor# field, so these ones also make a group.
+            manfcat_num = tuple(components[ref].get(f) for f in FIELDS_MANFCAT)
+            try:
+                sub_groups[manfcat_num].refs.append(ref)
+            except KeyError:
+                sub_group = PartGroup()
+                sub_group.manfcat_codes = [dict(zip(FIELDS_MANFCAT, manfcat_num))]
+                sub_group.refs = [ref]
+                sub_group.key = group_key(g + tuple(zip(FIELDS_MANFCAT, manfcat_num)))
+                sub_groups[manfcat_num] = sub_group
+                new_component_groups.append(sub_group) # Append one part of the split group.
     #print('\n\n\n2++++++++++++++',len(new_component_groups))
     #for grp in new_component_groups:
     #    print('\n', grp.refs)
@@ -324,16 +514,23 @@ def group_parts(components, fields_merge):
     if fields_merge:
         fields_merge = [field_name_translations.get(f.lower(), f.lower()) for f in fields_merge]
         for grp in new_component_groups:
-            components_grp = dict()
-            components_grp = {i:components[i] for i in grp.refs}
             for f in fields_merge:
-                values_field = [v.get(f, '') for k,v in components_grp.items()]
-                ocurrences = {v_g:[ r for r in grp.refs if components[r].get(f,'') == v_g] for v_g in set(values_field)}
+                # Bucket the refs by the field value in one pass, keeping
+                # the values in the order of the first ref that use them.
+                ocurrences = {}
+                values_field = []
+                for r in grp.refs:
+                    v = components[r].get(f, '')
+                    try:
+                        ocurrences[v].append(r)
+                    except KeyError:
+                        ocurrences[v] = [r]
+                        values_field.append(v)
                 if len(ocurrences)>1:
-                    if f=='desc' and len(ocurrences)==2 and '' in ocurrences.keys():
-                        value = ''.join(list(ocurrences.keys()))
+                    if f=='desc' and len(ocurrences)==2 and '' in ocurrences:
+                        value = ''.join(values_field)
                     else:
-                        value = SGROUP_SEPRTR.join( [','.join( order_refs(r) ) + SEPRTR + ' ' + t for t,r in ocurrences.items()] )
+                        value = SGROUP_SEPRTR.join( [','.join( order_refs(ocurrences[t]) ) + SEPRTR + ' ' + t for t in values_field] )
                     for r in grp.refs:
                         components[r][f] = value
     #print('\n\n\n3++++++++++++++',len(new_component_groups))
@@ -351,13 +548,7 @@ def group_parts(components, fields_merge):
         for ref in grp.refs:
             for key, val in list(components[ref].items()):
                 if key == 'manf#_qty':
-                    try:
-                        for i in range(len(val)):
-                            grp_fields['manf#_qty'][i] += '+' + val[i] # DUMMY way and need improvement to really do arithmetic and not string cat. #TODO
-                            val[i] = grp_fields['manf#_qty'][i] # Make the first values take also equal.
-                    except:
-                        grp_fields['manf#_qty'] = val
-                    continue
+                    continue # Summed below.
                 if val is None: # Field with no value...
                     continue # so ignore it.
                 if grp_fields.get(key): # This field has been seen before.
@@ -365,6 +556,15 @@ def group_parts(components, fields_merge):
                         raise ValueError('Field value mismatch: ref={} field={} value=\'{}\', global=\'{}\' at group={}'.format(ref, key, val, grp_fields[key], grp.refs))
                 else: # First time this field has been seen in the group, so store it.
                     grp_fields[key] = val
+        # Sum the quantities of the group, one sum by project in the case
+        # of multiple BOM files (`list()` of quantities). The references
+        # without manufacture code (so without quantity) count as one.
+        qtys = [components[ref].get('manf#_qty') for ref in grp.refs]
+        if any(q is not None for q in qtys):
+            if isinstance(qtys[0], list):
+                grp_fields['manf#_qty'] = [sum(q) for q in zip(*qtys)]
+            else:
+                grp_fields['manf#_qty'] = sum(1 if q is None else q for q in qtys)
         grp.fields = grp_fields
 
     # Now return the list of identical part groups.
@@ -422,56 +622,133 @@ def remove_dnp_parts(components, variant):
     return accepted_components
 
 
+def group_parts_sharded(components, fields_merge, num_processes):
+    '''@brief Group the parts in a pool of processes, same result of `group_parts()`.
+       
+       The components are sharded by the hash fields of `group_parts()`, so
+       all the seemingly identical components are grouped in the same process.
+       The groups are merged back in the order of `group_parts()`: by the first
+       component of each seemingly identical group, the subgroups of a split
+       group in their order. Different of `group_parts()`, the merged fields
+       are not written back into `components`.
+       @param components Part components in a `dict()`, format given by the EDA modules.
+       @param fields_merge Data fields to be merged, same as `group_parts()`.
+       @param num_processes `int()` number of processes (and shards).
+       @return `list()` of groups, same as `group_parts()`.
+    '''
+    FIELDS_NOT_HASH = frozenset(fields_not_hash(fields_merge))
+
+    # Deal the seemingly identical groups to the shards in turn, keeping
+    # the components order inside each shard.
+    shards = [{} for _ in range(num_processes)]
+    group_index = {}
+    ref_group = {}
+    for ref, fields in components.items():
+        h = tuple(sorted((k, fields[k]) for k in fields if k not in FIELDS_NOT_HASH and SEPRTR not in k))
+        i = group_index.setdefault(h, len(group_index))
+        ref_group[ref] = i
+        shards[i % num_processes][ref] = fields
+    shards = [(shard, fields_merge) for shard in shards if shard]
+    logger.log(DEBUG_OVERVIEW, 'Grouping {} components in {} processes...'.format(len(components), len(shards)))
+
+    pool = Pool(len(shards), init_process, (dict(field_name_translations), list(distributor_dict.keys())))
+    try:
+        shards_groups = pool.map(group_parts_shard, shards)
+    finally:
+        pool.close()
+        pool.join()
+
+    # The sort is stable, so the subgroups of each group keep their order.
+    groups = [grp for shard_groups in shards_groups for grp in shard_groups]
+    groups.sort(key=lambda grp: ref_group[grp.refs[0]])
+    return groups
+
+
+def group_parts_shard(args):
+    '''@brief Group the parts of one shard of `group_parts_sharded()`.
+       @param args `tuple()` of the components and the fields to merge.
+       @return `list()` of groups.
+    '''
+    components, fields_merge = args
+    return group_parts(components, fields_merge)
+
+
+def init_process(translations, distributors):
+    '''@brief Initialize a process that reads BOM files or groups parts.
+       
+       Replicate in the process the field translations and the distributors
+       of the calling process, both are used to read and group the parts.
+       @param translations `dict()` of the field name translations.
+       @param distributors `list()` of the distributor names to keep.
+    '''
+    field_name_translations.clear()
+    field_name_translations.update(translations)
+    for d in list(distributor_dict.keys()):
+        if d not in distributors:
+            distributor_dict.pop(d, None)
+
+
+def regroup_parts(components, fields_merge, old_components, old_groups):
+    '''@brief Group the parts reusing the groups of a previous run.
+       
+       The components are compared by reference with the ones of the
+       previous run. Only the seemingly identical components (same hash
+       fields of `group_parts()`) of the added, removed or changed ones
+       are grouped again, all the other groups are kept as they were.
+       @param components Part components in a `dict()`, format given by the EDA modules.
+       @param fields_merge Data fields to be merged, same as `group_parts()`.
+       @param old_components Components given to `group_parts()` in the previous run,
+       before it merged the fields.
+       @param old_groups `list()` of groups returned by `group_parts()` in the previous run.
+       @return `list()` of groups, same as `group_parts()`.
+    '''
+    FIELDS_NOT_HASH = fields_not_hash(fields_merge)
+    def hash_key(fields):
+        return tuple(sorted((k, fields[k]) for k in fields if k not in FIELDS_NOT_HASH and SEPRTR not in k))
+
+    # Hash keys of the groups that changed, before and after the change.
+    changed_refs = [ref for ref in old_components if components.get(ref) != old_components[ref]]
+    changed_refs += [ref for ref in components if ref not in old_components]
+    changed_keys = set(hash_key(old_components[ref]) for ref in changed_refs if ref in old_components)
+    changed_keys.update(hash_key(components[ref]) for ref in changed_refs if ref in components)
+
+    groups = [grp for grp in old_groups if hash_key(old_components[grp.refs[0]]) not in changed_keys]
+    logger.log(DEBUG_OVERVIEW, '{} components changed, keeping {} of {} groups...'.format(
+                               len(changed_refs), len(groups), len(old_groups)))
+    components = {ref: fields for ref, fields in components.items() if hash_key(fields) in changed_keys}
+    if components:
+        groups += group_parts(components, fields_merge)
+    return groups
+
+
 def groups_sort(new_component_groups):
     '''@brief Order the groups in a alphabetical way.
        
        Put the components groups in the spreadsheet rows in a specific order
        using the reference string of the components. The order is defined
-       by BOM_ORDER.
+       by BOM_ORDER, see `groups_sort_key()`.
        @param components Part components in a `list()` of `dict()`, format given by the EDA modules.
        @return Same as input.
     '''
 
     logger.log(DEBUG_OVERVIEW, 'Sorting the groups for better visualization...')
+    return sorted(new_component_groups, key=groups_sort_key)
 
-    ref_identifiers = re.split('(?<![\W\*\/])\s*,\s*|\s*,\s*(?![\W\*\/])',
-                BOM_ORDER, flags=re.IGNORECASE)
-    component_groups_order_old = list( range(0,len(new_component_groups)) )
-    component_groups_order_new = list()
-    component_groups_refs = [new_component_groups[g].fields.get('reference') for g in component_groups_order_old]
-    logger.log(DEBUG_OBSESSIVE, 'All ref identifier: {}'.format(ref_identifiers) )
-    logger.log(DEBUG_OBSESSIVE, '{} groups of components.'.format(len(component_groups_order_old)) )
-    logger.log(DEBUG_OBSESSIVE, 'Identifiers founded {}.'.format(component_groups_refs) )
-    for ref_identifier in ref_identifiers:
-        component_groups_ref_match = [i for i in range(0,len(component_groups_refs)) if ref_identifier==component_groups_refs[i].lower()]
-        logger.log(DEBUG_OBSESSIVE, 'Identifier: {} in {}.'.format(ref_identifier, component_groups_ref_match) )
-        if len(component_groups_ref_match)>0:
-            # If found more than one group with the reference, use the 'manf#'
-            # as second order criteria.
-            if len(component_groups_ref_match)>1:
-                try:
-                    for item in component_groups_ref_match:
-                        component_groups_order_old.remove(item)
-                except ValueError:
-                    pass
-                # Examine 'manf#' and refs to get the order.
-                # Order by refs that have 'manf#' codes, that ones that don't have stay at the end of the group.
-                group_manf_list = [new_component_groups[h].fields.get('manf#') for h in component_groups_ref_match]
-                group_refs_list = [new_component_groups[h].refs for h in component_groups_ref_match]
-                sorted_groups = sorted(range(len(group_refs_list)), key=lambda k:(group_manf_list[k] is None,  group_refs_list[k]))
-                logger.log(DEBUG_OBSESSIVE, '{} > order: {}'.format( group_manf_list, sorted_groups) )
-                component_groups_ref_match = [component_groups_ref_match[i] for i in sorted_groups]
-                component_groups_order_new += component_groups_ref_match
-            else:
-                try:
-                    component_groups_order_old.remove(component_groups_ref_match[0])
-                except ValueError:
-                    pass
-                component_groups_order_new += component_groups_ref_match
-    # The new order is the found refs first and at the last the not referenced in BOM_ORDER.
-    component_groups_order_new += component_groups_order_old # Add the missing references groups.
-    new_component_groups = [new_component_groups[i] for i in component_groups_order_new]
-    return new_component_groups
+
+def groups_sort_key(group):
+    '''@brief Sort key of a components group, computed once per group.
+       
+       The groups are ordered by the rank of their reference identifier in
+       BOM_ORDER (the not referenced ones at the end), the ones with 'manf#'
+       codes first and then by the references, compared by prefix and
+       integer number (so 'R2' comes before 'R10').
+       @param group Components group with `refs` and `fields`.
+       @return `tuple()` to use as sort key.
+    '''
+    refs = sorted((prefix, key, num) for prefix, num, key, _ in map(parse_ref, group.refs))
+    identifier = PART_REF_REGEX.match(refs[0][0]).group('ref').lower() if refs else ''
+    return (BOM_ORDER_RANK.get(identifier, len(BOM_ORDER_RANK)),
+            group.fields.get('manf#') is None, tuple(refs))
 
 
 def subpartqty_split(components):
@@ -537,7 +814,8 @@ def subpartqty_split(components):
                 subparts_manf = ['']*subparts_qty
                 pass
 
-            logger.log(DEBUG_DETAILED, '{} >> {}'.format(part_ref, founded_fields) )
+            if logger.isEnabledFor(DEBUG_DETAILED):
+                logger.log(DEBUG_DETAILED, '{} >> {}'.format(part_ref, founded_fields) )
 
             # Second, if more than one subpart, split the sub parts as
             # new components with the same description, footprint, and
@@ -582,14 +860,14 @@ def subpartqty_split(components):
                                                     f=field_manf_dist_code, fl=field_manf_dist_code_prior,
                                                     c=p_manf_code, cl=p_manf_code_prior,
                                                     q=subpart_qty, ql=subpart_qty_prior,
-                                                    r=order_refs(list(components.keys()))
+                                                    r=part_ref
                                                 ))
                             subpart_qty_prior = subpart_qty
                             p_manf_code_prior = p_manf_code
                             field_manf_dist_code_prior = field_manf_dist_code
                             
                             subpart_actual[field_manf_dist_code] = subpart_part
-                            subpart_actual[field_manf_dist_code+'_qty'] = subpart_qty
+                            subpart_actual[field_manf_dist_code+'_qty'] = qty_number(subpart_qty)
                             logger.log(DEBUG_OBSESSIVE, subpart_actual)
                         except IndexError:
                             pass
@@ -621,14 +899,14 @@ def subpartqty_split(components):
                                                 f=field_manf_dist_code, fl=field_manf_dist_code_prior,
                                                 c=p_manf_code, cl=p_manf_code_prior,
                                                 q=part_qty, ql=part_qty_prior,
-                                                r=order_refs(list(components.keys()))
+                                                r=part_ref
                                             ))
                         part_qty_prior = part_qty
                         p_manf_code_prior = p_manf_code
                         field_manf_dist_code_prior = field_manf_dist_code
                         
                         part_actual[field_manf_dist_code] = part_part
-                        part_actual[field_manf_dist_code+'_qty'] = part_qty
+                        part_actual[field_manf_dist_code+'_qty'] = qty_number(part_qty)
                         logger.log(DEBUG_OBSESSIVE, part)
                         split_components[part_ref] = part_actual
                     except IndexError:
@@ -642,15 +920,16 @@ def subpartqty_split(components):
 def partgroup_qty(component):
     '''@brief Take the components grouped quantity.
        
-       Calculate the string of the quantity of the group parsing the
-       reference (design) quantity and the sub quantity (in case that
-       was a sub part of a manufacture/distributor code).
-       In the case of the multifiles BOM (and future revision of the
-       code) just use the 'manf#_qty' field that in `group_parts()`
-       recorded the quantities used in each project.
+       Calculate the string of the quantity of the group using the
+       'manf#_qty' field, where `group_parts()` summed the quantity of
+       the references (design) and sub quantities (in case that was a
+       sub part of a manufacture/distributor code). In the case of the
+       multifiles BOM it is a `list()` with the sum of each project.
        
        @param components Part component `dict()`, format given by the EDA modules.
-       @return Quantity of the manf# part used.
+       @return Formula `str()` of the manf# part used, to be formatted with
+       the board quantity cell. `list()` of them in the multifiles BOM case,
+       with `0` for the projects that don't use the part.
     '''
     try:
         qty = component.fields.get('manf#_qty')
@@ -662,20 +941,85 @@ def partgroup_qty(component):
             # each project read by the order. Do not `CEILING` because
             # this is will be made in the total columns that sum all
             # the quantities needed in all projects BOMs.
-            string = ['={{}}*({qp})'.format(qp=i) for i in qty]
+            string = ['={{}}*{}'.format(qty_formula(q)) if q else 0 for q in qty]
         else:
-            if qty != '1' and qty != None:
-                string = '=CEILING({{}}*({q})*{qty},1)'.format(
-                                q=qty,
-                                qty=len(component.refs))
+            if qty is None:
+                qty = len(component.refs)
+            if qty != int(qty):
+                string = '=CEILING({{}}*{},1)'.format(qty_formula(qty))
             else:
-                string = '={{}}*{qty}'.format(qty=len(component.refs))
+                string = '={{}}*{}'.format(qty_formula(qty))
     except (KeyError, TypeError):
         logger.log(DEBUG_OBSESSIVE, 'Qty>> {} \t {}'.format(component.refs, len(component.refs)) )
         string = '={{}}*{qty}'.format(qty=len(component.refs))
     return string
 
 
+def partgroup_qty_value(component, build_qty):
+    '''@brief Value of the `partgroup_qty()` formula.
+       
+       @param component Part group.
+       @param build_qty Quantity of boards, used in place of the board
+       quantity cell.
+       @return Quantity needed, `int()` or `float()`. `list()` of them in
+       the multifiles BOM case, not rounded up as the formulas.
+    '''
+    def number(qty):
+        # Exact quantities as the spreadsheet numbers.
+        qty = Fraction(qty)
+        return int(qty) if qty.denominator == 1 else float(qty)
+    try:
+        qty = component.fields.get('manf#_qty')
+        if isinstance(qty, list):
+            return [number(build_qty * Fraction(q)) if q else 0 for q in qty]
+        if qty is None:
+            qty = len(component.refs)
+        return int(math.ceil(build_qty * Fraction(qty)))
+    except (KeyError, TypeError):
+        return build_qty * len(component.refs)
+
+
+@lru_cache(maxsize=CODE_CACHE_SIZE)
+def qty_number(qty):
+    '''@brief Convert the quantity of a subpart in an exact number.
+       
+       ' 4.5' -> Fraction(9, 2)
+       '4/5' -> Fraction(4, 5)
+       '7' -> Fraction(7, 1)
+       
+       @param qty Quantity `str()` as returned by `manf_code_qtypart()`.
+       @return `Fraction()` of the quantity, 1 if not a valid number.
+    '''
+    try:
+        return Fraction(re.sub(r'\s', '', qty))
+    except (ValueError, ZeroDivisionError):
+        logger.warning('Not recognized quantity \"{}\", using 1.'.format(qty))
+        return Fraction(1)
+
+
+def qty_formula(qty):
+    '''@brief Write an exact quantity as a spreadsheet formula term.
+       
+       Fraction(7, 1) -> '7'
+       Fraction(5, 2) -> '2.5'
+       Fraction(4, 3) -> '4/3'
+       
+       @param qty `Fraction()` or `int()` quantity.
+       @return `str()` to use in the formulas.
+    '''
+    if qty.denominator == 1:
+        return str(qty.numerator)
+    # Use the decimal notation when it is exact.
+    d = qty.denominator
+    while d % 2 == 0:
+        d //= 2
+    while d % 5 == 0:
+        d //= 5
+    if d == 1:
+        return str(Decimal(qty.numerator) / Decimal(qty.denominator))
+    return '{}/{}'.format(qty.numerator, qty.denominator)
+
+
 def subpart_list(part):
     '''
     @brief Split the subpart by the `PART_SEPRTR`definition.
@@ -688,15 +1032,22 @@ def subpart_list(part):
     @param part Manufacture code part `str`.
     @return List of manufacture code parts.
     '''
-    return re.split(PART_SEPRTR, part.strip())
+    return list(split_subparts(part))
+
 
+@lru_cache(maxsize=CODE_CACHE_SIZE)
+def split_subparts(part):
+    '''@brief Memoized `subpart_list()`, return a `tuple()` that can't be modified by the caller.'''
+    return tuple(PART_SEPRTR_REGEX.split(part.strip()))
 
+
+@lru_cache(maxsize=CODE_CACHE_SIZE)
 def manf_code_qtypart(subpart):
     '''@brief Get the quantity and the part code of the sub part
        manufacture / distributor. Test if was pre or post
        multiplied by a constant.
        
-       Setting QTY_SEPRTR as '\:', we have
+       Setting QTY_SEPRTR as '\\:', we have
        ' 4.5 : ADUM3150BRSZ-RL7' -> ('4.5', 'ADUM3150BRSZ-RL7')
        '4/5  : ADUM3150BRSZ-RL7' -> ('4/5', 'ADUM3150BRSZ-RL7')
        '7:ADUM3150BRSZ-RL7' -> ('7', 'ADUM3150BRSZ-RL7')
@@ -707,13 +1058,12 @@ def manf_code_qtypart(subpart):
        @param Part that way have different than ONE quantity. Intended as one element of the list of `subpart_list()`.
        @return (qty, manf#) Quantity and the manufacture code.
     '''
-    subpart = re.sub(ESC_FIND, r'\1', subpart) # Remove any escape backslashes preceding PART_SEPRTR.
-    strings = re.split(QTY_SEPRTR, subpart)
+    subpart = ESC_FIND_REGEX.sub(r'\1', subpart) # Remove any escape backslashes preceding PART_SEPRTR.
+    strings = QTY_SEPRTR_REGEX.split(subpart)
     if len(strings)==2:
         # Search for numbers, matching with simple, frac and decimal ones.
-        num_format = re.compile("^\s*[\-\+]?\s*[0-9]*\s*[\.\/]*\s*?[0-9]*\s*$")
-        string0_test = re.match(num_format, strings[0])
-        string1_test = re.match(num_format, strings[1])
+        string0_test = QTY_NUM_REGEX.match(strings[0])
+        string1_test = QTY_NUM_REGEX.match(strings[1])
         if string0_test and not(string1_test):
             qty = strings[0].strip()
             part = strings[1].strip()
@@ -724,7 +1074,7 @@ def manf_code_qtypart(subpart):
             # May be founded a just numeric manufacture/distributor part,
             # in this case, the quantity is a shortest string not
             #considering "." and "/" marks.
-            if len(re.sub('[\.\/]','',strings[0])) < len(re.sub('[\.\/]','',strings[1])):
+            if len(QTY_MARKS_REGEX.sub('',strings[0])) < len(QTY_MARKS_REGEX.sub('',strings[1])):
                 qty = strings[0].strip()
                 part = strings[1].strip()
             else:
@@ -738,103 +1088,92 @@ def manf_code_qtypart(subpart):
     else:
         qty = '1'
         part = ''.join(strings)
-    logger.log(DEBUG_OBSESSIVE, 'part/qty>> {}\t\tpart>>{}\tqty>>'.format(subpart, part, qty) )
+    if logger.isEnabledFor(DEBUG_OBSESSIVE):
+        logger.log(DEBUG_OBSESSIVE, 'part/qty>> {}\t\tpart>>{}\tqty>>'.format(subpart, part, qty) )
     return qty, part
 
 
 def order_refs(refs, collapse=True):
     '''@brief Collapse list of part references into a sorted, comma-separated list of hyphenated ranges. This is intended as opposite of `split_refs()`
+       
+       The result is cached by the references, so ordering again the
+       same group (e.g. in a new spreadsheet) is a dictionary lookup.
        @param refs Designator/references `list()`.
+       @param collapse `bool()` Collapse the sequential references in ranges.
        @return References in a organized view way.
     '''
+    return order_refs_cached(tuple(refs), collapse)
 
-    def convert_to_ranges(nums):
-        # Collapse a list of numbers into sorted, comma-separated, hyphenated ranges.
-        # e.g.: 3,4,7,8,9,10,11,13,14 => 3,4,7-11,13,14
 
-        def get_refnum(refnum):
-            return int(re.match('\d+', refnum).group(0))
-
-        def to_int(n):
-            try:
-                return int(n)
-            except ValueError:
-                return n
-
-        nums.sort(key=get_refnum)  # Sort all the numbers.
-        nums = [to_int(n) for n in nums]  # Convert strings to `int` if possible.
-        num_ranges = []  # No ranges found yet since we just started.
-        range_start = 0  # First possible range is at the start of the list of numbers.
-
-        # Go through the list of numbers looking for 3 or more sequential numbers.
-        while range_start < len(nums):
-            num_range = nums[range_start]  # Current range starts off as a single number.
-            next_range_start = range_start + 1  # The next possible start of a range.
-            # Part references with subparts are never included in ref ranges.
-            if not isinstance(num_range, int):
-                num_ranges.append(num_range)
-                range_start = next_range_start
-                continue
-            # Look for sequences of three or more sequential numbers.
-            for range_end in range(range_start + 2, len(nums)):
-                if not isinstance(nums[range_end], int):
-                    break  # Ref with subpart, so can't be in a ref range.
-                if range_end - range_start != nums[range_end] - nums[range_start]:
-                    break  # Non-sequential numbers found, so break out of loop.
-                # Otherwise, extend the current range.
-                num_range = [nums[range_start], nums[range_end]]
-                # 3 or more sequential numbers found, so next possible range must start after this one.
-                next_range_start = range_end + 1
-            # Append the range (or single number) just found to the list of range.
-            num_ranges.append(num_range)
-            # Point to the start of the next possible range and keep looking.
-            range_start = next_range_start
-
-        return num_ranges
+@lru_cache(maxsize=REF_CACHE_SIZE)
+def order_refs_cached(refs, collapse):
+    '''@brief `order_refs()` of a `tuple()` of references.'''
 
     prefix_nums = {}  # Contains a list of numbers for each distinct prefix.
     for ref in refs:
         # Partition each part reference into its beginning part prefix and ending number.
-        match = re.search(PART_REF_REGEX, ref)
-        if match:
-            prefix = match.group('prefix')
-            num = match.group('num')
-        else:
-            # The not `match` happens when the user schematic designer use
-            # not recognized characters by the `PART_REF_REGEX` definition
-            # into the components references.
-            raise ValueError('Not recognized characters used in <' + ref + '> reference. Advise: edit it in your BOM/Schematic.')
-
+        prefix, num, key, value = parse_ref(ref)
         # Append the number to the list of numbers for this prefix, or create a list
         # with a single number if this is the first time a particular prefix was encountered.
-        prefix_nums.setdefault(prefix, []).append(num)
-
-    # Convert the list of numbers for each ref prefix into ranges.
-    if collapse:
-        for prefix in list(prefix_nums.keys()):
-            prefix_nums[prefix] = convert_to_ranges(prefix_nums[prefix])
-    else:
-        for prefix in list(prefix_nums.keys()):
-            def get_refnum(refnum):
-                return int(re.match('\d+', refnum).group(0))
-            prefix_nums[prefix].sort(key=get_refnum)
+        prefix_nums.setdefault(prefix, []).append((key, num, value))
 
     # Combine the prefixes and number ranges back into part references.
     collapsed_refs = []
     for prefix, nums in list(prefix_nums.items()):
-        for num in nums:
-            if isinstance(num, list):
-                # Convert a range list into a collapsed part reference:
+        nums.sort(key=lambda n: n[0])  # Sort all the numbers by their integers.
+        if not collapse or PART_SEQ_SEPRTR in prefix:
+            # A range of these prefixes would be ambiguous, e.g. 'TP-4-TP-6'.
+            collapsed_refs.extend(prefix + num for _, num, _ in nums)
+            continue
+        # Collapse the numbers into ranges in one pass: 3 or more sequential
+        # numbers become a range, e.g.: 3,4,7,8,9,10,11,13,14 => 3,4,7-11,13,14.
+        i, n = 0, len(nums)
+        while i < n:
+            value = nums[i][2]
+            if value is None:
+                # Part references with subparts are never included in ref ranges.
+                collapsed_refs.append(prefix + nums[i][1])
+                i += 1
+                continue
+            j = i + 1
+            while j < n and nums[j][2] == value + j - i:
+                j += 1
+            if j - i >= 3:
+                # Convert a range into a collapsed part reference:
                 # e.g., 'R10-R15' from 'R':[10,15].
-                collapsed_refs.append('{0}{1}{3}{0}{2}'.format(prefix, num[0], num[-1], PART_SEQ_SEPRTR))
+                collapsed_refs.append('{0}{1}{3}{0}{2}'.format(prefix, value, nums[j-1][2], PART_SEQ_SEPRTR))
             else:
                 # Convert a single number into a simple part reference: e.g., 'R10'.
-                collapsed_refs.append('{}{}'.format(prefix, num))
+                collapsed_refs.extend('{}{}'.format(prefix, nums[k][2]) for k in range(i, j))
+            i = j
 
     collapsed_refs = PART_NSEQ_SEPRTR.join( collapsed_refs )
     return collapsed_refs # Return the collapsed par references.
 
 
+def parse_ref(ref):
+    '''@brief Parse a designator/reference in its prefix and number.
+       
+       'R10' -> ('R', '10', (10,), 10)
+       'prj0:U2#1' -> ('prj0:U', '2#1', (2, 1), None)
+       
+       @param ref Designator/reference `str()`.
+       @return (prefix, number `str()`, `tuple()` of the integers of the number
+       used to sort (U2 < U2#1 < U2#10), number as `int()` or `None` if not
+       a plain integer).
+    '''
+    match = PART_REF_REGEX.search(ref)
+    if not match:
+        # The not `match` happens when the user schematic designer use
+        # not recognized characters by the `PART_REF_REGEX` definition
+        # into the components references.
+        raise ValueError('Not recognized characters used in <' + ref + '> reference. Advise: edit it in your BOM/Schematic.')
+    num = match.group('num')
+    value = int(num) if num.isdigit() else None
+    key = tuple(int(n) for n in REF_NUMS_REGEX.findall(num))
+    return match.group('prefix'), num, key, value
+
+
 def split_refs(text):
     '''@brief Split string grouped references into a unique designator. This is intended as opposite of `order_refs(?, collapse=True)`
        
@@ -847,47 +1186,63 @@ def split_refs(text):
        @param text Designator/references worn by a group of parts.
        @return Designator/references `list()` split.
     '''
-    partial_ref = re.split(' *[,; ] *', text) # Split ignoring the spaces.
+    partial_ref = SPLIT_REFS_REGEX.split(text) # Split ignoring the spaces.
     refs = []
     for ref in partial_ref:
         # Remove invalid characters. Changed `PART_REF_REGEX_SPECIAL_CHAR_REF` definition and allowed special characters.
-        #ref = re.sub('\+$', 'p', ref) # Finishing "+".
-        ref = re.sub(PART_REF_REGEX_NOT_ALLOWED, '', ref) # Generic special characters not allowed. To work around #ISSUE #89.
-        #ref = re.sub('\-+', '-', ref) # Double "-".
-        #ref = re.sub('^\-', '', ref) # Starting "-".
-        #ref = re.sub('\-$', 'n', ref) # Finishing "-".
-        if re.search('^\w+\d', ref):
-            if re.search('-', ref):
-                designator_name = re.findall('^\D+', ref)[0]
-                split_nums = re.split('-', ref)
-                designator_name += ''.join( re.findall('^d*\W', split_nums[0] ) )
-                split_nums = [re.sub(designator_name,'',split_nums[i]) for i in range(len(split_nums))]
-                
-                # Some EDAs may use some separator in the reference numeric parts, as
-                # Altium that use "." (or even other) e.g. "R2.1,R2.2" to the same "R2"
-                # replicated between schematics / rooms.
-                base_split_nums = ''.join( re.findall('^\d+\D', split_nums[0]) )
-                split_nums = [''.join( re.findall('\D*(\d+)$', n) ) for n in split_nums]
-                
-                split = list( range( int(split_nums[0]), int(split_nums[1])+1 ) )
-                #split = [designator_name+str(split[i]) for i in range(len(split)) ]
-                split = [designator_name +base_split_nums+str(split[i]) for i in range(len(split)) ]
-                
-                refs += split
-            elif re.search('[/\\\]', ref):
-                designator_name = re.findall('^\D+',ref)[0]
-                split_nums = [re.sub('^'+designator_name, '', i) for i in re.split('[/\\\]',ref)]
-                refs += [designator_name+i for i in split_nums]
-            else:
-                refs += [ref.strip()]
-        else:
-            # The designator name is not for a group of components and 
-            # "\", "/" or "-" is part of the name. This characters have
-            # to be removed.
-            ref = re.sub('[\-\/\\\]', '', ref.strip())
-            if not re.search(PART_REF_REGEX, ref).group('num'):
-                # Add a '0' number at the end to be compatible with KiCad/KiCost
-                # ref strings. This may be missing in the hand made BoM.
-                ref += '0'
-            refs += [ref]
+        ref = PART_REF_NOT_ALLOWED_REGEX.sub('', ref).strip() # Generic special characters not allowed. To work around #ISSUE #89.
+        if GROUPED_REF_REGEX.search(ref) and REF_NUM_SEPRTR_REGEX.search(ref):
+            # List of numbers of the same prefix, e.g. 'C17/18/19'.
+            split_nums = REF_NUM_SEPRTR_REGEX.split(ref)
+            prefix = parse_ref(split_nums[0])[0]
+            refs += [split_nums[0]] + [prefix + n if n[:1].isdigit() else n for n in split_nums[1:]]
+            continue
+        split = split_ref_range(ref)
+        if split:
+            refs += split
+            continue
+        # The designator name is not for a group of components and
+        # "\" or "/" is part of the name. This characters have to be
+        # removed ("-" is allowed in the references, e.g. 'TP-5').
+        ref = REF_NUM_SEPRTR_REGEX.sub('', ref)
+        if not parse_ref(ref)[1]:
+            # Add a '0' number at the end to be compatible with KiCad/KiCost
+            # ref strings. This may be missing in the hand made BoM.
+            ref += '0'
+        refs.append(ref)
     return refs
+
+
+def split_ref_range(ref):
+    '''@brief Split a range of references, as made by `order_refs()`.
+       
+       'D33-D36' or 'D33-36' --> ['D33','D34','D35','D36']
+       'TP-5-TP-7' --> ['TP-5','TP-6','TP-7']
+       'R2.1-R2.3' --> ['R2.1','R2.2','R2.3'] (Altium room replicated "R2")
+       The first reference and the last one are decoded by `parse_ref()`,
+       trying each `PART_SEQ_SEPRTR` until both sides are a reference of the
+       same prefix (or the last one just a number).
+       @param ref Designator/reference `str()`.
+       @return Designator/references `list()`, empty if `ref` is not a range.
+    '''
+    start = ref.find(PART_SEQ_SEPRTR)
+    while start > 0:
+        first, last = ref[:start], ref[start + 1:]
+        start = ref.find(PART_SEQ_SEPRTR, start + 1)
+        try:
+            prefix, num, key, _ = parse_ref(first)
+            if last.isdigit():
+                last_key = key[:-1] + (int(last),)
+            else:
+                last_prefix, last_num, last_key, _ = parse_ref(last)
+                if last_prefix != prefix or last_prefix + last_num != last:
+                    continue
+        except ValueError:
+            continue
+        if (prefix + num != first or not key or SUB_SEPRTR in num or SUB_SEPRTR in last
+                or len(last_key) != len(key) or last_key[:-1] != key[:-1]):
+            continue
+        # Only the last integer of the number changes, e.g. 'R2.1-R2.3'.
+        base = num[:-len(REF_NUMS_REGEX.findall(num)[-1])]
+        return [prefix + base + str(n) for n in range(key[-1], last_key[-1] + 1)]
+    return []
@@ -42,7 +42,9 @@ from __future__ import print_function
 # Libraries.
 import sys, os
 import pprint
+import copy
 import tqdm
+from multiprocessing import Pool, cpu_count # Read multiple BOM files in parallel.
 
 # Stops UnicodeDecodeError exceptions.
 try:
@@ -54,6 +56,7 @@ except NameError:
 __all__ = ['kicost','output_filename']  # Only export this routine for use by the outside world.
 
 from .global_vars import *
+from . import __version__
 
 # TODO this 2 imports above should be removed. `kicost.py` should just import a single function that deal with all API/Scrapes/local inside
 #from .distributors.api_octopart import api_octopart
@@ -66,25 +69,34 @@ from .distributors.global_vars import distributors_modules_dict
 # Import information for various EDA tools.
 from .edas.tools import field_name_translations
 from .edas import eda_modules
-from .edas.tools import subpartqty_split, group_parts, PRJ_STR_DECLARE, PRJPART_SPRTR
+from .edas.tools import subpartqty_split, group_parts, group_parts_sharded, regroup_parts, init_process
+from .edas.tools import PRJ_STR_DECLARE, PRJPART_SPRTR, GROUP_SHARD_MIN_COMPONENTS
+from .edas.bom_cache import bom_cache_key, bom_cache_load, bom_cache_save, state_load, state_save
 # Import information about various distributors.
 from .distributors.distributor import *
 from .distributors.global_vars import distributor_dict
 # Creation of the final XLSX spreadsheet.
 from .spreadsheet import *
+# Creation of the other output formats.
+from .outputs import output_modules
+from .outputs.tools import output_file_name
 
 def kicost(in_file, eda_name, out_filename,
         user_fields, ignore_fields, group_fields, translate_fields,
         variant,
         dist_list=list(distributor_dict.keys()),
-        collapse_refs=True, supress_cat_url=True, currency=DEFAULT_CURRENCY):
+        collapse_refs=True, supress_cat_url=True, currency=DEFAULT_CURRENCY,
+        num_processes=None, use_cache=True, incremental=False, part_details='comments',
+        out_formats=None):
     ''' @brief Run KiCost.
     
     Take a schematic input file and create an output file with a cost spreadsheet in xlsx format.
     
     @param in_file `list(str())` List of the names of the input BOM files.
     @param eda_name `list(str())` of the EDA modules to be used to open the `in_file`list.
-    @param out_filename `str()` XLSX output file name.
+    @param out_filename `str()` XLSX output file name or a binary file object, e.g.
+    `io.BytesIO()`, where the only output format asked is written (in memory,
+    without temporary files). The file object is not closed.
     @param user_fields `list()` of the user fields to be included on the spreadsheet global part.
     @param ignore_fields `list()` of the fields to be ignored on the read EDA modules.
     @param group_fields `list()` of the fields to be grouped/merged on the function group parts that
@@ -98,6 +110,21 @@ def kicost(in_file, eda_name, out_filename,
     @param collapse_refs `bool()` Suppress the distributors catalogue links into the catalogue code in the spreadsheet.
     Default `True`.
     @param currency `str()` Currency in ISO4217. Default 'USD'.
+    @param num_processes `int()` Maximum number of processes used to read the multiple
+    BOM files and to group the parts of big designs. Default `None`, use the number of CPUs.
+    `1` do all in this process.
+    @param use_cache `bool()` Reuse the parsed BOM files cached on disk when the file content
+    and the read options are the same of a previous run. Default `True`.
+    @param incremental `bool()` Reuse the groups and the distributors data of the previous
+    run with the same `out_filename` and options. Only the groups with changed components
+    are created again and only the parts with new codes, or with data older than
+    `PRICING_MAX_AGE`, are scraped. Default `False`.
+    @param part_details `str()` where to write the price breaks and extra distributor
+    information of each part: 'comments' in the cells (default), 'sheet' in a separated
+    worksheet or 'none', faster and smaller on big BOMs.
+    @param out_formats `list(str())` of the output formats, keys of `output_modules`:
+    'xlsx' (the cost spreadsheet), 'jsonl', 'csv' or 'parquet'. The other formats are
+    written in `out_filename` with their extension. Default `None`, just 'xlsx'.
     '''
 
     # Add or remove field translations, ignore in case the trying to
@@ -117,6 +144,13 @@ def kicost(in_file, eda_name, out_filename,
             else:
                 field_name_translations.pop(translate_fields[c].lower(), None)
 
+    # A file object receives just one output and has no name to keep the state.
+    if hasattr(out_filename, 'write'):
+        if len(out_formats or ['xlsx'])>1:
+            raise Exception('Just one output format can be written to a file object.')
+        if incremental:
+            raise Exception('The incremental mode needs an output file name.')
+
     # Check the integrity of the user personal fields, this should not
     # be any of the reserved fields.
     # This is checked after the translation `dict` is complete, so an
@@ -157,30 +191,8 @@ def kicost(in_file, eda_name, out_filename,
         eda_name = [eda_name[0]] * len(in_file) #Assume the first as default.
 
     # Get groups of identical parts.
-    parts = dict()
-    prj_info = list()
-    for i_prj in range(len(in_file)):
-        eda_module = eda_modules[eda_name[i_prj]]
-        p, info = eda_module.get_part_groups(in_file[i_prj], ignore_fields, variant[i_prj])
-        p = subpartqty_split(p)
-        # In the case of multiple BOM files, add the project prefix identifier
-        # to each reference/designator. Use the field 'manf#_qty' to control
-        # each quantity goes to each project creating a `list()` with length
-        # of number of BOM files. This vector will be used in the `group_parts()`
-        # to create groups with elements of same 'manf#' that came for different
-        # projects.
-        if len(in_file)>1:
-            logger.log(DEBUG_OVERVIEW, 'Multi BOMs detected, attaching project identification to references...')
-            qty_base = ['0'] * len(in_file) # Base zero quantity vector.
-            for p_ref in list(p.keys()):
-                try:
-                    qty_base[i_prj] = p[p_ref]['manf#_qty']
-                except:
-                    qty_base[i_prj] = '1'
-                p[p_ref]['manf#_qty'] = qty_base.copy()
-                p[ PRJ_STR_DECLARE + str(i_prj) + PRJPART_SPRTR + p_ref] = p.pop(p_ref)
-        parts.update( p.copy() )
-        prj_info.append( info.copy() )
+    num_processes = num_processes or cpu_count()
+    parts, prj_info = read_boms(in_file, eda_name, ignore_fields, variant, use_cache, num_processes)
 
     # Group part out of the module to be possible to merge different
     # project lists, ignore some field to merge given in the `group_fields`.
@@ -207,7 +219,24 @@ def kicost(in_file, eda_name, out_filename,
                                     # and 'var' ('variant') fields, merging
                                     # the components in groups.
     group_fields = set(group_fields)
-    parts = group_parts(parts, group_fields)
+    if incremental:
+        # Reuse the state of the last run only if made with the same options.
+        options = (__version__, sorted(group_fields), sorted(distributor_dict.keys()),
+                   sorted(field_name_translations.items()), currency)
+        state = state_load(out_filename)
+        if state is not None and state['options'] != options:
+            logger.log(DEBUG_OVERVIEW, 'Options changed from the last run, grouping all parts...')
+            state = None
+        components = {ref: dict(fields) for ref, fields in parts.items()} # Before `group_parts()` merge the fields.
+    if incremental and state is not None:
+        parts = regroup_parts(parts, group_fields, state['components'], state['groups'])
+    elif num_processes > 1 and len(parts) >= GROUP_SHARD_MIN_COMPONENTS:
+        # Big designs (e.g. many BOM files) are grouped in parallel.
+        parts = group_parts_sharded(parts, group_fields, num_processes)
+    else:
+        parts = group_parts(parts, group_fields)
+    if incremental:
+        groups = copy.deepcopy(parts) # Before the distributors modules fill them.
 
     # If do not have the manufacture code 'manf#' and just distributors codes,
     # check if is asked to scrape a distributor that do not have any code in the
@@ -235,47 +264,144 @@ def kicost(in_file, eda_name, out_filename,
     if dist_list:
         # Set part info to default blank values for all the distributors.
         for part in parts:
-            # These bellow variable are all the data the each distributor/local API/scrap module needs to fill.
-            part.part_num = {dist: '' for dist in dist_list} # Ditributor catalogue number.
-            part.url = {dist: '' for dist in dist_list} # Purchase distributor URL for the spefic part.
-            part.price_tiers = {dist: {} for dist in dist_list} # Price break tiers; [[qty1, price1][qty2, price2]...]
-            part.qty_avail = {dist: None for dist in dist_list} # Available quantity.
-            part.qty_increment = {dist: None for dist in dist_list}
-            part.info_dist = {dist: {} for dist in dist_list}
-            part.currency = {dist: DEFAULT_CURRENCY for dist in dist_list} # Default currency.
-            part.moq = {dist: 1 for dist in dist_list} # Minimum order quantity allowd by the distributor.
+            # All the data the each distributor/local API/scrap module needs to fill.
+            part.offers = {dist: DistributorOffer() for dist in dist_list}
         #distributor.get_dist_parts_info(parts, distributor_dict, dist_list, currency)
         #TODO The calls bellow should became the call above of just one function in the `distributors` pachage/folder.
         #distributor_class.get_dist_parts_info(parts, distributor_dict, currency) #TODOlocal_template.query_part_info(parts, distributor_dict, currency)
         dist_local_template.query_part_info(parts, distributor_dict, currency)
-        api_partinfo_kitspace.query_part_info(parts, distributor_dict, currency)
+        query_parts = parts
+        restored = {} # Data reused, saved again with the time it was scraped.
+        if incremental and state is not None:
+            # Do not scrape again the codes scraped in the last run, while
+            # not older than `PRICING_MAX_AGE`.
+            query_parts = []
+            for part in parts:
+                key = pricing_key(part, distributor_dict)
+                pricing = state['pricing'].get(key)
+                if pricing is None or pricing_expired(pricing):
+                    query_parts.append(part)
+                else:
+                    pricing_restore(part, pricing)
+                    restored[key] = pricing
+            logger.log(DEBUG_OVERVIEW, 'Reusing the distributors data of {} of {} parts...'.format(
+                                       len(parts) - len(query_parts), len(parts)))
+        api_partinfo_kitspace.query_part_info(query_parts, distributor_dict, currency)
+
+    # Create the part pricing spreadsheet and the other outputs asked.
+    for out_format in out_formats or ['xlsx']:
+        out_module = output_modules[out_format]
+        if out_format=='xlsx' or hasattr(out_filename, 'write'):
+            out_file = out_filename
+        else:
+            out_file = output_file_name(out_filename, out_module.EXTENSION)
+        out_module.create_output(parts, prj_info, out_file,
+                      currency, collapse_refs, supress_cat_url,
+                      user_fields, '-'.join(variant) if len(variant)>1 else variant[0],
+                      part_details)
 
-    # Create the part pricing spreadsheet.
-    create_spreadsheet(parts, prj_info, out_filename, currency, collapse_refs, supress_cat_url,
-                      user_fields, '-'.join(variant) if len(variant)>1 else variant[0])
+    if incremental:
+        pricing = {}
+        if dist_list:
+            for part in parts:
+                key = pricing_key(part, distributor_dict)
+                pricing[key] = restored.get(key) or pricing_save(part, distributor_dict)
+        state_save(out_filename, {'options': options, 'components': components,
+                                  'groups': groups, 'pricing': pricing})
 
     # Print component groups for debugging purposes.
     if logger.isEnabledFor(DEBUG_DETAILED):
         for part in parts:
-            for f in dir(part):
-                if f.startswith('__'):
-                    continue
-                elif f.startswith('html_trees'):
-                    continue
-                else:
-                    print('{} = '.format(f), end=' ')
-                    try:
-                        pprint.pprint(part.__dict__[f])
-                    except TypeError:
-                        # Python 2.7 pprint has some problem ordering None and strings.
-                        print(part.__dict__[f])
-                    except KeyError:
-                        pass
+            for f in part.__slots__:
+                print('{} = '.format(f), end=' ')
+                try:
+                    pprint.pprint(getattr(part, f))
+                except TypeError:
+                    # Python 2.7 pprint has some problem ordering None and strings.
+                    print(getattr(part, f))
             print()
 
 
 
 
+def read_bom(args):
+    ''' @brief Read one BOM file and split its subparts.
+    
+    The result is cached on disk by the content of the file and the
+    read options, so an unchanged BOM is not parsed again.
+    @param args `tuple()` of the input file name, EDA module name, fields to ignore,
+    variant and if use the cache.
+    @return (parts, prj_info) as returned by the EDA module, with the subparts split.
+    '''
+    in_file, eda_name, ignore_fields, variant, use_cache = args
+    if use_cache:
+        key = bom_cache_key(in_file, eda_name, ignore_fields, variant)
+        bom = bom_cache_load(key)
+        if bom is not None:
+            return bom
+    p, info = eda_modules[eda_name].get_part_groups(in_file, ignore_fields, variant)
+    bom = (subpartqty_split(p), info)
+    if use_cache:
+        bom_cache_save(key, bom)
+    return bom
+
+
+def read_boms(in_file, eda_name, ignore_fields, variant, use_cache=True, num_processes=None):
+    ''' @brief Read the BOM files and merge their parts.
+
+    The BOM files are independent, so in the multi BOMs case they are read
+    in a pool of processes. `map()` keeps the results in the input order.
+    @param in_file `list()` of the input file names.
+    @param eda_name `list()` of the EDA module names, one by file.
+    @param ignore_fields `list()` of the fields to ignore.
+    @param variant `list()` of the variants, one by file.
+    @param use_cache If use the cache of the read BOM files.
+    @param num_processes `int()` Maximum number of processes, the number of CPUs if `None`.
+    @return (parts, prj_info) with the parts of all the files, in the input
+    order, and the information of each project. With multiple files the
+    references have the project prefix and 'manf#_qty' is a `list()` of
+    the quantity of each project.
+    '''
+    num_processes = num_processes or cpu_count()
+    bom_args = [(in_file[i_prj], eda_name[i_prj], ignore_fields, variant[i_prj], use_cache) for i_prj in range(len(in_file))]
+    read_processes = min(num_processes, len(in_file))
+    if read_processes > 1:
+        logger.log(DEBUG_OVERVIEW, 'Reading {} BOM files in {} processes...'.format(len(in_file), read_processes))
+        pool = Pool(read_processes, init_process, (dict(field_name_translations), list(distributor_dict.keys())))
+        try:
+            boms = pool.map(read_bom, bom_args)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        boms = [read_bom(a) for a in bom_args]
+    parts = dict()
+    prj_info = list()
+    for i_prj in range(len(in_file)):
+        p, info = boms[i_prj]
+        # In the case of multiple BOM files, add the project prefix identifier
+        # to each reference/designator. Use the field 'manf#_qty' to control
+        # each quantity goes to each project creating a `list()` with length
+        # of number of BOM files. This vector will be used in the `group_parts()`
+        # to create groups with elements of same 'manf#' that came for different
+        # projects.
+        if len(in_file)>1:
+            logger.log(DEBUG_OVERVIEW, 'Multi BOMs detected, attaching project identification to references...')
+            qty_base = [0] * len(in_file) # Base zero quantity vector.
+            for p_ref in list(p.keys()):
+                try:
+                    qty_base[i_prj] = p[p_ref]['manf#_qty']
+                except:
+                    qty_base[i_prj] = 1
+                p[p_ref]['manf#_qty'] = qty_base.copy()
+                p[ PRJ_STR_DECLARE + str(i_prj) + PRJPART_SPRTR + p_ref] = p.pop(p_ref)
+        parts.update( p.copy() )
+        prj_info.append( info.copy() )
+    return parts, prj_info
+
+
+
+
 FILE_OUTPUT_MAX_NAME = 10 # Maximum length of the name of the spreadsheet output
                           # generate, this is used in the multifiles to limit the
                           # automatic name generation.
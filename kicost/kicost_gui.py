@@ -307,20 +307,12 @@ class formKiCost(formKiCost_raw):
         sbSizer31.Add(self.m_listBox_edatool, 1, wx.ALL|wx.EXPAND, 5)
         bSizer6.Add(sbSizer31, 1, wx.TOP|wx.RIGHT|wx.EXPAND, 5)
 
-        # Allow convert to XLSX to ODS quietly because this load more smoothly on LibreOffice.
+        # Allow write the ODS spreadsheet because this load more smoothly on LibreOffice.
         self.m_checkBox_XLSXtoODS = wx.CheckBox(self.m_panel1, wx.ID_ANY, u"Convert to ODS", wx.DefaultPosition, wx.DefaultSize, 0)
         self.m_checkBox_XLSXtoODS.SetValue(False)
-        self.m_checkBox_XLSXtoODS.SetToolTip(wx.ToolTip(u"Convert the file output to ODS format quietly."))
+        self.m_checkBox_XLSXtoODS.SetToolTip(wx.ToolTip(u"Write the file output in the ODS format, in place of the XLSX."))
         self.m_checkBox_XLSXtoODS.Bind(wx.EVT_CHECKBOX, self.updateOutputFilename)
         bSizer6.Add(self.m_checkBox_XLSXtoODS, 0, wx.ALL, 5)
-        self.m_checkBox_XLSXtoODS.Enable(False)
-        try:
-            # Create a control to convert the XLSX to ODS quietly.
-            subprocess.check_output(['libreoffice', '--version'])
-            self.m_checkBox_XLSXtoODS.Enable() # Recognized LibreOffice.
-        except OSError:
-            logger.log(DEBUG_OBSESSIVE, 'LibreOffice not found.')
-            self.m_checkBox_XLSXtoODS.SetValue(False)
 
         self.m_checkBox_openSpreadsheet = wx.CheckBox(self.m_panel1, wx.ID_ANY, u"Open spreadsheet", wx.DefaultPosition, wx.DefaultSize, 0)
         self.m_checkBox_openSpreadsheet.SetValue(True)
@@ -653,7 +645,7 @@ class formKiCost(formKiCost_raw):
             style = wx.FD_SAVE | wx.FD_CHANGE_DIR)
         if dlg.ShowModal() == wx.ID_OK:
             spreadsheet_file = dlg.GetPaths()[0]
-            if not re.search('^.(xlsx|odt)$', os.path.splitext(spreadsheet_file)[1], re.IGNORECASE):
+            if not re.search('^.(xlsx|ods)$', os.path.splitext(spreadsheet_file)[1], re.IGNORECASE):
                 spreadsheet_file += ('.ods' if self.m_checkBox_XLSXtoODS.GetValue() else '.xlsx')
             self.m_text_saveas.SetValue(spreadsheet_file)
         dlg.Destroy()
@@ -722,6 +714,12 @@ class formKiCost(formKiCost_raw):
                     return
         spreadsheet_file = os.path.splitext(spreadsheet_file)[0] + '.xlsx' # Force the output (for the CLI interface) to be .XLSX.
         args.output = spreadsheet_file
+        # The ODS spreadsheet is written directly, with the same name.
+        if self.m_checkBox_XLSXtoODS.GetValue():
+            args.format = ['ods']
+            spreadsheet_file = os.path.splitext(spreadsheet_file)[0] + '.ods'
+        else:
+            args.format = ['xlsx']
 
         if self.m_textCtrl_extraCmd.GetValue():
             extra_commands = ' ' + self.m_textCtrl_extraCmd.GetValue()
@@ -783,7 +781,8 @@ class formKiCost(formKiCost_raw):
                 user_fields=args.fields, ignore_fields=args.ignore_fields,
                 group_fields=args.group_fields, translate_fields=args.translate_fields,
                 variant=args.variant,
-                dist_list=args.include, currency=args.currency)
+                dist_list=args.include, currency=args.currency,
+                out_formats=args.format)
         except Exception as e:
             logger.log(DEBUG_OVERVIEW, e)
             self.m_button_run.Enable()
@@ -791,16 +790,6 @@ class formKiCost(formKiCost_raw):
         finally:
             init_distributor_dict() # Restore distributors removed during the execution of KiCost motor.
         logger.log(DEBUG_OVERVIEW, 'Elapsed time: {} seconds'.format(time.time() - start_time))
-        try:
-            if self.m_checkBox_XLSXtoODS.GetValue():
-                logger.log(DEBUG_OVERVIEW, 'Converting \'{}\' to ODS file...'.format(
-                                    os.path.basename(spreadsheet_file) ) )
-                os.system('libreoffice  --headless --convert-to ods {i} --outdir {o}'.format(si=preadsheet_file, o=os.path.dirname(spreadsheet_file)))
-                #os.remove(spreadsheet_file) # Delete the older file.
-                spreadsheet_file = os.path.splitext(spreadsheet_file)[0] + '.ods'
-        except Exception as e:
-            logger.log(DEBUG_OVERVIEW, '\'{}\' could be not converted to ODS: {}'.format(os.path.basename(spreadsheet_file), e) )
-            pass
         try:
             if self.m_checkBox_openSpreadsheet.GetValue():
                 logger.log(DEBUG_OVERVIEW, 'Opening the output file \'{}\'...'.format(
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+# MIT license
+#
+# Copyright (C) 2019 by XESS Corporation / Hildo Guillardi Júnior
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+# Author information.
+__author__ = 'Hildo Guillardi Junior'
+__webpage__ = 'https://github.com/hildogjr/'
+__company__ = 'University of Campinas - Brazil'
+
+
+# CSV report of the costs, one row by part and distributor offer.
+
+# Libraries.
+import csv
+from ..global_vars import logger, DEBUG_OVERVIEW, DEFAULT_CURRENCY
+from .tools import open_text_output, part_records, offer_rows, offer_columns
+
+__all__ = ['create_output']
+
+EXTENSION = '.csv'
+
+
+def create_output(parts, prj_info, out_filename, currency=DEFAULT_CURRENCY,
+                  collapse_refs=True, supress_cat_url=True, user_fields=None, variant=None,
+                  part_details='comments'):
+    ''' @brief Write the parts and their costs as CSV.
+
+    The rows are the ones of `offer_rows()`, with a header of the column names.
+    The arguments are the ones of `create_spreadsheet()`, the ones of the
+    spreadsheet layout are not used.
+    @param parts `list()` of the part groups, with the distributors offers.
+    @param out_filename `str()` name of the output file or a binary file object.
+    '''
+    logger.log(DEBUG_OVERVIEW, 'Writing the CSV report \'{}\'...'.format(out_filename))
+    with open_text_output(out_filename, newline='') as f:
+        writer = csv.DictWriter(f, offer_columns(parts, user_fields))
+        writer.writeheader()
+        writer.writerows(offer_rows(part_records(parts, currency, collapse_refs, user_fields)))
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+# MIT license
+#
+# Copyright (C) 2019 by XESS Corporation / Hildo Guillardi Júnior
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+# Author information.
+__author__ = 'Hildo Guillardi Junior'
+__webpage__ = 'https://github.com/hildogjr/'
+__company__ = 'University of Campinas - Brazil'
+
+
+# JSON Lines report of the costs, one JSON object by part.
+
+# Libraries.
+import json
+from ..global_vars import logger, DEBUG_OVERVIEW, DEFAULT_CURRENCY
+from .tools import open_text_output, part_records
+
+__all__ = ['create_output']
+
+EXTENSION = '.jsonl'
+
+
+def create_output(parts, prj_info, out_filename, currency=DEFAULT_CURRENCY,
+                  collapse_refs=True, supress_cat_url=True, user_fields=None, variant=None,
+                  part_details='comments'):
+    ''' @brief Write the parts and their costs as JSON Lines.
+
+    Each line is the `dict()` of a part from `part_records()`, with its offers.
+    The arguments are the ones of `create_spreadsheet()`, the ones of the
+    spreadsheet layout are not used.
+    @param parts `list()` of the part groups, with the distributors offers.
+    @param out_filename `str()` name of the output file or a binary file object.
+    '''
+    logger.log(DEBUG_OVERVIEW, 'Writing the JSON Lines report \'{}\'...'.format(out_filename))
+    with open_text_output(out_filename) as f:
+        for record in part_records(parts, currency, collapse_refs, user_fields):
+            f.write(json.dumps(record, ensure_ascii=False, sort_keys=True) + u'\n')
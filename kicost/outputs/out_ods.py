@@ -0,0 +1,549 @@
+# -*- coding: utf-8 -*-
+# MIT license
+#
+# Copyright (C) 2019 by XESS Corporation / Hildo Guillardi Júnior
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+# Author information.
+__author__ = 'Hildo Guillardi Junior'
+__webpage__ = 'https://github.com/hildogjr/'
+__company__ = 'University of Campinas - Brazil'
+
+
+# OpenDocument spreadsheet (ODS), the same spreadsheet of `create_spreadsheet()`
+# written without LibreOffice. `OdsWorkbook` implements the part of the
+# XlsxWriter interface used by `create_spreadsheet()` and translates the
+# Excel formulas and formats to the OpenDocument ones.
+
+# Libraries.
+import os
+import io
+import re
+import shutil
+import tempfile
+import zipfile
+from xml.sax.saxutils import escape
+from xlsxwriter.utility import xl_rowcol_to_cell
+from ..global_vars import DEFAULT_CURRENCY
+from ..spreadsheet import create_spreadsheet
+
+__all__ = ['create_output', 'OdsWorkbook', 'ods_formula']
+
+EXTENSION = '.ods'
+
+MIMETYPE = 'application/vnd.oasis.opendocument.spreadsheet'
+DEFAULT_COL_WIDTH = 8.43 # Excel default column width, in characters.
+
+# Named colors accepted by XlsxWriter.
+COLORS = {
+    'black': '#000000', 'blue': '#0000FF', 'brown': '#800000',
+    'cyan': '#00FFFF', 'gray': '#808080', 'green': '#008000',
+    'lime': '#00FF00', 'magenta': '#FF00FF', 'navy': '#000080',
+    'orange': '#FF6600', 'pink': '#FF00FF', 'purple': '#800080',
+    'red': '#FF0000', 'silver': '#C0C0C0', 'white': '#FFFFFF',
+    'yellow': '#FFFF00',
+}
+ALIGN = {'left': 'start', 'center': 'center', 'right': 'end'}
+VALIGN = {'top': 'top', 'vcenter': 'middle', 'bottom': 'bottom'}
+CF_OPERATORS = {'==': '=', '!=': '!=', '<': '<', '>': '>', '<=': '<=', '>=': '>='}
+
+# Tokens of the Excel formulas that change in OpenFormula: strings (copied as
+# they are), cell references or ranges, function names and argument separators.
+FORMULA_TOKEN_REGEX = re.compile(r'("(?:[^"]|"")*")'
+                                 r'|(?<![\w.$])(\$?[A-Z]{1,3}\$?\d+)(?::(\$?[A-Z]{1,3}\$?\d+))?(?![\w(])'
+                                 r'|([A-Za-z_][\w.]*)(?=\()'
+                                 r'|(,)')
+# Reference to a cell or range of a worksheet, as used by `define_name()`.
+SHEET_REF_REGEX = re.compile(r"^=?(?:'((?:[^']|'')+)'|([^!]+))!(\$?[A-Z]{1,3}\$?\d+)(?::(\$?[A-Z]{1,3}\$?\d+))?$")
+# Excel number formats translated: prefix, integer part, decimal part and suffix.
+NUM_FORMAT_REGEX = re.compile(r'^(.*?)(#,##0|0)(?:\.(0+))?(.*)$')
+
+NAMESPACES = (
+    'xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0" '
+    'xmlns:style="urn:oasis:names:tc:opendocument:xmlns:style:1.0" '
+    'xmlns:text="urn:oasis:names:tc:opendocument:xmlns:text:1.0" '
+    'xmlns:table="urn:oasis:names:tc:opendocument:xmlns:table:1.0" '
+    'xmlns:number="urn:oasis:names:tc:opendocument:xmlns:datastyle:1.0" '
+    'xmlns:fo="urn:oasis:names:tc:opendocument:xmlns:xsl-fo-compatible:1.0" '
+    'xmlns:xlink="http://www.w3.org/1999/xlink" '
+    'xmlns:dc="http://purl.org/dc/elements/1.1/" '
+    'xmlns:meta="urn:oasis:names:tc:opendocument:xmlns:meta:1.0" '
+    'xmlns:config="urn:oasis:names:tc:opendocument:xmlns:config:1.0" '
+    'xmlns:of="urn:oasis:names:tc:opendocument:xmlns:of:1.2" '
+    'xmlns:calcext="urn:org:documentfoundation:names:experimental:calc:xmlns:calcext:1.0" '
+    'office:version="1.2"'
+)
+XML_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n'
+
+
+def create_output(parts, prj_info, out_filename, currency=DEFAULT_CURRENCY,
+                  collapse_refs=True, supress_cat_url=True, user_fields=None, variant=None,
+                  part_details='comments'):
+    ''' @brief Write the cost spreadsheet as an OpenDocument spreadsheet.
+
+    Same content of the XLSX spreadsheet: formulas, with their values, named
+    ranges, formats and conditional formats.
+    The arguments are the ones of `create_spreadsheet()`.
+    '''
+    create_spreadsheet(parts, prj_info, out_filename, currency, collapse_refs,
+                       supress_cat_url, user_fields, variant, part_details,
+                       workbook_class=OdsWorkbook)
+
+
+def ods_formula(formula):
+    ''' @brief Translate an Excel formula to OpenFormula.
+
+    The references are enclosed by brackets ("A1" -> "[.A1]"), the
+    arguments and array constants are separated by ";" and the functions
+    names are in upper case.
+    @param formula `str()` Excel formula, starting with "=".
+    @return `str()` formula without the leading "=".
+    '''
+    def token(m):
+        string, first, last, function, comma = m.groups()
+        if string:
+            return string
+        if first:
+            if last:
+                return '[.{}:.{}]'.format(first, last)
+            return '[.{}]'.format(first)
+        if function:
+            return function.upper()
+        return ';'
+    return FORMULA_TOKEN_REGEX.sub(token, formula.lstrip('='))
+
+
+def sheet_address(name, cell):
+    ''' @brief OpenDocument address of a cell of a worksheet.
+    @param name `str()` name of the worksheet.
+    @param cell `str()` cell in the A1 notation.
+    @return `str()` address, e.g. "'Sheet 1'.A1".
+    '''
+    return "'{}'.{}".format(name.replace("'", "''"), cell)
+
+
+def text_paragraphs(text):
+    ''' @brief Text as OpenDocument paragraphs, one by line.
+
+    The repeated spaces are kept as `<text:s/>`, as the price breaks
+    tables align their columns with them.
+    @param text `str()` to write.
+    @return `str()` XML.
+    '''
+    paragraphs = []
+    for line in text.split('\n'):
+        line = escape(line)
+        line = re.sub('  +', lambda m: ' <text:s text:c="{}"/>'.format(len(m.group(0))-1), line)
+        if line.startswith(' '):
+            line = '<text:s/>' + line[1:]
+        paragraphs.append('<text:p>{}</text:p>'.format(line))
+    return ''.join(paragraphs)
+
+
+def attr(value):
+    ''' @brief Escape a value of a XML attribute.'''
+    return escape(str(value), {'"': '&quot;'})
+
+
+class OdsFormat(object):
+    ''' @brief Cell format, as returned by `OdsWorkbook.add_format()`.'''
+
+    def __init__(self, properties, index):
+        self.properties = properties or {}
+        self.index = index
+        self.name = 'KiCost_{}'.format(index) # Common style, used by the conditional formats.
+        self.cell_style = 'ce{}'.format(index) # Automatic style, used by the cells.
+
+    def data_style(self):
+        ''' @brief Number style of the `num_format` property.
+        @return `str()` XML of the style or `None` if not supported.
+        '''
+        num_format = self.properties.get('num_format')
+        if num_format is None:
+            return None
+        name = 'N{}'.format(self.index)
+        if num_format == ';;;': # Hidden values.
+            return '<number:number-style style:name="{}"><number:text></number:text></number:number-style>'.format(name)
+        m = NUM_FORMAT_REGEX.match(num_format)
+        if not m:
+            return None
+        prefix, integer, decimals, suffix = m.groups()
+        xml = '<number:number-style style:name="{}">'.format(name)
+        if prefix:
+            xml += '<number:text>{}</number:text>'.format(escape(prefix.replace('"', '')))
+        xml += '<number:number number:decimal-places="{d}" number:min-decimal-places="{d}" number:min-integer-digits="1"{g}/>'.format(
+                    d=len(decimals or ''), g=' number:grouping="true"' if ',' in integer else '')
+        if suffix:
+            xml += '<number:text>{}</number:text>'.format(escape(suffix.replace('"', '')))
+        return xml + '</number:number-style>'
+
+    def style(self):
+        ''' @brief Common cell style of the format.
+        @return `str()` XML.
+        '''
+        p = self.properties
+        xml = '<style:style style:name="{}" style:family="table-cell"'.format(self.name)
+        if self.data_style():
+            xml += ' style:data-style-name="N{}"'.format(self.index)
+        xml += '>'
+        cell = ''
+        if p.get('bg_color'):
+            cell += ' fo:background-color="{}"'.format(COLORS.get(p['bg_color'], p['bg_color']))
+        if p.get('valign') in VALIGN:
+            cell += ' style:vertical-align="{}"'.format(VALIGN[p['valign']])
+        if p.get('text_wrap'):
+            cell += ' fo:wrap-option="wrap"'
+        if p.get('align') in ALIGN:
+            cell += ' style:text-align-source="fix"'
+        if cell:
+            xml += '<style:table-cell-properties{}/>'.format(cell)
+        if p.get('align') in ALIGN:
+            xml += '<style:paragraph-properties fo:text-align="{}"/>'.format(ALIGN[p['align']])
+        text = ''
+        if p.get('font_size'):
+            text += ' fo:font-size="{0}pt" style:font-size-asian="{0}pt" style:font-size-complex="{0}pt"'.format(p['font_size'])
+        if p.get('font_color'):
+            text += ' fo:color="{}"'.format(COLORS.get(p['font_color'], p['font_color']))
+        if p.get('bold'):
+            text += ' fo:font-weight="bold" style:font-weight-asian="bold" style:font-weight-complex="bold"'
+        if p.get('italic'):
+            text += ' fo:font-style="italic" style:font-style-asian="italic" style:font-style-complex="italic"'
+        if text:
+            xml += '<style:text-properties{}/>'.format(text)
+        return xml + '</style:style>'
+
+
+class OdsWorksheet(object):
+    ''' @brief Worksheet of `OdsWorkbook`, with the XlsxWriter methods used
+    by `create_spreadsheet()`.
+
+    As the XlsxWriter `constant_memory` mode, the cells must be written in
+    row order: each row is converted to XML and saved in a temporary file
+    (or in memory, on the `in_memory` mode) when the next one is started.
+    '''
+
+    def __init__(self, name, in_memory=False):
+        self.name = name
+        self.columns = {} # Column: (width, outline level).
+        self.max_col = 0
+        self.freeze = None
+        self.conditional_formats = []
+        self.rows = io.BytesIO() if in_memory else tempfile.TemporaryFile('w+b')
+        self.last_row = -1 # Last row saved in `rows`.
+        self.row = None # Row being written.
+        self.cells = {} # Column: [XML attributes, XML content, columns spanned].
+        self.comments = {} # Column: comment of the row being written.
+
+    def _cell(self, row, col):
+        ''' @brief Cell of the current row, starting a new row if needed.'''
+        if row != self.row:
+            if self.row is not None and row < self.row:
+                raise ValueError('Rows of \'{}\' must be written in order.'.format(self.name))
+            self._flush()
+            self.row = row
+        self.max_col = max(self.max_col, col)
+        return self.cells.setdefault(col, ['', '', 1])
+
+    def _flush(self):
+        ''' @brief Save the current row in the temporary file.'''
+        if self.row is None:
+            return
+        if self.row > self.last_row + 1:
+            self.rows.write('<table:table-row table:number-rows-repeated="{}"><table:table-cell/></table:table-row>'.format(
+                                self.row - self.last_row - 1).encode('utf-8'))
+        xml = ['<table:table-row>']
+        next_col = 0
+        for col in sorted(set(self.cells) | set(self.comments)):
+            if col < next_col:
+                continue # Covered by a merged cell.
+            if col > next_col:
+                xml.append('<table:table-cell table:number-columns-repeated="{}"/>'.format(col - next_col))
+            attributes, content, span = self.cells.get(col, ('', '', 1))
+            if col in self.comments:
+                content = '<office:annotation>{}</office:annotation>{}'.format(
+                                text_paragraphs(self.comments[col]), content)
+            xml.append('<table:table-cell{}>{}</table:table-cell>'.format(attributes, content))
+            if span > 1:
+                xml.append('<table:covered-table-cell/>' * (span - 1))
+            next_col = col + span
+        xml.append('</table:table-row>')
+        self.rows.write(''.join(xml).encode('utf-8'))
+        self.last_row = self.row
+        self.row = None
+        self.cells = {}
+        self.comments = {}
+
+    def _set(self, row, col, cell_format, attributes='', content=''):
+        ''' @brief Set the XML attributes and content of a cell.'''
+        cell = self._cell(row, col)
+        if cell_format is not None:
+            attributes = ' table:style-name="{}"'.format(cell_format.cell_style) + attributes
+        cell[0] = attributes
+        cell[1] = content
+
+    # Methods of the XlsxWriter `Worksheet`.
+
+    def write(self, row, col, data=None, cell_format=None, *args):
+        if data is None or data == '':
+            self.write_blank(row, col, data, cell_format)
+        elif isinstance(data, bool):
+            self._set(row, col, cell_format, ' office:value-type="boolean" office:boolean-value="{}"'.format(
+                                                    'true' if data else 'false'))
+        elif isinstance(data, (int, float)):
+            self.write_number(row, col, data, cell_format)
+        elif isinstance(data, str) and data.startswith('='):
+            self.write_formula(row, col, data, cell_format, *args)
+        else:
+            self.write_string(row, col, data, cell_format)
+
+    def write_string(self, row, col, string, cell_format=None):
+        self._set(row, col, cell_format, ' office:value-type="string"', text_paragraphs(str(string)))
+
+    def write_number(self, row, col, number, cell_format=None):
+        self._set(row, col, cell_format, ' office:value-type="float" office:value="{!r}"'.format(number))
+
+    def write_blank(self, row, col, blank=None, cell_format=None):
+        if cell_format is not None: # As XlsxWriter, ignore blank cells without format.
+            self._set(row, col, cell_format)
+
+    def write_formula(self, row, col, formula, cell_format=None, value=0):
+        attributes = ' table:formula="of:={}"'.format(attr(ods_formula(formula)))
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            attributes += ' office:value-type="float" office:value="{!r}"'.format(value)
+            content = ''
+        else:
+            attributes += ' office:value-type="string" office:string-value="{}"'.format(attr(value))
+            content = text_paragraphs(str(value)) if value else ''
+        self._set(row, col, cell_format, attributes, content)
+
+    def write_url(self, row, col, url, cell_format=None, string=None, tip=None):
+        self._set(row, col, cell_format, ' office:value-type="string"',
+                  '<text:p><text:a xlink:type="simple" xlink:href="{}">{}</text:a></text:p>'.format(
+                        attr(url), escape(string or url)))
+
+    def merge_range(self, first_row, first_col, last_row, last_col, data, cell_format=None):
+        # Only ranges of one row are used by `create_spreadsheet()`.
+        self.write(first_row, first_col, data, cell_format)
+        self._cell(first_row, first_col)[0] += ' table:number-columns-spanned="{}"'.format(last_col - first_col + 1)
+        self._cell(first_row, first_col)[2] = last_col - first_col + 1
+        self.max_col = max(self.max_col, last_col)
+
+    def write_comment(self, row, col, comment, options=None):
+        self._cell(row, col)
+        self.comments[col] = comment
+
+    def set_column(self, first_col, last_col, width=None, cell_format=None, options=None):
+        level = (options or {}).get('level', 0)
+        for col in range(first_col, last_col + 1):
+            self.columns[col] = (width, level)
+        self.max_col = max(self.max_col, last_col)
+
+    def freeze_panes(self, row, col, *args):
+        self.freeze = (row, col)
+
+    def conditional_format(self, first_row, first_col, last_row, last_col, options):
+        ranges = options.get('multi_range') or '{}:{}'.format(
+                    xl_rowcol_to_cell(first_row, first_col), xl_rowcol_to_cell(last_row, last_col))
+        target = ' '.join(':'.join(sheet_address(self.name, c) for c in r.split(':'))
+                          for r in ranges.split())
+        if options['type'] == 'formula':
+            value = 'formula-is({})'.format(ods_formula(options['criteria']))
+        else:
+            value = options['value']
+            value = ods_formula(value) if isinstance(value, str) else repr(value)
+            value = CF_OPERATORS[options['criteria']] + value
+        self.conditional_formats.append(
+            '<calcext:conditional-format calcext:target-range-address="{t}">'
+            '<calcext:condition calcext:apply-style-name="{s}" calcext:value="{v}" calcext:base-cell-address="{b}"/>'
+            '</calcext:conditional-format>'.format(t=attr(target), s=options['format'].name, v=attr(value),
+                                                   b=attr(sheet_address(self.name, xl_rowcol_to_cell(first_row, first_col)))))
+
+    def write_table(self, f, column_styles):
+        ''' @brief Write the worksheet XML.
+        @param f Binary file.
+        @param column_styles `dict()` of the column styles names by width, new widths are added.
+        '''
+        self._flush()
+        f.write('<table:table table:name="{}">'.format(attr(self.name)).encode('utf-8'))
+        # Columns, inside nested groups for the outline levels.
+        level = 0
+        for col in range(self.max_col + 1):
+            width, col_level = self.columns.get(col, (None, 0))
+            width = DEFAULT_COL_WIDTH if width is None else width
+            style = column_styles.setdefault(width, 'co{}'.format(len(column_styles) + 1))
+            xml = '<table:table-column-group>' * max(0, col_level - level)
+            xml += '</table:table-column-group>' * max(0, level - col_level)
+            xml += '<table:table-column table:style-name="{}"/>'.format(style)
+            f.write(xml.encode('utf-8'))
+            level = col_level
+        f.write(('</table:table-column-group>' * level).encode('utf-8'))
+        self.rows.seek(0)
+        shutil.copyfileobj(self.rows, f)
+        self.rows.close()
+        if self.conditional_formats:
+            f.write('<calcext:conditional-formats>{}</calcext:conditional-formats>'.format(
+                        ''.join(self.conditional_formats)).encode('utf-8'))
+        f.write(b'</table:table>')
+
+
+class OdsWorkbook(object):
+    ''' @brief OpenDocument spreadsheet with the XlsxWriter `Workbook` methods
+    used by `create_spreadsheet()`.
+
+    `filename` may be a binary file object. With the `in_memory` option
+    no temporary file is used.
+    '''
+
+    def __init__(self, filename, options=None):
+        self.filename = filename
+        self.in_memory = (options or {}).get('in_memory', False)
+        self.formats = []
+        self.worksheets = []
+        self.names = []
+        self.calc_on_load = True # Not used, the cached values are always written.
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    # Methods of the XlsxWriter `Workbook`.
+
+    def add_format(self, properties=None):
+        cell_format = OdsFormat(properties, len(self.formats) + 1)
+        self.formats.append(cell_format)
+        return cell_format
+
+    def add_worksheet(self, name=None):
+        wks = OdsWorksheet(name or 'Sheet{}'.format(len(self.worksheets) + 1), self.in_memory)
+        self.worksheets.append(wks)
+        return wks
+
+    def define_name(self, name, formula):
+        m = SHEET_REF_REGEX.match(formula)
+        sheet = (m.group(1) or '').replace("''", "'") or m.group(2)
+        address = '$' + sheet_address(sheet, m.group(3))
+        if m.group(4):
+            address += ':.' + m.group(4)
+        self.names.append('<table:named-range table:name="{n}" table:base-cell-address="{b}" table:cell-range-address="{a}"/>'.format(
+                            n=attr(name), b=attr('$' + sheet_address(sheet, '$A$1')), a=attr(address)))
+
+    def close(self):
+        ''' @brief Write the OpenDocument file.'''
+        with zipfile.ZipFile(self.filename, 'w', zipfile.ZIP_DEFLATED) as ods:
+            # The MIME type must be the first file, not compressed.
+            ods.writestr(zipfile.ZipInfo('mimetype'), MIMETYPE, zipfile.ZIP_STORED)
+            if self.in_memory:
+                content = io.BytesIO()
+                self._content(content)
+                ods.writestr('content.xml', content.getvalue())
+            else:
+                fd, content_name = tempfile.mkstemp(suffix='.xml')
+                try:
+                    with os.fdopen(fd, 'wb') as f:
+                        self._content(f)
+                    ods.write(content_name, 'content.xml')
+                finally:
+                    os.remove(content_name)
+            ods.writestr('styles.xml', self._styles())
+            ods.writestr('settings.xml', self._settings())
+            ods.writestr('META-INF/manifest.xml', self._manifest())
+
+    def _content(self, f):
+        ''' @brief Write the content.xml of the worksheets in a binary file.'''
+        column_styles = {}
+        tables = io.BytesIO() if self.in_memory else tempfile.TemporaryFile('w+b')
+        for wks in self.worksheets:
+            wks.write_table(tables, column_styles)
+        f.write((XML_HEADER + '<office:document-content {}>'.format(NAMESPACES)).encode('utf-8'))
+        f.write(self._automatic_styles(column_styles).encode('utf-8'))
+        f.write(b'<office:body><office:spreadsheet>')
+        tables.seek(0)
+        shutil.copyfileobj(tables, f)
+        tables.close()
+        if self.names:
+            f.write('<table:named-expressions>{}</table:named-expressions>'.format(
+                        ''.join(self.names)).encode('utf-8'))
+        f.write(b'</office:spreadsheet></office:body></office:document-content>')
+
+    def _automatic_styles(self, column_styles):
+        xml = ['<office:automatic-styles>']
+        for width, name in sorted(column_styles.items(), key=lambda s: s[1]):
+            # Excel width in characters of 7 pixels plus 5 pixels of margin, at 96 DPI.
+            xml.append('<style:style style:name="{}" style:family="table-column">'
+                       '<style:table-column-properties style:column-width="{:.4f}in"/></style:style>'.format(
+                            name, (width*7 + 5) / 96.0))
+        for cell_format in self.formats:
+            xml.append('<style:style style:name="{}" style:family="table-cell" style:parent-style-name="{}"/>'.format(
+                            cell_format.cell_style, cell_format.name))
+        xml.append('</office:automatic-styles>')
+        return ''.join(xml)
+
+    def _styles(self):
+        xml = [XML_HEADER, '<office:document-styles {}><office:styles>'.format(NAMESPACES)]
+        for cell_format in self.formats:
+            data_style = cell_format.data_style()
+            if data_style:
+                xml.append(data_style)
+            xml.append(cell_format.style())
+        xml.append('</office:styles></office:document-styles>')
+        return ''.join(xml).encode('utf-8')
+
+    def _settings(self):
+        def item(name, item_type, value):
+            return '<config:config-item config:name="{}" config:type="{}">{}</config:config-item>'.format(
+                        name, item_type, value)
+        xml = [XML_HEADER, '<office:document-settings {}><office:settings>'.format(NAMESPACES),
+               '<config:config-item-set config:name="ooo:view-settings">'
+               '<config:config-item-map-indexed config:name="Views"><config:config-item-map-entry>',
+               item('ViewId', 'string', 'view1'),
+               '<config:config-item-map-named config:name="Tables">']
+        for wks in self.worksheets:
+            if not wks.freeze:
+                continue
+            row, col = wks.freeze
+            xml.append('<config:config-item-map-entry config:name="{}">'.format(attr(wks.name)))
+            xml.append(item('HorizontalSplitMode', 'short', 2 if col else 0))
+            xml.append(item('VerticalSplitMode', 'short', 2 if row else 0))
+            xml.append(item('HorizontalSplitPosition', 'int', col))
+            xml.append(item('VerticalSplitPosition', 'int', row))
+            xml.append(item('ActiveSplitRange', 'short', 2))
+            xml.append(item('PositionLeft', 'int', 0))
+            xml.append(item('PositionRight', 'int', col))
+            xml.append(item('PositionTop', 'int', 0))
+            xml.append(item('PositionBottom', 'int', row))
+            xml.append('</config:config-item-map-entry>')
+        xml.append('</config:config-item-map-named>')
+        if self.worksheets:
+            xml.append(item('ActiveTable', 'string', attr(self.worksheets[0].name)))
+        xml.append('</config:config-item-map-entry></config:config-item-map-indexed>'
+                   '</config:config-item-set></office:settings></office:document-settings>')
+        return ''.join(xml).encode('utf-8')
+
+    def _manifest(self):
+        xml = [XML_HEADER,
+               '<manifest:manifest xmlns:manifest="urn:oasis:names:tc:opendocument:xmlns:manifest:1.0" manifest:version="1.2">',
+               '<manifest:file-entry manifest:full-path="/" manifest:version="1.2" manifest:media-type="{}"/>'.format(MIMETYPE)]
+        for name in ('content.xml', 'styles.xml', 'settings.xml'):
+            xml.append('<manifest:file-entry manifest:full-path="{}" manifest:media-type="text/xml"/>'.format(name))
+        xml.append('</manifest:manifest>')
+        return ''.join(xml).encode('utf-8')
+
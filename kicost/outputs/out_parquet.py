@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+# MIT license
+#
+# Copyright (C) 2019 by XESS Corporation / Hildo Guillardi Júnior
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+# Author information.
+__author__ = 'Hildo Guillardi Junior'
+__webpage__ = 'https://github.com/hildogjr/'
+__company__ = 'University of Campinas - Brazil'
+
+
+# Parquet report of the costs, one row by part and distributor offer.
+
+# Libraries.
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None # Optional, only needed to write this format.
+from ..global_vars import logger, DEBUG_OVERVIEW, DEFAULT_CURRENCY
+from .tools import part_records, offer_rows, offer_columns
+
+__all__ = ['create_output']
+
+EXTENSION = '.parquet'
+BATCH_ROWS = 10000 # Rows kept in memory before writing them as a row group.
+
+# Type of the columns that are not text, see `offer_columns()`.
+COLUMN_TYPES = {
+    'board_qty': 'int64',
+    'qty': 'int64',
+    'unit_price': 'float64',
+    'ext_price': 'float64',
+    'dist_qty_avail': 'int64',
+    'dist_unit_price': 'float64',
+    'dist_ext_price': 'float64',
+}
+
+
+def create_output(parts, prj_info, out_filename, currency=DEFAULT_CURRENCY,
+                  collapse_refs=True, supress_cat_url=True, user_fields=None, variant=None,
+                  part_details='comments'):
+    ''' @brief Write the parts and their costs as a Parquet table.
+
+    The rows are the ones of `offer_rows()`, written in row groups of
+    `BATCH_ROWS` rows. Needs the `pyarrow` package.
+    The arguments are the ones of `create_spreadsheet()`, the ones of the
+    spreadsheet layout are not used.
+    @param parts `list()` of the part groups, with the distributors offers.
+    @param out_filename `str()` name of the output file or a binary file object.
+    '''
+    if pyarrow is None:
+        raise Exception('The `pyarrow` package is needed to write Parquet files.')
+    logger.log(DEBUG_OVERVIEW, 'Writing the Parquet report \'{}\'...'.format(out_filename))
+    columns = offer_columns(parts, user_fields)
+    schema = pyarrow.schema([(c, COLUMN_TYPES.get(c, 'float64' if c.startswith('qty_prj') else 'string'))
+                             for c in columns])
+    writer = pyarrow.parquet.ParquetWriter(out_filename, schema)
+    try:
+        batch = {c: [] for c in columns}
+        num_rows = 0
+        for row in offer_rows(part_records(parts, currency, collapse_refs, user_fields)):
+            for c in columns:
+                batch[c].append(row[c])
+            num_rows += 1
+            if num_rows == BATCH_ROWS:
+                writer.write_table(pyarrow.Table.from_pydict(batch, schema))
+                batch = {c: [] for c in columns}
+                num_rows = 0
+        if num_rows:
+            writer.write_table(pyarrow.Table.from_pydict(batch, schema))
+    finally:
+        writer.close()
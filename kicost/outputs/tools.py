@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+# MIT license
+#
+# Copyright (C) 2019 by XESS Corporation / Hildo Guillardi Júnior
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+# Author information.
+__author__ = 'Hildo Guillardi Junior'
+__webpage__ = 'https://github.com/hildogjr/'
+__company__ = 'University of Campinas - Brazil'
+
+
+# Libraries.
+import os
+import io
+import contextlib
+from ..global_vars import DEFAULT_CURRENCY
+from ..spreadsheet import order_parts, get_dist_list, evaluate_formulas, DEFAULT_BUILD_QTY
+
+__all__ = ['output_file_name', 'open_text_output', 'part_records', 'offer_rows', 'offer_columns']
+
+# Fields of the parts written in the outputs, followed by the user fields.
+PART_FIELDS = ['value', 'desc', 'footprint', 'manf', 'manf#']
+# Data of each distributor offer, see `part_records()`.
+OFFER_FIELDS = ['distributor', 'part_num', 'url', 'qty_avail', 'currency', 'price_tiers', 'unit_price', 'ext_price']
+
+
+def output_file_name(out_filename, extension):
+    ''' @brief Name of an output file.
+    @param out_filename `str()` name of the XLSX output file.
+    @param extension `str()` of the output format, e.g. '.csv'.
+    @return `str()` with the `out_filename` extension changed.
+    '''
+    return os.path.splitext(out_filename)[0] + extension
+
+
+@contextlib.contextmanager
+def open_text_output(out_filename, newline=None):
+    ''' @brief Open an output file as UTF-8 text.
+    @param out_filename `str()` name of the file or a binary file object,
+    that is left open.
+    @param newline As `io.open()`.
+    @return Text file, in a `with` statement.
+    '''
+    if hasattr(out_filename, 'write'):
+        f = io.TextIOWrapper(out_filename, encoding='utf-8', newline=newline)
+        try:
+            yield f
+        finally:
+            f.flush()
+            f.detach() # Don't close the file of the caller.
+    else:
+        with io.open(out_filename, 'w', encoding='utf-8', newline=newline) as f:
+            yield f
+
+
+def part_fields(user_fields):
+    ''' @brief Fields of the parts in the outputs.
+    @param user_fields `list()` of the user fields, can be `None`.
+    @return `list()` of the field names.
+    '''
+    fields = list(PART_FIELDS)
+    for field in user_fields or []:
+        if field.lower() not in fields:
+            fields.append(field.lower())
+    return fields
+
+
+def num_projects(parts):
+    ''' @brief Number of projects (BOM files) of the parts.'''
+    return max([len(part.fields.get('manf#_qty',[])) if isinstance(part.fields.get('manf#_qty',[]),list) else 1 for part in parts] or [1])
+
+
+def part_records(parts, currency=DEFAULT_CURRENCY, collapse_refs=True, user_fields=None):
+    ''' @brief Data of the parts, in the spreadsheet order and with its costs.
+
+    The costs are the ones of the spreadsheet, computed by `evaluate_formulas()`
+    for the default quantity of boards of each project.
+    @param parts `list()` of the part groups, with the distributors offers.
+    @param currency Currency of the costs in ISO4217.
+    @param collapse_refs `True` to collapse the references, e.g. J1-J3.
+    @param user_fields `list()` of the user fields to add.
+    @return Generator of a `dict()` by part with the 'refs', the fields, 'board_qty',
+    'qty' (and 'qty_prj0', 'qty_prj1'... in the multifiles BOM case), 'currency',
+    the minimum 'unit_price' and 'ext_price' and the 'offers' `list()`. Each offer
+    is a `dict()` of the `OFFER_FIELDS`, with the 'price_tiers' as a `list()` of
+    [qty, price] in the distributor currency and the costs in `currency`.
+    '''
+    order_parts(parts, collapse_refs)
+    dist_list = get_dist_list()
+    num_prj = num_projects(parts)
+    fields = part_fields(user_fields)
+    values = evaluate_formulas(parts, dist_list, num_prj, DEFAULT_BUILD_QTY, currency)
+    for i_part, part in enumerate(parts):
+        record = {'refs': part.collapsed_refs}
+        for field in fields:
+            record[field] = part.fields.get(field, '')
+        record['board_qty'] = DEFAULT_BUILD_QTY
+        record['qty'] = values['qty'][i_part]
+        if num_prj > 1:
+            for i_prj in range(num_prj):
+                record['qty_prj{}'.format(i_prj)] = values['qty_prj'][i_part][i_prj]
+        record['currency'] = currency
+        record['unit_price'] = values['unit_price'][i_part]
+        record['ext_price'] = values['ext_price'][i_part]
+        record['offers'] = []
+        for dist in dist_list:
+            offer = part.offers[dist]
+            if not offer.part_num:
+                continue
+            record['offers'].append({
+                'distributor': dist,
+                'part_num': offer.part_num,
+                'url': offer.url,
+                'qty_avail': offer.qty_avail,
+                'currency': offer.currency,
+                'price_tiers': [[q, offer.price_tiers[q]] for q in sorted(offer.price_tiers) if q > 0],
+                'unit_price': values[dist]['unit_price'][i_part],
+                'ext_price': values[dist]['ext_price'][i_part],
+            })
+        yield record
+
+
+def offer_columns(parts, user_fields=None):
+    ''' @brief Columns of the `offer_rows()`.
+    @param parts `list()` of the part groups.
+    @param user_fields `list()` of the user fields.
+    @return `list()` of the column names.
+    '''
+    num_prj = num_projects(parts)
+    columns = ['refs'] + part_fields(user_fields) + ['board_qty', 'qty']
+    if num_prj > 1:
+        columns += ['qty_prj{}'.format(i_prj) for i_prj in range(num_prj)]
+    columns += ['currency', 'unit_price', 'ext_price']
+    columns += ['dist_' + field for field in OFFER_FIELDS]
+    return columns
+
+
+def offer_rows(records):
+    ''' @brief Flat table of the part records, a row by distributor offer.
+
+    The part data is repeated in the rows of its offers, with the offer
+    data in the 'dist_' columns. A part without offers has one row with
+    blank offer data. The price tiers are written as "qty:price" separated
+    by ";".
+    @param records Part records from `part_records()`.
+    @return Generator of a `dict()` by row.
+    '''
+    for record in records:
+        offers = record.pop('offers')
+        if not offers:
+            row = record.copy()
+            for field in OFFER_FIELDS:
+                row['dist_' + field] = None
+            yield row
+        for offer in offers:
+            row = record.copy()
+            for field in OFFER_FIELDS:
+                row['dist_' + field] = offer[field]
+            row['dist_price_tiers'] = ';'.join('{}:{}'.format(q, p) for q, p in offer['price_tiers'])
+            yield row
@@ -32,27 +32,28 @@ from .global_vars import * # Debug, language and default configurations.
 import os
 from datetime import datetime
 import re # Regular expression parser.
+import math
+import heapq # Write the worksheet blocks in row order.
+import bisect # Price tier lookup of the cached values.
 import xlsxwriter # XLSX file interpreter.
 from xlsxwriter.utility import xl_rowcol_to_cell, xl_range, xl_range_abs
 from babel import numbers # For currency presentation.
+try:
+    basestring # Python 2, file names may be `str()` or `unicode()`.
+except NameError:
+    basestring = str
 
 # KiCost libraries.
 from . import __version__ # Version control by @xesscorp and collaborator.
 from .distributors.global_vars import distributor_dict # Distributors names and definitions to use in the spreadsheet.
-from .edas.tools import partgroup_qty, order_refs, PART_REF_REGEX
+from .edas.tools import partgroup_qty, partgroup_qty_value, order_refs, groups_sort_key, PART_REF_REGEX
 
-from currency_converter import CurrencyConverter
-currency_convert = CurrencyConverter().convert
+from .currency_rates import currency_convert # Loads the rates only when used.
 
-__all__ = ['create_spreadsheet']
+__all__ = ['create_spreadsheet', 'order_parts', 'get_dist_list', 'evaluate_formulas']
 
 
-# Currency format and symbol definition (placed default values here, it will be replaced by the user asked currency).
-CURRENCY_ALPHA3 = DEFAULT_CURRENCY
-CURRENCY_SYMBOL = 'US$'
-CURRENCY_FORMAT = ''
-
-WORKBOOK = None
+DEFAULT_BUILD_QTY = 100  # Default value for number of boards to build.
 
 # Regular expression to the link for one datasheet.
 DATASHEET_LINK_REGEX = re.compile('^(http(s)?:\/\/)?(www.)?[0-9a-z\.]+\/[0-9a-z\.\/\%\-\_]+(.pdf)?$', re.IGNORECASE)
@@ -61,32 +62,82 @@ DATASHEET_LINK_REGEX = re.compile('^(http(s)?:\/\/)?(www.)?[0-9a-z\.]+\/[0-9a-z\
 EXTRA_INFO_DISPLAY = ['value', 'tolerance', 'footprint', 'power', 'current', 'voltage', 'frequency', 'temp_coeff', 'manf', 'size']
 
 
+# Worksheet of the price breaks and extra distributor information, used in place
+# of the cell comments with `part_details='sheet'`.
+DETAILS_WORKSHEET_NAME = 'Price Breaks'
+
+# Name of the pricing worksheet when the spreadsheet is written to a file
+# object without name.
+DEFAULT_WORKSHEET_NAME = 'KiCost'
+
+
 # About and credit message at the end of the spreadsheet.
 ABOUT_MSG='KiCost\N{REGISTERED SIGN} v.' + __version__
 
 
+class SpreadsheetContext(object):
+    '''@brief State of one spreadsheet being created, shared by its writers.
+
+    Kept by call, not in module variables, so many spreadsheets may be
+    created at the same time (e.g. by threads of a server).
+    '''
+
+    def __init__(self, workbook, worksheet_name, currency):
+        '''@brief Constructor.
+        @param workbook Workbook being written.
+        @param worksheet_name `str()` name of the pricing worksheet.
+        @param currency `str()` ISO 4217 code of the currency of the spreadsheet.
+        '''
+        self.workbook = workbook
+        self.worksheet_name = worksheet_name
+        self.currency_alpha3 = currency
+        self.currency_symbol = numbers.get_currency_symbol(currency, locale=DEFAULT_LANGUAGE)
+        self.currency_format = self.currency_symbol + '#,##0.00'
+
+    def define_cell_name(self, name, row, col):
+        '''@brief Define a name to an absolute cell of the pricing worksheet.
+        @param name `str()` of the defined name.
+        @param row Row of the cell.
+        @param col Column of the cell.
+        '''
+        self.workbook.define_name(name, '={wks_name}!{cell_ref}'.format(
+                wks_name="'" + self.worksheet_name + "'",
+                cell_ref=xl_rowcol_to_cell(row, col, row_abs=True, col_abs=True)))
+
+
 def create_spreadsheet(parts, prj_info, spreadsheet_filename, currency=DEFAULT_CURRENCY,
-                       collapse_refs=True, supress_cat_url=True, user_fields=None, variant=None):
-    '''Create a spreadsheet using the info for the parts (including their HTML trees).'''
+                       collapse_refs=True, supress_cat_url=True, user_fields=None, variant=None,
+                       part_details='comments', workbook_class=None):
+    '''Create a spreadsheet using the info for the parts (including their HTML trees).
+
+    The price breaks and the extra distributor information of each part are
+    cell comments by default. These are slow to write and open on big BOMs,
+    `part_details='sheet'` puts them as plain values in the "Price Breaks"
+    worksheet, in the same rows of the parts, and `'none'` doesn't write them.
+
+    The file is written by `xlsxwriter.Workbook`, `workbook_class` may be
+    another class with the same interface to write other file formats (see
+    `outputs.out_ods`).
+
+    `spreadsheet_filename` may also be a binary file object, e.g. `io.BytesIO()`,
+    the workbook is then created in memory, without temporary files, and
+    written to it.
+    '''
     
+    in_memory = hasattr(spreadsheet_filename, 'write')
+    if in_memory:
+        spreadsheet_name = getattr(spreadsheet_filename, 'name', None)
+        if not isinstance(spreadsheet_name, basestring):
+            spreadsheet_name = DEFAULT_WORKSHEET_NAME
+    else:
+        spreadsheet_name = spreadsheet_filename
     logger.log(DEBUG_OVERVIEW, 'Creating the \'{}\' spreadsheet...'.format(
-                                    os.path.basename(spreadsheet_filename)) )
+                                    os.path.basename(spreadsheet_name)) )
     
     MAX_LEN_WORKSHEET_NAME = 31 # Microsoft Excel allows a 31 characters longer
                                 # string for the worksheet name, Google
                                 #Spreadsheet 100 and LibreOffice Calc have no limit.
-    DEFAULT_BUILD_QTY = 100  # Default value for number of boards to build.
-    global WORKSHEET_NAME
-    WORKSHEET_NAME = os.path.splitext(os.path.basename(spreadsheet_filename))[0] # Default name for pricing worksheet.
-
-    global CURRENCY_SYMBOL
-    global CURRENCY_FORMAT
-    global CURRENCY_ALPHA3
-    CURRENCY_ALPHA3 = currency.strip().upper()
-    CURRENCY_SYMBOL = numbers.get_currency_symbol(
-                        CURRENCY_ALPHA3, locale=DEFAULT_LANGUAGE
-                        )
-    CURRENCY_FORMAT = CURRENCY_SYMBOL + '#,##0.00'
+    worksheet_name = os.path.splitext(os.path.basename(spreadsheet_name))[0] # Default name for pricing worksheet.
     if len(variant) > 0:
         # Append an indication of the variant to the worksheet title.
         # Remove any special characters that might be illegal in a 
@@ -95,14 +146,21 @@ def create_spreadsheet(parts, prj_info, spreadsheet_filename, currency=DEFAULT_C
         # the board project.
         variant = re.sub('[\[\]\\\/\|\?\*\:\(\)]','_',
                             variant[:(MAX_LEN_WORKSHEET_NAME)])
-        WORKSHEET_NAME += '.'
-        WORKSHEET_NAME = WORKSHEET_NAME[:(MAX_LEN_WORKSHEET_NAME-len(variant))]
-        WORKSHEET_NAME += variant
+        worksheet_name += '.'
+        worksheet_name = worksheet_name[:(MAX_LEN_WORKSHEET_NAME-len(variant))]
+        worksheet_name += variant
     else:
-        WORKSHEET_NAME = WORKSHEET_NAME[:MAX_LEN_WORKSHEET_NAME]
+        worksheet_name = worksheet_name[:MAX_LEN_WORKSHEET_NAME]
     
     # Create spreadsheet file.
-    with xlsxwriter.Workbook(spreadsheet_filename) as workbook:
+    # The cells are written in row order, so only one row is kept in memory.
+    # The in memory mode keeps all of them, but doesn't use temporary files.
+    workbook_options = {'in_memory': True} if in_memory else {'constant_memory': True}
+    with (workbook_class or xlsxwriter.Workbook)(spreadsheet_filename, workbook_options) as workbook:
+        # The formulas are written with their results, see `evaluate_formulas()`,
+        # so they don't need to be recalculated when the workbook is opened.
+        workbook.calc_on_load = False
+        ctx = SpreadsheetContext(workbook, worksheet_name, currency.strip().upper())
     
         # Create the various format styles used by various spreadsheet items.
         WRK_HDR_FORMAT = {
@@ -141,7 +199,7 @@ def create_spreadsheet(parts, prj_info, spreadsheet_filename, currency=DEFAULT_C
                 'font_size': 13,
                 'font_color': 'red',
                 'bold': True,
-                'num_format': CURRENCY_FORMAT,
+                'num_format': ctx.currency_format,
                 'valign': 'vcenter'
             }),
             'currency_rate_name': workbook.add_format({
@@ -151,7 +209,7 @@ def create_spreadsheet(parts, prj_info, spreadsheet_filename, currency=DEFAULT_C
                 'font_size': 13,
                 'font_color': 'green',
                 'bold': True,
-                'num_format': CURRENCY_FORMAT,
+                'num_format': ctx.currency_format,
                 'valign': 'vcenter'
             }),
             'proj_info_field': workbook.add_format({
@@ -183,7 +241,9 @@ def create_spreadsheet(parts, prj_info, spreadsheet_filename, currency=DEFAULT_C
             'too_few_available': workbook.add_format({'bg_color': '#FF9900', 'font_color':'black'}),
             'too_few_purchased': workbook.add_format({'bg_color': '#FFFF00'}),
             'not_stocked': workbook.add_format({'font_color': '#909090', 'align': 'right', 'valign': 'vcenter'}),
-            'currency': workbook.add_format({'num_format': CURRENCY_FORMAT, 'valign': 'vcenter'}),
+            'currency': workbook.add_format({'num_format': ctx.currency_format, 'valign': 'vcenter'}),
+            'order_index': workbook.add_format({'num_format': ';;;'}), # Hidden helper values.
+            'part_details': workbook.add_format({'valign': 'vcenter', 'text_wrap': True}),
         }
 
         # Add the distinctive header format for each distributor to the `dict` of formats.
@@ -193,9 +253,11 @@ def create_spreadsheet(parts, prj_info, spreadsheet_filename, currency=DEFAULT_C
             wrk_formats[d] = workbook.add_format(hdr_format)
 
         # Create the worksheet that holds the pricing information.
-        wks = workbook.add_worksheet(WORKSHEET_NAME)
-        global WORKBOOK
-        WORKBOOK = workbook
+        wks = workbook.add_worksheet(ctx.worksheet_name)
+        # Worksheet of the price breaks and extra information, in place of the comments.
+        details_wks = None
+        if part_details == 'sheet':
+            details_wks = workbook.add_worksheet(DETAILS_WORKSHEET_NAME)
 
         # Set the row & column for entering the part information in the sheet.
         START_COL = 0
@@ -207,130 +269,209 @@ def create_spreadsheet(parts, prj_info, spreadsheet_filename, currency=DEFAULT_C
         COL_HDR_ROW = LABEL_ROW + 1
         FIRST_PART_ROW = COL_HDR_ROW + 1
         LAST_PART_ROW = COL_HDR_ROW + len(parts) - 1
-        next_row = 0
 
-        # Load the global part information (not distributor-specific) into the sheet.
+        # Order the parts by their references.
+        order_parts(parts, collapse_refs)
+
+        # Get the global part information columns (not distributor-specific).
         # next_col = the column immediately to the right of the global data.
         # qty_col = the column where the quantity needed of each part is stored.
-        next_line, next_col, refs_col, qty_col, columns_global = add_globals_to_worksheet(
-            wks, wrk_formats, START_ROW, START_COL, TOTAL_COST_ROW,
-            parts, user_fields, collapse_refs)
+        columns_global = get_globals_columns(parts, user_fields)
+        next_col = START_COL + len(columns_global)
+        refs_col = START_COL + columns_global['refs']['col']
+        qty_col = START_COL + columns_global['qty']['col']
         # Create a defined range for the global data.
         workbook.define_name(
             'global_part_data', '={wks_name}!{data_range}'.format(
-                wks_name= "'" + WORKSHEET_NAME + "'",
+                wks_name= "'" + ctx.worksheet_name + "'",
                 data_range=xl_range_abs(START_ROW, START_COL, LAST_PART_ROW,
                                         next_col - 1)))
 
-        for i_prj in range(len(prj_info)):
-            # Add project information to track the project (in a printed version
-            # of the BOM) and the date because of price variations.
-            i_prj_str = (str(i_prj) if len(prj_info)>1 else '')
-            wks.write(next_row, START_COL,
-                      'Prj{}:'.format(i_prj_str),
-                      wrk_formats['proj_info_field'])
-            wks.write(next_row, START_COL+1,
-                      prj_info[i_prj]['title'], wrk_formats['proj_info'])
-            wks.write(next_row+1, START_COL, 'Co.:',
-                      wrk_formats['proj_info_field'])
-            wks.write(next_row+1, START_COL+1,
-                      prj_info[i_prj]['company'], wrk_formats['proj_info'])
-            wks.write(next_row+2, START_COL,
-                      'Prj date:', wrk_formats['proj_info_field'])
-            wks.write(next_row+2, START_COL+1,
-                      prj_info[i_prj]['date'], wrk_formats['proj_info'])
-
-            # Create the cell where the quantity of boards to assemble is entered.
-            # Place the board qty cells near the right side of the global info.
-            wks.write(next_row, next_col - 2, 'Board Qty{}:'.format(i_prj_str),
-                      wrk_formats['board_qty'])
-            wks.write(next_row, next_col - 1, DEFAULT_BUILD_QTY,
-                      wrk_formats['board_qty'])  # Set initial board quantity.
-            # Define the named cell where the total board quantity can be found.
-            workbook.define_name('BoardQty{}'.format(i_prj_str),
-                '={wks_name}!{cell_ref}'.format(
-                    wks_name="'" + WORKSHEET_NAME + "'",
-                    cell_ref=xl_rowcol_to_cell(next_row, next_col - 1,
-                                           row_abs=True,
-                                           col_abs=True)))
-            
-            # Create the cell to show total cost of board parts for each distributor.
-            wks.write(next_row + 2, next_col - 2, 'Total Cost{}:'.format(i_prj_str),
-                      wrk_formats['total_cost_label'])
-            wks.write_comment(next_row + 2, next_col - 2, 'Use the minimum extend price across distributors not taking account available quantities.')
-            # Define the named cell where the total cost can be found.
-            workbook.define_name('TotalCost{}'.format(i_prj_str),
-                            '={wks_name}!{cell_ref}'.format(
-                                wks_name="'" + WORKSHEET_NAME + "'",
-                                cell_ref=xl_rowcol_to_cell(next_row + 2,
-                                                           next_col - 1,
-                                       row_abs=True, col_abs=True)) )
-
-            # Create the cell to show unit cost of (each project) board parts.
-            wks.write(next_row+1, next_col - 2, 'Unit Cost{}:'.format(i_prj_str),
-                      wrk_formats['unit_cost_label'])
-            wks.write(next_row+1, next_col - 1,
-                      "=TotalCost{}/BoardQty{}".format(i_prj_str, i_prj_str),
-                      wrk_formats['unit_cost_currency'])
-
-            next_row += 3
-
-        # Add general information of the scrap to track price modifications.
-        wks.write(next_row, START_COL,
-                  '$ date:', wrk_formats['proj_info_field'])
-        wks.write(next_row, START_COL+1,
-                  datetime.now().strftime("%Y-%m-%d %H:%M:%S"), wrk_formats['proj_info'])
-        # Add the total cost of all projects together.
-        if len(prj_info)>1:
-            # Create the row to show total cost of board parts for each distributor.
-            wks.write(next_row, next_col - 2, 'Total Prjs Cost:',
-                      wrk_formats['total_cost_label'])
-            # Define the named cell where the total cost can be found.
-            workbook.define_name('TotalCost', '={wks_name}!{cell_ref}'.format(
-                            wks_name="'" + WORKSHEET_NAME + "'",
-                            cell_ref=xl_rowcol_to_cell(next_row, next_col - 1,
-                                       row_abs=True,
-                                       col_abs=True)))
-        next_row += 1
-
-        # Freeze view of the global information and the column headers, but
-        # allow the distributor-specific part info to scroll.
-        wks.freeze_panes(COL_HDR_ROW, next_col)
-
-        # Make a list of alphabetically-ordered distributors with web distributors before locals.
         logger.log(DEBUG_OVERVIEW, 'Sorting the distributors...')
-        web_dists = sorted([d for d in distributor_dict if distributor_dict[d]['type'] != 'local'])
-        local_dists = sorted([d for d in distributor_dict if distributor_dict[d]['type'] == 'local'])
-        dist_list = web_dists + local_dists
+        dist_list = get_dist_list()
 
-        # Load the part information from each distributor into the sheet.
-        logger.log(DEBUG_OVERVIEW, 'Writing the distributor part information...')
+        # Each distributor gets the same set of columns, placed at the right of
+        # the global data and of the previous distributors.
+        columns_dist = get_dist_columns(supress_cat_url)
+        dist_cols = {}
+        dist_start_col = next_col
         for dist in dist_list:
-            dist_start_col = next_col
-            next_col = add_dist_to_worksheet(wks, wrk_formats, columns_global,
-                                            START_ROW, dist_start_col,
-                                            UNIT_COST_ROW, TOTAL_COST_ROW,
-                                             refs_col, qty_col, dist, parts, supress_cat_url)
+            dist_cols[dist] = dist_start_col
+            dist_start_col += len(columns_dist)
             # Create a defined range for each set of distributor part data.
             workbook.define_name(
                 '{}_part_data'.format(dist), '={wks_name}!{data_range}'.format(
-                    wks_name="'" + WORKSHEET_NAME + "'",
-                    data_range=xl_range_abs(START_ROW, dist_start_col,
-                                            LAST_PART_ROW, next_col - 1)))
+                    wks_name="'" + ctx.worksheet_name + "'",
+                    data_range=xl_range_abs(START_ROW, dist_cols[dist],
+                                            LAST_PART_ROW, dist_start_col - 1)))
 
-        # Add the KiCost package information at the end of the spreadsheet to debug
-        # information at the forum and "advertising".
-        wks.write(next_line+1, START_COL, ABOUT_MSG, wrk_formats['proj_info'])
+        # Evaluate the formulas to write their results as cached values.
+        num_prj = max([len(part.fields.get('manf#_qty',[])) if isinstance(part.fields.get('manf#_qty',[]),list) else 1 for part in parts])
+        values = evaluate_formulas(parts, dist_list, num_prj, DEFAULT_BUILD_QTY, ctx.currency_alpha3)
 
+        # Freeze view of the global information and the column headers, but
+        # allow the distributor-specific part info to scroll.
+        wks.freeze_panes(COL_HDR_ROW, next_col)
+        if details_wks:
+            details_wks.freeze_panes(COL_HDR_ROW, 1)
+
+        # Write the project information, the global part information and the
+        # part information from each distributor into the sheet. All the columns
+        # are known, so the cells are written row by row across these blocks,
+        # each row is flushed to the file by the `constant_memory` mode.
+        logger.log(DEBUG_OVERVIEW, 'Writing the global and distributor part information...')
+        writers = [
+            add_prj_info_to_worksheet(ctx, wks, wrk_formats, prj_info, START_COL,
+                                      next_col, DEFAULT_BUILD_QTY, values),
+            add_globals_to_worksheet(ctx, wks, wrk_formats, columns_global, START_ROW,
+                                     START_COL, TOTAL_COST_ROW, parts, dist_cols, values),
+        ]
+        if details_wks:
+            writers.append(add_details_to_worksheet(details_wks, wrk_formats, START_ROW, parts))
+        for i_dist, dist in enumerate(dist_list):
+            writers.append(add_dist_to_worksheet(ctx, wks, wrk_formats, columns_dist,
+                                                 columns_global, START_ROW, dist_cols[dist],
+                                                 UNIT_COST_ROW, TOTAL_COST_ROW,
+                                                 refs_col, qty_col, dist, parts, values[dist],
+                                                 supress_cat_url, part_details,
+                                                 details_wks, 1 + 2*i_dist))
+        write_rows(writers)
+
+
+def order_parts(parts, collapse_refs=True):
+    '''@brief Order the parts by their references, the rows of the spreadsheet.
+
+    Fill the `collapsed_refs` of each part with its ordered references.
+    @param parts `list()` of the part groups, sorted in place.
+    @param collapse_refs `True` to collapse the references, e.g. J1-J3.
+    '''
+    # Order the references and collapse, if asked:
+    # e.g. J3, J2, J1, J6 => J1, J2, J3 J6. # `collapse=False`
+    # e.g. J3, J2, J1, J6 => J1-J3, J6.. # `collapse=True`
+    for part in parts:
+        part.collapsed_refs = order_refs(part.refs, collapse=collapse_refs)
 
-def add_globals_to_worksheet(wks, wrk_formats, start_row, start_col,
-                             total_cost_row, parts, user_fields, collapse_refs):
-    '''Add global part data to the spreadsheet.'''
+    # Then, order the part references with priority ref prefix, ref num, and
+    # subpart num, as the previous versions (so the rows don't move). The ties
+    # are broken by the `groups_sort()` order, all in a single sort with the
+    # key computed once per part.
+    def get_ref_key(part):
+        match = PART_REF_REGEX.match(part.collapsed_refs)
+        return (match.group('prefix'), match.group('ref_num') or '',
+                match.group('subpart_num') or '') + groups_sort_key(part)
+    parts.sort(key=get_ref_key)
 
-    logger.log(DEBUG_OVERVIEW, 'Writing the global part information...')
 
-    global CURRENCY_SYMBOL
-    global CURRENCY_FORMAT
+def get_dist_list():
+    '''@brief Alphabetically-ordered distributors with web distributors before locals.
+    @return `list()` of the distributor names.
+    '''
+    web_dists = sorted([d for d in distributor_dict if distributor_dict[d]['type'] != 'local'])
+    local_dists = sorted([d for d in distributor_dict if distributor_dict[d]['type'] == 'local'])
+    return web_dists + local_dists
+
+
+def write_rows(writers):
+    '''@brief Run the worksheet writers in row order.
+
+    Each writer is a generator that yields the row of the next cells it
+    will write, and writes them when resumed. The writer of the lowest row
+    is always the one resumed, so the worksheet receives the cells ordered
+    by row, as needed by the `constant_memory` mode of XlsxWriter.
+    @param writers `list()` of generators.
+    '''
+    heap = []
+    for i, writer in enumerate(writers):
+        row = next(writer, None)
+        if row is not None:
+            heapq.heappush(heap, (row, i, writer))
+    while heap:
+        _, i, writer = heapq.heappop(heap)
+        row = next(writer, None) # Write the cells of the row and get the next one.
+        if row is not None:
+            heapq.heappush(heap, (row, i, writer))
+
+
+def add_prj_info_to_worksheet(ctx, wks, wrk_formats, prj_info, start_col, next_col, build_qty, values):
+    '''@brief Add the projects information, board quantities and costs to the spreadsheet.
+
+    Generator yielding the row of the next cells, see `write_rows()`.
+    @param ctx `SpreadsheetContext` of the spreadsheet.
+    @param next_col Column following the global part data.
+    @param build_qty Initial quantity of boards.
+    @param values `dict()` of the formula results from `evaluate_formulas()`.
+    '''
+    next_row = 0
+    for i_prj in range(len(prj_info)):
+        # Add project information to track the project (in a printed version
+        # of the BOM) and the date because of price variations.
+        i_prj_str = (str(i_prj) if len(prj_info)>1 else '')
+        yield next_row
+        wks.write(next_row, start_col,
+                  'Prj{}:'.format(i_prj_str),
+                  wrk_formats['proj_info_field'])
+        wks.write(next_row, start_col+1,
+                  prj_info[i_prj]['title'], wrk_formats['proj_info'])
+
+        # Create the cell where the quantity of boards to assemble is entered.
+        # Place the board qty cells near the right side of the global info.
+        wks.write(next_row, next_col - 2, 'Board Qty{}:'.format(i_prj_str),
+                  wrk_formats['board_qty'])
+        wks.write(next_row, next_col - 1, build_qty,
+                  wrk_formats['board_qty'])  # Set initial board quantity.
+        # Define the named cell where the total board quantity can be found.
+        ctx.define_cell_name('BoardQty{}'.format(i_prj_str), next_row, next_col - 1)
+
+        yield next_row + 1
+        wks.write(next_row+1, start_col, 'Co.:',
+                  wrk_formats['proj_info_field'])
+        wks.write(next_row+1, start_col+1,
+                  prj_info[i_prj]['company'], wrk_formats['proj_info'])
+
+        # Create the cell to show unit cost of (each project) board parts.
+        wks.write(next_row+1, next_col - 2, 'Unit Cost{}:'.format(i_prj_str),
+                  wrk_formats['unit_cost_label'])
+        total_cost = values['total_cost_prj'][i_prj] if len(prj_info)>1 else values['total_cost']
+        wks.write_formula(next_row+1, next_col - 1,
+                  "=TotalCost{}/BoardQty{}".format(i_prj_str, i_prj_str),
+                  wrk_formats['unit_cost_currency'], total_cost / build_qty)
+
+        yield next_row + 2
+        wks.write(next_row+2, start_col,
+                  'Prj date:', wrk_formats['proj_info_field'])
+        wks.write(next_row+2, start_col+1,
+                  prj_info[i_prj]['date'], wrk_formats['proj_info'])
+
+        # Create the cell to show total cost of board parts for each distributor.
+        wks.write(next_row + 2, next_col - 2, 'Total Cost{}:'.format(i_prj_str),
+                  wrk_formats['total_cost_label'])
+        wks.write_comment(next_row + 2, next_col - 2, 'Use the minimum extend price across distributors not taking account available quantities.')
+        # Define the named cell where the total cost can be found.
+        ctx.define_cell_name('TotalCost{}'.format(i_prj_str), next_row + 2, next_col - 1)
+
+        next_row += 3
+
+    # Add general information of the scrap to track price modifications.
+    yield next_row
+    wks.write(next_row, start_col,
+              '$ date:', wrk_formats['proj_info_field'])
+    wks.write(next_row, start_col+1,
+              datetime.now().strftime("%Y-%m-%d %H:%M:%S"), wrk_formats['proj_info'])
+    # Add the total cost of all projects together.
+    if len(prj_info)>1:
+        # Create the row to show total cost of board parts for each distributor.
+        wks.write(next_row, next_col - 2, 'Total Prjs Cost:',
+                  wrk_formats['total_cost_label'])
+        # Define the named cell where the total cost can be found.
+        ctx.define_cell_name('TotalCost', next_row, next_col - 1)
+
+
+def get_globals_columns(parts, user_fields):
+    '''@brief Columns of the global part data.
+    @param parts `list()` of the part groups.
+    @param user_fields `list()` of the user fields to add as columns.
+    @return `dict()` of the columns with its position and header information.
+    '''
 
     # Columns for the various types of global part data.
     columns = {
@@ -467,14 +608,70 @@ Yellow -> Parts available, but haven't purchased enough.''',
                 'static': True,
             }
 
+    return columns
+
+
+def add_globals_to_worksheet(ctx, wks, wrk_formats, columns, start_row, start_col,
+                             total_cost_row, parts, dist_cols, values):
+    '''@brief Add global part data to the spreadsheet.
+
+    Generator yielding the row of the next cells, see `write_rows()`.
+    The minimum unit price, total purchase and the quantity highlights
+    use direct references to the distributor cells, not the volatile
+    `INDIRECT(ADDRESS())`, so they are not recalculated at every edit.
+    @param ctx `SpreadsheetContext` of the spreadsheet.
+    @param columns `dict()` of the columns from `get_globals_columns()`.
+    @param dist_cols `dict()` with the first column of each distributor.
+    @param values `dict()` of the formula results from `evaluate_formulas()`.
+    '''
+
+    logger.log(DEBUG_OVERVIEW, 'Writing the global part information...')
+
     num_cols = len(list(columns.keys()))
+    num_parts = len(parts)
+    PART_INFO_FIRST_ROW = start_row + 2  # Starting row of part info (after label and headers).
+    PART_INFO_LAST_ROW = PART_INFO_FIRST_ROW + num_parts - 1  # Last row of part info.
+    # For check the number of BOM files read, see the length of p[?]['manf#_qty'],
+    # if it is a `list()` instance, if don't, the lenth is always `1`.
+    num_prj = max([len(part.fields.get('manf#_qty',[])) if isinstance(part.fields.get('manf#_qty',[]),list) else 1 for part in parts])
+
+    # Sum the extended prices for all the parts to get the total minimum cost.
+    # If have read multiple BOM file calculate it by `SUMPRODUCT()` of the
+    # board project quantity components 'qty_prj*' by unitary price 'Unit$'.
+    total_cost_col = start_col + columns['ext_price']['col']
+    if num_prj > 1:
+        unit_price_col = start_col + columns['unit_price']['col']
+        unit_price_range = xl_range(PART_INFO_FIRST_ROW, unit_price_col,
+                                    PART_INFO_LAST_ROW, unit_price_col)
+        # Add each project board total.
+        for i_prj in range(num_prj):
+            qty_col = start_col + columns['qty_prj{}'.format(i_prj)]['col']
+            yield total_cost_row + 3*i_prj
+            wks.write_formula(total_cost_row + 3*i_prj, total_cost_col,
+                      '=SUMPRODUCT({qty_range},{unit_price_range})'.format(
+                            unit_price_range=unit_price_range,
+                            qty_range=xl_range(PART_INFO_FIRST_ROW, qty_col,
+                                PART_INFO_LAST_ROW, qty_col)),
+                      wrk_formats['total_cost_currency'], values['total_cost_prj'][i_prj])
+        # Add total of the spreadsheet, this can be equal or bigger than
+        # than the sum of the above totals, because, in the case of partial
+        # or fractional quantity of one part or subpart, the total quantity
+        # column 'qty' will be the ceil of the sum of the other ones.
+        total_cost_row = start_row -1 # Change the position of the total price cell.
+    yield total_cost_row
+    wks.write_formula(total_cost_row, total_cost_col, '=SUM({sum_range})'.format(
+              sum_range=xl_range(PART_INFO_FIRST_ROW, total_cost_col,
+                           PART_INFO_LAST_ROW, total_cost_col)),
+              wrk_formats['total_cost_currency'], values['total_cost'])
 
     row = start_row  # Start building global section at this row.
+    yield row
 
     # Add label for global section.
     wks.merge_range(row, start_col, row, start_col + num_cols - 1,
                     "Global Part Info", wrk_formats['global'])
     row += 1  # Go to next row.
+    yield row
 
     # Add column headers.
     for k in list(columns.keys()):
@@ -485,27 +682,87 @@ Yellow -> Parts available, but haven't purchased enough.''',
                        {'level': columns[k]['level']})
     row += 1  # Go to next row.
 
-    num_parts = len(parts)
-    PART_INFO_FIRST_ROW = row  # Starting row of part info.
-    PART_INFO_LAST_ROW = PART_INFO_FIRST_ROW + num_parts - 1  # Last row of part info.
+    # Highlight the needed quantity of the parts. The conditional formats are
+    # applied once to the whole column, the references are relative to the
+    # first part row and follow each row.
+    # Gather the cell references for calculating the part availability.
+    dist_qty_avail = []
+    dist_qty_purchased = []
+    dist_code_avail = []
+    for dist in list(distributor_dict.keys()):
+        # Offsets of the distributor columns, see `get_dist_columns()`.
+        dist_col = dist_cols[dist]
+        avail = xl_rowcol_to_cell(PART_INFO_FIRST_ROW, dist_col + 0)
+        purch = xl_rowcol_to_cell(PART_INFO_FIRST_ROW, dist_col + 1)
+        unit_price = xl_rowcol_to_cell(PART_INFO_FIRST_ROW, dist_col + 2)
+        part_num = xl_rowcol_to_cell(PART_INFO_FIRST_ROW, dist_col + 4)
+
+        # Get the contents of the quantity purchased cell for this part and distributor
+        # unless the unit price is not a number in which case return 0.
+        dist_qty_purchased.append(
+            'IF(ISNUMBER({}),{},0)'.format(unit_price, purch))
+
+        # Get the contents of the quantity available cell of this part from this distributor.
+        dist_qty_avail.append(avail)
+
+        # Get the contents of the manufacture and distributors codes.
+        dist_code_avail.append('ISBLANK({})'.format(part_num))
+
+    # If part do not have manf# code or distributor codes, color quantity cell gray.
+    wks.conditional_format(
+        PART_INFO_FIRST_ROW, start_col + columns['qty']['col'],
+        PART_INFO_LAST_ROW, start_col + columns['qty']['col'],
+        {
+            'type': 'formula',
+            'criteria': '=AND(ISBLANK({g}),{d})'.format(
+                g=xl_rowcol_to_cell(PART_INFO_FIRST_ROW,start_col + columns['manf#']['col']), # Manf# column also have to be blank.
+                d=(','.join(dist_code_avail) if dist_code_avail else 'TRUE()')
+             ),
+            'format': wrk_formats['not_manf_codes']
+        }
+    )
 
-    # Add data for each part to the spreadsheet.
-    # Order the references and collapse, if asked:
-    # e.g. J3, J2, J1, J6 => J1, J2, J3 J6. # `collapse=False`
-    # e.g. J3, J2, J1, J6 => J1-J3, J6.. # `collapse=True`
-    for part in parts:
-        #part.collapsed_refs = ','.join( order_refs(part.refs, collapse=collapse_refs) )
-        part.collapsed_refs = order_refs(part.refs, collapse=collapse_refs)
+    # If not asked to scrape, to correlate the prices and available quantities.
+    if distributor_dict.keys():
+        # If part is unavailable from all distributors, color quantity cell red.
+        wks.conditional_format(
+            PART_INFO_FIRST_ROW, start_col + columns['qty']['col'],
+            PART_INFO_LAST_ROW, start_col + columns['qty']['col'],
+            {
+                'type': 'formula',
+                'criteria': '=IF(SUM({})=0,1,0)'.format(','.join(dist_qty_avail)),
+                'format': wrk_formats['not_available']
+            }
+        )
 
-    # Then, order the part references with priority ref prefix, ref num, and subpart num.
-    def get_ref_key(part):
-        match = re.match(PART_REF_REGEX, part.collapsed_refs)
-        return [match.group('prefix'), match.group('ref_num'), match.group('subpart_num')]
-    parts.sort(key=get_ref_key)
+        # If total available part quantity is less than needed quantity, color cell orange. 
+        wks.conditional_format(
+            PART_INFO_FIRST_ROW, start_col + columns['qty']['col'],
+            PART_INFO_LAST_ROW, start_col + columns['qty']['col'],
+            {
+                'type': 'cell',
+                'criteria': '>',
+                'value': '=SUM({})'.format(','.join(dist_qty_avail)),
+                'format': wrk_formats['too_few_available']
+            }
+        )
+
+        # If total purchased part quantity is less than needed quantity, color cell yellow. 
+        wks.conditional_format(
+            PART_INFO_FIRST_ROW, start_col + columns['qty']['col'],
+            PART_INFO_LAST_ROW, start_col + columns['qty']['col'],
+            {
+                'type': 'cell',
+                'criteria': '>',
+                'value': '=SUM({})'.format(','.join(dist_qty_purchased)),
+                'format': wrk_formats['too_few_purchased'],
+            }
+        )
 
     # Add the global part data to the spreadsheet.
     used_currencies = []
-    for part in parts:
+    for i_part, part in enumerate(parts):
+        yield row
 
         # Enter part references.
         wks.write_string(row, start_col + columns['refs']['col'], part.collapsed_refs, wrk_formats['part_format'])
@@ -558,70 +815,31 @@ Yellow -> Parts available, but haven't purchased enough.''',
                 # the total quantity (to ceil use a Microsoft Excel
                 # compatible function.
                 for i_prj in range(len(qty)):
-                    wks.write(row,
-                          start_col + columns['qty_prj{}'.format(i_prj)]['col'],
-                          qty[i_prj].format('BoardQty{}'.format(i_prj)),
-                          wrk_formats['part_format'])
+                    if qty[i_prj]:
+                        wks.write_formula(row,
+                              start_col + columns['qty_prj{}'.format(i_prj)]['col'],
+                              qty[i_prj].format('BoardQty{}'.format(i_prj)),
+                              wrk_formats['part_format'], values['qty_prj'][i_part][i_prj])
+                    else:
+                        wks.write(row,
+                              start_col + columns['qty_prj{}'.format(i_prj)]['col'],
+                              0, wrk_formats['part_format'])
                 wks.write_formula(row, start_col + columns['qty']['col'],
                     '=CEILING(SUM({}:{}),1)'.format(
                         xl_rowcol_to_cell(row, start_col + columns['qty_prj0']['col']),
                         xl_rowcol_to_cell(row, start_col + columns['qty']['col']-1)
                     ),
-                    wrk_formats['part_format'])
+                    wrk_formats['part_format'], values['qty'][i_part])
             else:
-                wks.write(row, start_col + columns['qty']['col'],
-                          qty.format('BoardQty'), wrk_formats['part_format'])
+                wks.write_formula(row, start_col + columns['qty']['col'],
+                          qty.format('BoardQty'), wrk_formats['part_format'],
+                          values['qty'][i_part])
         except KeyError:
             pass
 
-        # Gather the cell references for calculating minimum unit price and part availability.
-        dist_unit_prices = []
-        dist_qty_avail = []
-        dist_qty_purchased = []
-        dist_code_avail = []
-        dist_ext_prices = []
+        # Get the currencies used among all distributors.
         for dist in list(distributor_dict.keys()):
-
-            # Get the currencies used among all distributors.
-            used_currencies.append(part.currency[dist])
-
-            # Get the name of the data range for this distributor.
-            dist_data_rng = '{}_part_data'.format(dist)
-
-            # Get the contents of the unit price cell for this part (row) and distributor (column+offset).
-            dist_unit_prices.append(
-                'INDIRECT(ADDRESS(ROW(),COLUMN({})+2))'.format(dist_data_rng))
-
-            # Get the contents of the quantity purchased cell for this part and distributor
-            # unless the unit price is not a number in which case return 0.
-            dist_qty_purchased.append(
-                'IF(ISNUMBER(INDIRECT(ADDRESS(ROW(),COLUMN({0})+2))),INDIRECT(ADDRESS(ROW(),COLUMN({0})+1)),0)'.format(dist_data_rng))
-
-            # Get the contents of the quantity available cell of this part from this distributor.
-            dist_qty_avail.append(
-                'INDIRECT(ADDRESS(ROW(),COLUMN({})+0))'.format(dist_data_rng))
-
-            # Get the contents of the manufacture and distributors codes.
-            dist_code_avail.append(
-                'ISBLANK(INDIRECT(ADDRESS(ROW(),COLUMN({})+4)))'.format(dist_data_rng))
-
-            # Get the contents of the manufacture and distributors codes.
-            dist_ext_prices.append(
-                'INDIRECT(ADDRESS(ROW(),COLUMN({})+3))'.format(dist_data_rng))
-
-        # If part do not have manf# code or distributor codes, color quantity cell gray.
-        wks.conditional_format(
-            row, start_col + columns['qty']['col'],
-            row, start_col + columns['qty']['col'],
-            {
-                'type': 'formula',
-                'criteria': '=AND(ISBLANK({g}),{d})'.format(
-                    g=xl_rowcol_to_cell(row,start_col + columns['manf#']['col']), # Manf# column also have to be blank.
-                    d=(','.join(dist_code_avail) if dist_code_avail else 'TRUE()')
-                 ),
-                'format': wrk_formats['not_manf_codes']
-            }
-        )
+            used_currencies.append(part.offers[dist].currency)
 
         # Enter the spreadsheet formula for calculating the minimum extended price (based on the unit price found on next formula).
         wks.write_formula(
@@ -630,51 +848,17 @@ Yellow -> Parts available, but haven't purchased enough.''',
                 qty        = xl_rowcol_to_cell(row, start_col + columns['qty']['col']),
                 unit_price = xl_rowcol_to_cell(row, start_col + columns['unit_price']['col'])
             ),
-            wrk_formats['currency']
+            wrk_formats['currency'], values['ext_price'][i_part]
         )
 
-        # If not asked to scrape, to correlate the prices and available quantities.
+        # Enter the spreadsheet formula to find this part's minimum unit price across all distributors.
         if distributor_dict.keys():
-            # Enter the spreadsheet formula to find this part's minimum unit price across all distributors.
             wks.write_formula(
                 row, start_col + columns['unit_price']['col'],
-                '=MINA({})'.format(','.join(dist_unit_prices)),
-                wrk_formats['currency']
-            )
-
-            # If part is unavailable from all distributors, color quantity cell red.
-            wks.conditional_format(
-                row, start_col + columns['qty']['col'],
-                row, start_col + columns['qty']['col'],
-                {
-                    'type': 'formula',
-                    'criteria': '=IF(SUM({})=0,1,0)'.format(','.join(dist_qty_avail)),
-                    'format': wrk_formats['not_available']
-                }
-            )
-
-            # If total available part quantity is less than needed quantity, color cell orange. 
-            wks.conditional_format(
-                row, start_col + columns['qty']['col'],
-                row, start_col + columns['qty']['col'],
-                {
-                    'type': 'cell',
-                    'criteria': '>',
-                    'value': '=SUM({})'.format(','.join(dist_qty_avail)),
-                    'format': wrk_formats['too_few_available']
-                }
-            )
-
-            # If total purchased part quantity is less than needed quantity, color cell yellow. 
-            wks.conditional_format(
-                row, start_col + columns['qty']['col'],
-                row, start_col + columns['qty']['col'],
-                {
-                    'type': 'cell',
-                    'criteria': '>',
-                    'value': '=SUM({})'.format(','.join(dist_qty_purchased)),
-                    'format': wrk_formats['too_few_purchased'],
-                }
+                '=MINA({})'.format(','.join(
+                    xl_rowcol_to_cell(row, dist_cols[dist] + 2)
+                    for dist in list(distributor_dict.keys()))),
+                wrk_formats['currency'], values['unit_price'][i_part]
             )
 
         # Enter part shortage quantity.
@@ -686,85 +870,74 @@ Yellow -> Parts available, but haven't purchased enough.''',
 
         row += 1  # Go to next row.
 
-    # Sum the extended prices for all the parts to get the total minimum cost.
-    # If have read multiple BOM file calculate it by `SUMPRODUCT()` of the
-    # board project quantity components 'qty_prj*' by unitary price 'Unit$'.
-    total_cost_col = start_col + columns['ext_price']['col']
-    if isinstance(qty, list):
-        unit_price_col = start_col + columns['unit_price']['col']
-        unit_price_range = xl_range(PART_INFO_FIRST_ROW, unit_price_col,
-                                    PART_INFO_LAST_ROW, unit_price_col)
-        # Add each project board total.
-        for i_prj in range(len(qty)):
-            qty_col = start_col + columns['qty_prj{}'.format(i_prj)]['col']
-            wks.write(total_cost_row + 3*i_prj, total_cost_col,
-                      '=SUMPRODUCT({qty_range},{unit_price_range})'.format(
-                            unit_price_range=unit_price_range,
-                            qty_range=xl_range(PART_INFO_FIRST_ROW, qty_col,
-                                PART_INFO_LAST_ROW, qty_col)),
-                      wrk_formats['total_cost_currency'])
-        # Add total of the spreadsheet, this can be equal or bigger than
-        # than the sum of the above totals, because, in the case of partial
-        # or fractional quantity of one part or subpart, the total quantity
-        # column 'qty' will be the ceil of the sum of the other ones.
-        total_cost_row = start_row -1 # Change the position of the total price cell.
-    wks.write(total_cost_row, total_cost_col, '=SUM({sum_range})'.format(
-              sum_range=xl_range(PART_INFO_FIRST_ROW, total_cost_col,
-                           PART_INFO_LAST_ROW, total_cost_col)),
-              wrk_formats['total_cost_currency'])
-
-    # Add the total purchase.
+    # Add the total purchase, the sum of the purchase in each distributor.
+    next_line = row + 1
+    yield next_line
     if distributor_dict.keys():
-        next_line = row + 1
         wks.write(next_line, start_col + columns['unit_price']['col'],
                       'Total Purchase:', wrk_formats['total_cost_label'])
         wks.write_comment(next_line, start_col + columns['unit_price']['col'],
                       'This is the total of your cart across all distributors.')
-        wks.write(next_line, start_col + columns['ext_price']['col'],
-                  '=SUM({})'.format(','.join(dist_ext_prices)),
-              wrk_formats['total_cost_currency'])
+        wks.write_formula(next_line, start_col + columns['ext_price']['col'],
+                  '=SUM({})'.format(','.join(
+                      xl_rowcol_to_cell(next_line, dist_cols[dist] + 3)
+                      for dist in list(distributor_dict.keys()))),
+              wrk_formats['total_cost_currency'], 0) # Nothing purchased yet.
 
     # Get the actual currency rate to use.
-    next_line = row + 1
     used_currencies = list(set(used_currencies))
-    logger.log(DEBUG_OVERVIEW, 'Getting distributor currency convertion rate {} to {}...', used_currencies, CURRENCY_ALPHA3)
+    logger.log(DEBUG_OVERVIEW, 'Getting distributor currency convertion rate {} to {}...', used_currencies, ctx.currency_alpha3)
     if used_currencies:
-        if CURRENCY_ALPHA3 in used_currencies:
-            used_currencies.remove(CURRENCY_ALPHA3)
+        if ctx.currency_alpha3 in used_currencies:
+            used_currencies.remove(ctx.currency_alpha3)
         wks.write(next_line, start_col + columns['value']['col'],
                     'Used currency rates:')
         next_line = next_line + 1
     for used_currency in used_currencies:
-        if used_currency!=CURRENCY_ALPHA3:
+        if used_currency!=ctx.currency_alpha3:
+            yield next_line
             wks.write(next_line, start_col + columns['value']['col'],
-                      '{c}({c_s})/{d}({d_s}):'.format(c=CURRENCY_ALPHA3, d=used_currency, c_s=CURRENCY_SYMBOL,
+                      '{c}({c_s})/{d}({d_s}):'.format(c=ctx.currency_alpha3, d=used_currency, c_s=ctx.currency_symbol,
                                     d_s=numbers.get_currency_symbol(used_currency, locale=DEFAULT_LANGUAGE)
                                   ),
                         wrk_formats['currency_rate_name']
                       )
-            WORKBOOK.define_name('{c}_{d}'.format(c=CURRENCY_ALPHA3, d=used_currency),
-                '={wks_name}!{cell_ref}'.format(
-                    wks_name="'" + WORKSHEET_NAME + "'",
-                    cell_ref=xl_rowcol_to_cell(next_line, columns['value']['col'] + 1,
-                                           row_abs=True, col_abs=True)))
+            ctx.define_cell_name('{c}_{d}'.format(c=ctx.currency_alpha3, d=used_currency),
+                                 next_line, columns['value']['col'] + 1)
             wks.write(next_line, columns['value']['col'] + 1,
-                        currency_convert(1, used_currency, CURRENCY_ALPHA3)
+                        currency_convert(1, used_currency, ctx.currency_alpha3)
                       )
             next_line = next_line + 1
 
-    # Return column following the globals so we know where to start next set of cells.
-    # Also return the columns where the references and quantity needed of each part is stored.
-    return next_line, start_col + num_cols, start_col + columns['refs']['col'], start_col + columns['qty']['col'], columns
+    # Add the KiCost package information at the end of the spreadsheet to debug
+    # information at the forum and "advertising".
+    yield next_line + 1
+    wks.write(next_line+1, start_col, ABOUT_MSG, wrk_formats['proj_info'])
 
 
-def add_dist_to_worksheet(wks, wrk_formats, columns_global, start_row, start_col,
-                          unit_cost_row, total_cost_row, part_ref_col, part_qty_col,
-                          dist, parts, supress_cat_url=True):
-    '''Add distributor-specific part data to the spreadsheet.'''
+def add_details_to_worksheet(wks, wrk_formats, start_row, parts):
+    '''@brief Add the part references to the worksheet of the part details.
 
-    logger.log(DEBUG_OVERVIEW, '# Writing {}'.format(distributor_dict[dist]['label']))
+    The distributors details are added by `add_dist_to_worksheet()`, in the
+    same rows of the pricing worksheet.
+    Generator yielding the row of the next cells, see `write_rows()`.
+    '''
+    row = start_row + 1 # Same row of the column headers of the pricing worksheet.
+    yield row
+    wks.write_string(row, 0, 'Refs', wrk_formats['header'])
+    row += 1
+    for part in parts:
+        yield row
+        wks.write_string(row, 0, part.collapsed_refs, wrk_formats['part_format'])
+        row += 1
 
-    global CURRENCY_ALPHA3
+
+def get_dist_columns(supress_cat_url=True):
+    '''@brief Columns of the distributor-specific part data, the same for all distributors.
+    @param supress_cat_url `True` to put the distributor link in the catalogue
+    number column, `False` to use an extra column.
+    @return `dict()` of the columns with its offset and header information.
+    '''
 
     # Columns for the various types of distributor-specific part data.
     columns = {
@@ -817,18 +990,97 @@ Orange -> Too little quantity available.'''
                             'comment': 'Distributor catalog link (ctrl-click).'
                         }})
         columns['part_num']['comment'] = 'Distributor-assigned catalog number for each part. Extra distributor data is shown as comment.'
+    return columns
+
+
+def add_dist_to_worksheet(ctx, wks, wrk_formats, columns, columns_global, start_row, start_col,
+                          unit_cost_row, total_cost_row, part_ref_col, part_qty_col,
+                          dist, parts, values, supress_cat_url=True, part_details='comments',
+                          details_wks=None, details_col=None):
+    '''@brief Add distributor-specific part data to the spreadsheet.
+
+    Generator yielding the row of the next cells, see `write_rows()`.
+    @param ctx `SpreadsheetContext` of the spreadsheet.
+    @param columns `dict()` of the columns from `get_dist_columns()`.
+    @param values `dict()` of the formula results of this distributor from `evaluate_formulas()`.
+    @param part_details Where to write the price breaks and the extra
+    information: 'comments', 'sheet' or 'none'.
+    @param details_wks Worksheet of the part details, used with `part_details='sheet'`.
+    @param details_col Column of this distributor in `details_wks`, followed
+    by the price breaks column.
+    '''
+
+    logger.log(DEBUG_OVERVIEW, '# Writing {}'.format(distributor_dict[dist]['label']))
+
     num_cols = len(list(columns.keys()))
+    num_parts = len(parts)
+    # For check the number of BOM files read, see the length of p[?]['manf#_qty'],
+    # if it is a `list()` instance, if don't, the lenth is always `1`.
+    num_prj = max([len(part.fields.get('manf#_qty',[])) if isinstance(part.fields.get('manf#_qty',[]),list) else 1 for part in parts])
+    PART_INFO_FIRST_ROW = start_row + 2  # Starting row of part info (after label and headers).
+    PART_INFO_LAST_ROW = PART_INFO_FIRST_ROW + num_parts - 1  # Last row of part info.
+
+    total_cost_col = start_col + columns['ext_price']['col']
+    unit_cost_col = start_col + columns['unit_price']['col']
+    dist_cat_col = start_col + columns['part_num']['col']
+    
+    # If more than one file (multi-files mode) show how many
+    # parts of each BOM as found at this distributor and
+    # the correspondent total price.
+    if num_prj>1:
+        for i_prj in range(num_prj):
+            # Sum the extended prices (unit multiplied by quantity) for each file/BOM.
+            qty_prj_col = part_qty_col - (num_prj - i_prj)
+            row = total_cost_row + i_prj * 3
+            yield row
+            wks.write_formula(row, total_cost_col,
+                      '=SUMPRODUCT({qty_range},{unit_price_range})'.format(
+                            qty_range=xl_range(PART_INFO_FIRST_ROW, qty_prj_col,
+                                            PART_INFO_LAST_ROW, qty_prj_col),
+                            unit_price_range=xl_range(PART_INFO_FIRST_ROW, unit_cost_col,
+                                            PART_INFO_LAST_ROW, unit_cost_col)),
+                      wrk_formats['total_cost_currency'], values['total_cost_prj'][i_prj])
+            # Show how many parts were found at this distributor.
+            wks.write_formula(row, dist_cat_col,
+                '=COUNTIFS({price_range},"<>",{qty_range},"<>0",{qty_range},"<>")&" of "&COUNTIFS({qty_range},"<>0",{qty_range},"<>")&" parts found"'.format(
+                price_range=xl_range(PART_INFO_FIRST_ROW, total_cost_col,
+                                     PART_INFO_LAST_ROW, total_cost_col),
+                qty_range=xl_range(PART_INFO_FIRST_ROW, qty_prj_col,
+                                   PART_INFO_LAST_ROW, qty_prj_col)),
+                wrk_formats['found_part_pct'], '{} of {} parts found'.format(*values['found_prj'][i_prj]))
+            wks.write_comment(row, dist_cat_col, 'Number of parts found at this distributor for the project {}.'.format(i_prj))
+        total_cost_row = PART_INFO_FIRST_ROW - 3 # Shift the total price in this distributor.
+    
+    # Sum the extended prices for all the parts to get the total cost from this distributor.
+    yield total_cost_row
+    wks.write_formula(total_cost_row, total_cost_col, '=SUM({sum_range})'.format(
+        sum_range=xl_range(PART_INFO_FIRST_ROW, total_cost_col,
+                           PART_INFO_LAST_ROW, total_cost_col)),
+              wrk_formats['total_cost_currency'], values['total_cost'])
+    # Show how many parts were found at this distributor.
+    wks.write_formula(total_cost_row, dist_cat_col,
+        '=(COUNTA({count_range})&" of "&ROWS({count_range})&" parts found"'.format(
+        #'=COUNTIF({count_range},"<>")&" of "&ROWS({count_range})&" parts found"'.format(
+            count_range=xl_range(PART_INFO_FIRST_ROW, total_cost_col,
+                                 PART_INFO_LAST_ROW, total_cost_col)),
+            wrk_formats['found_part_pct'], '{} of {} parts found'.format(values['found'], num_parts))
+    wks.write_comment(total_cost_row, dist_cat_col, 'Number of parts found at this distributor.')
 
     row = start_row  # Start building distributor section at this row.
+    yield row
 
     # Add label for this distributor.
     wks.merge_range(row, start_col, row, start_col + num_cols - 1,
             distributor_dict[dist]['label']['name'].title(), wrk_formats[dist])
+    if details_wks:
+        details_wks.merge_range(row, details_col, row, details_col + 1,
+            distributor_dict[dist]['label']['name'].title(), wrk_formats[dist])
     #if distributor_dict[dist]['type']!='local':
     #    wks.write_url(row, start_col,
     #        distributor_dict[dist]['label']['url'], wrk_formats[dist],
     #        distributor_dict[dist]['label']['name'].title())
     row += 1  # Go to next row.
+    yield row
 
     # Add column headers, comments, and outline level (for hierarchy).
     for k in list(columns.keys()):
@@ -837,29 +1089,28 @@ Orange -> Too little quantity available.'''
         wks.write_comment(row, col, columns[k]['comment'])
         wks.set_column(col, col, columns[k]['width'], None,
                        {'level': columns[k]['level']})
+    if details_wks:
+        details_wks.write_string(row, details_col, 'Info', wrk_formats['header'])
+        details_wks.write_string(row, details_col + 1, 'Price Breaks', wrk_formats['header'])
+        details_wks.set_column(details_col, details_col + 1, 30)
     row += 1  # Go to next row.
 
-    num_parts = len(parts)
-    # For check the number of BOM files read, see the length of p[?]['manf#_qty'],
-    # if it is a `list()` instance, if don't, the lenth is always `1`.
-    num_prj = max([len(part.fields.get('manf#_qty',[])) if isinstance(part.fields.get('manf#_qty',[]),list) else 1 for part in parts])
-
     # Add distributor data for each part.
-    PART_INFO_FIRST_ROW = row  # Starting row of part info.
-    PART_INFO_LAST_ROW = PART_INFO_FIRST_ROW + num_parts - 1  # Last row of part info.
-
-    for part in parts:
+    priced_rows = [] # Rows of the parts with pricing.
+    for i_part, part in enumerate(parts):
+        yield row
 
-        dist_part_num = part.part_num[dist] # Get the distributor part number.
-        price_tiers = part.price_tiers[dist] # Extract price tiers from distributor HTML page tree.
-        dist_currency =  part.currency[dist] # Extract currency used by the distributor.
+        offer = part.offers[dist] # Data of the part in this distributor.
+        dist_part_num = offer.part_num # Get the distributor part number.
+        price_tiers = dict(offer.price_tiers) # Extract price tiers from distributor HTML page tree.
+        dist_currency = offer.currency # Extract currency used by the distributor.
 
         # If the part number doesn't exist, just leave this row blank.
         if len(dist_part_num) == 0:
             row += 1  # Skip this row and go to the next.
             continue
 
-        # if len(dist_part_num) == 0 or part.qty_avail[dist] is None or len(list(price_tiers.keys())) == 0:
+        # if len(dist_part_num) == 0 or offer.qty_avail is None or len(list(price_tiers.keys())) == 0:
             # row += 1  # Skip this row and go to the next.
             # continue
 
@@ -869,54 +1120,51 @@ Orange -> Too little quantity available.'''
         else:
             if supress_cat_url:
                 dist_part_num = 'Link' # To use as text for the link.
-        try:
-            # Add a comment in the 'cat#' column with extra informations gotten in the distributor web page.
-            comment = '\n'.join(sorted([ k.capitalize()+SEPRTR+' '+v for k, v in part.info_dist[dist].items() if k in EXTRA_INFO_DISPLAY]))
-            if comment:
-                wks.write_comment(row, start_col + columns['part_num']['col'], comment)
-        except:
-            pass
+        details = [] # Extra information of the part.
+        if part_details != 'none':
+            try:
+                # Add a comment in the 'cat#' column with extra informations gotten in the distributor web page.
+                comment = '\n'.join(sorted([ k.capitalize()+SEPRTR+' '+v for k, v in offer.info_dist.items() if k in EXTRA_INFO_DISPLAY]))
+                if comment:
+                    if part_details == 'comments':
+                        wks.write_comment(row, start_col + columns['part_num']['col'], comment)
+                    else:
+                        details.append(comment)
+            except:
+                pass
 
         # Enter a link to the distributor webpage for this part, even if there
         # is no valid quantity or pricing for the part (see next conditional).
         # Having the link present will help debug if the extraction of the
         # quantity or pricing information was done correctly.
-        if part.url[dist]:
+        if offer.url:
             if supress_cat_url:
                 wks.write_url(row, start_col + columns['part_num']['col'],
-                    part.url[dist], string=dist_part_num)
+                    offer.url, string=dist_part_num)
             else:
-                wks.write_url(row, start_col + columns['link']['col'], part.url[dist])
+                wks.write_url(row, start_col + columns['link']['col'], offer.url)
 
         # Enter quantity of part available at this distributor unless it is None
         # which means the part is not stocked.
-        if part.qty_avail[dist]:
+        if offer.qty_avail:
             wks.write(row, start_col + columns['avail']['col'],
-                  part.qty_avail[dist], wrk_formats['part_format'])
+                  offer.qty_avail, wrk_formats['part_format'])
         else:
             wks.write(row, start_col + columns['avail']['col'],
                 'NonStk', wrk_formats['not_stocked'])
-            wks.write_comment(row, start_col + columns['avail']['col'], 
-                'This part is listed but is not normally stocked.')
+            if part_details == 'comments':
+                wks.write_comment(row, start_col + columns['avail']['col'], 
+                    'This part is listed but is not normally stocked.')
+            elif part_details == 'sheet':
+                details.insert(0, 'This part is listed but is not normally stocked.')
 
         # Purchase quantity always starts as blank because nothing has been purchased yet.
         wks.write(row, start_col + columns['purch']['col'], '', None)
 
         # Add pricing information if it exists.
         if len(list(price_tiers)) > 0:
-            # Add the price for a single unit if it doesn't already exist in the tiers.
-            try:
-                min_qty = min(price_tiers.keys())
-                if min_qty > 1:
-                    price_tiers[1] = price_tiers[
-                        min_qty
-                    ]  # Set unit price to price of lowest available quantity.
-            except ValueError:  # This happens if the price tier list is empty.
-                pass
-            price_tiers[0] = 0.00  # Enter quantity-zero pricing so LOOKUP works correctly in the spreadsheet.
-
             # Sort the tiers based on quantities and turn them into lists of strings.
-            qtys = sorted(price_tiers.keys())
+            qtys = lookup_price_tiers(price_tiers)
 
             avail_qty_col = start_col + columns['avail']['col']
             purch_qty_col = start_col + columns['purch']['col']
@@ -925,7 +1173,7 @@ Orange -> Too little quantity available.'''
 
             # Enter a spreadsheet lookup function that determines the unit price based on the needed quantity
             # or the purchased quantity (if that is non-zero).
-            if dist_currency==CURRENCY_ALPHA3:
+            if dist_currency==ctx.currency_alpha3:
                 wks.write_formula(
                     row, unit_price_col,
                     '=iferror(lookup(if({purch_qty}="",{needed_qty},{purch_qty}),{{{qtys}}},{{{prices}}}),"")'.format(
@@ -933,52 +1181,37 @@ Orange -> Too little quantity available.'''
                         purch_qty=xl_rowcol_to_cell(row, purch_qty_col),
                         qtys=','.join([str(q) for q in qtys]),
                         prices=','.join([str(price_tiers[q]) for q in qtys])),
-                        wrk_formats['currency'])
+                        wrk_formats['currency'], values['unit_price'][i_part])
             else:
                 wks.write_formula(
                     row, unit_price_col,
                     '=iferror({rate}*lookup(if({purch_qty}="",{needed_qty},{purch_qty}),{{{qtys}}},{{{prices}}}),"")'.format(
-                        rate='{c}_{d}'.format(c=CURRENCY_ALPHA3, d=dist_currency), # Currency rate used to this distributor.
+                        rate='{c}_{d}'.format(c=ctx.currency_alpha3, d=dist_currency), # Currency rate used to this distributor.
                         needed_qty=xl_rowcol_to_cell(row, part_qty_col),
                         purch_qty=xl_rowcol_to_cell(row, purch_qty_col),
                         qtys=','.join([str(q) for q in qtys]),
                         prices=','.join([str(price_tiers[q]) for q in qtys])),
-                        wrk_formats['currency'])
+                        wrk_formats['currency'], values['unit_price'][i_part])
 
-            # Add a comment to the cell showing the qty/price breaks.
             minimum_order_qty = qtys[1] # Before get the minimum order quantity to validate the user cart.
-            dist_currency_symbol = numbers.get_currency_symbol(dist_currency, locale=DEFAULT_LANGUAGE)
-            price_break_info = 'Qty/Price Breaks ({c}):\n  Qty  -  Unit{s}  -  Ext{s}\n================'.format(c=dist_currency, s=dist_currency_symbol)
-            for q in qtys[1:]:  # Skip the first qty which is always 0.
-                price = price_tiers[q]
-                price_break_info += '\n{:>6d} {:>7s} {:>10s}'.format( q,
-                    numbers.format_currency(price, dist_currency, locale=DEFAULT_LANGUAGE),
-                    numbers.format_currency(price*q, dist_currency, locale=DEFAULT_LANGUAGE))
-            wks.write_comment(row, unit_price_col, price_break_info)
-
-            # Conditional format to show no quantity is available.
-            wks.conditional_format(
-                row, start_col + columns['avail']['col'], 
-                row, start_col + columns['avail']['col'],
-                {
-                    'type': 'cell',
-                    'criteria': '==',
-                    'value': 0,
-                    'format': wrk_formats['not_available']
-                }
-            )
-
-            # Conditional format to show the available quantity is less than required.
-            wks.conditional_format(
-                row, start_col + columns['avail']['col'], 
-                row, start_col + columns['avail']['col'],
-                {
-                    'type': 'cell',
-                    'criteria': '<',
-                    'value': xl_rowcol_to_cell(row, part_qty_col),
-                    'format': wrk_formats['too_few_available']
-                }
-            )
+            if part_details == 'comments':
+                # Add a comment to the cell showing the qty/price breaks.
+                dist_currency_symbol = numbers.get_currency_symbol(dist_currency, locale=DEFAULT_LANGUAGE)
+                price_break_info = 'Qty/Price Breaks ({c}):\n  Qty  -  Unit{s}  -  Ext{s}\n================'.format(c=dist_currency, s=dist_currency_symbol)
+                for q in qtys[1:]:  # Skip the first qty which is always 0.
+                    price = price_tiers[q]
+                    price_break_info += '\n{:>6d} {:>7s} {:>10s}'.format( q,
+                        numbers.format_currency(price, dist_currency, locale=DEFAULT_LANGUAGE),
+                        numbers.format_currency(price*q, dist_currency, locale=DEFAULT_LANGUAGE))
+                wks.write_comment(row, unit_price_col, price_break_info)
+            elif part_details == 'sheet':
+                # One qty/unit price break by line.
+                details_wks.write_string(row, details_col + 1, '\n'.join(
+                    '{}: {}'.format(q, numbers.format_currency(price_tiers[q], dist_currency, locale=DEFAULT_LANGUAGE))
+                    for q in qtys[1:]), wrk_formats['part_details'])
+
+            # Highlighted by the conditional formats of the rows with pricing.
+            priced_rows.append(row)
 
             # Conditional format to show that the part have a minimum order quantity not respected.
             if minimum_order_qty<1:
@@ -994,17 +1227,6 @@ Orange -> Too little quantity available.'''
                         'format': wrk_formats['order_min_qty']
                     }
                 )
-            # Conditional format to show the purchase quantity is more than what is available.
-            wks.conditional_format(
-                row, start_col + columns['purch']['col'], 
-                row, start_col + columns['purch']['col'],
-                {
-                    'type': 'cell',
-                    'criteria': '>',
-                    'value': xl_rowcol_to_cell(row, avail_qty_col),
-                    'format': wrk_formats['order_too_much']
-                }
-            )
 
             # Enter the formula for the extended price = purch qty * unit price.
             wks.write_formula(
@@ -1013,72 +1235,70 @@ Orange -> Too little quantity available.'''
                     needed_qty=xl_rowcol_to_cell(row, part_qty_col),
                     purch_qty=xl_rowcol_to_cell(row, purch_qty_col),
                     unit_price=xl_rowcol_to_cell(row, unit_price_col)),
-                wrk_formats['currency'])
-
-            if len(distributor_dict)>1: # Just use the best price highlight if more than one distributor.
-                # Conditionally format the extended price cell that contains the best price.
-                wks.conditional_format(row, ext_price_col, row, ext_price_col, {
-                    'type': 'cell',
-                    'criteria': '<=',
-                    'value': xl_rowcol_to_cell(row, part_qty_col+2),
-                    # This is the global data cell holding the minimum extended price for this part.
-                    'format': wrk_formats['best_price']
-                })
-                # Conditionally format the unit price cell that contains the best price.
-                wks.conditional_format(row, unit_price_col, row, unit_price_col, {
-                    'type': 'cell',
-                    'criteria': '<=',
-                    'value': xl_rowcol_to_cell(row, part_qty_col+1),
-                    # This is the global data cell holding the minimum unit price for this part.
-                    'format': wrk_formats['best_price']
-                })
+                wrk_formats['currency'], values['ext_price'][i_part])
+
+        if details:
+            details_wks.write_string(row, details_col, '\n'.join(details), wrk_formats['part_details'])
 
         # Finished processing distributor data for this part.
         row += 1  # Go to next row.
 
-    total_cost_col = start_col + columns['ext_price']['col']
-    unit_cost_col = start_col + columns['unit_price']['col']
-    dist_cat_col = start_col + columns['part_num']['col']
-    
-    # If more than one file (multi-files mode) show how many
-    # parts of each BOM as found at this distributor and
-    # the correspondent total price.
-    if num_prj>1:
-        for i_prj in range(num_prj):
-            # Sum the extended prices (unit multiplied by quantity) for each file/BOM.
-            qty_prj_col = part_qty_col - (num_prj - i_prj)
-            row = total_cost_row + i_prj * 3
-            wks.write(row, total_cost_col,
-                      '=SUMPRODUCT({qty_range},{unit_price_range})'.format(
-                            qty_range=xl_range(PART_INFO_FIRST_ROW, qty_prj_col,
-                                            PART_INFO_LAST_ROW, qty_prj_col),
-                            unit_price_range=xl_range(PART_INFO_FIRST_ROW, unit_cost_col,
-                                            PART_INFO_LAST_ROW, unit_cost_col)),
-                      wrk_formats['total_cost_currency'])
-            # Show how many parts were found at this distributor.
-            wks.write(row, dist_cat_col,
-                '=COUNTIFS({price_range},"<>",{qty_range},"<>0",{qty_range},"<>")&" of "&COUNTIFS({qty_range},"<>0",{qty_range},"<>")&" parts found"'.format(
-                price_range=xl_range(PART_INFO_FIRST_ROW, total_cost_col,
-                                     PART_INFO_LAST_ROW, total_cost_col),
-                qty_range=xl_range(PART_INFO_FIRST_ROW, qty_prj_col,
-                                   PART_INFO_LAST_ROW, qty_prj_col)),
-                wrk_formats['found_part_pct'])
-            wks.write_comment(row, dist_cat_col, 'Number of parts found at this distributor for the project {}.'.format(i_prj))
-        total_cost_row = PART_INFO_FIRST_ROW - 3 # Shift the total price in this distributor.
-    
-    # Sum the extended prices for all the parts to get the total cost from this distributor.
-    wks.write(total_cost_row, total_cost_col, '=SUM({sum_range})'.format(
-        sum_range=xl_range(PART_INFO_FIRST_ROW, total_cost_col,
-                           PART_INFO_LAST_ROW, total_cost_col)),
-              wrk_formats['total_cost_currency'])
-    # Show how many parts were found at this distributor.
-    wks.write(total_cost_row, dist_cat_col,
-        '=(COUNTA({count_range})&" of "&ROWS({count_range})&" parts found"'.format(
-        #'=COUNTIF({count_range},"<>")&" of "&ROWS({count_range})&" parts found"'.format(
-            count_range=xl_range(PART_INFO_FIRST_ROW, total_cost_col,
-                                 PART_INFO_LAST_ROW, total_cost_col)),
-            wrk_formats['found_part_pct'])
-    wks.write_comment(total_cost_row, dist_cat_col, 'Number of parts found at this distributor.')
+    # Highlight the parts with pricing. Each conditional format is applied
+    # once to all their rows, the references are relative to the first one
+    # and follow each row.
+    if priced_rows:
+        first_row = priced_rows[0]
+        avail_qty_col = start_col + columns['avail']['col']
+        purch_qty_col = start_col + columns['purch']['col']
+        unit_price_col = start_col + columns['unit_price']['col']
+        ext_price_col = start_col + columns['ext_price']['col']
+
+        # Conditional format to show no quantity is available.
+        wks.conditional_format(first_row, avail_qty_col, first_row, avail_qty_col, {
+            'type': 'cell',
+            'criteria': '==',
+            'value': 0,
+            'format': wrk_formats['not_available'],
+            'multi_range': rows_multi_range(priced_rows, avail_qty_col)
+        })
+
+        # Conditional format to show the available quantity is less than required.
+        wks.conditional_format(first_row, avail_qty_col, first_row, avail_qty_col, {
+            'type': 'cell',
+            'criteria': '<',
+            'value': xl_rowcol_to_cell(first_row, part_qty_col),
+            'format': wrk_formats['too_few_available'],
+            'multi_range': rows_multi_range(priced_rows, avail_qty_col)
+        })
+
+        # Conditional format to show the purchase quantity is more than what is available.
+        wks.conditional_format(first_row, purch_qty_col, first_row, purch_qty_col, {
+            'type': 'cell',
+            'criteria': '>',
+            'value': xl_rowcol_to_cell(first_row, avail_qty_col),
+            'format': wrk_formats['order_too_much'],
+            'multi_range': rows_multi_range(priced_rows, purch_qty_col)
+        })
+
+        if len(distributor_dict)>1: # Just use the best price highlight if more than one distributor.
+            # Conditionally format the extended price cell that contains the best price.
+            wks.conditional_format(first_row, ext_price_col, first_row, ext_price_col, {
+                'type': 'cell',
+                'criteria': '<=',
+                'value': xl_rowcol_to_cell(first_row, part_qty_col+2),
+                # This is the global data cell holding the minimum extended price for this part.
+                'format': wrk_formats['best_price'],
+                'multi_range': rows_multi_range(priced_rows, ext_price_col)
+            })
+            # Conditionally format the unit price cell that contains the best price.
+            wks.conditional_format(first_row, unit_price_col, first_row, unit_price_col, {
+                'type': 'cell',
+                'criteria': '<=',
+                'value': xl_rowcol_to_cell(first_row, part_qty_col+1),
+                # This is the global data cell holding the minimum unit price for this part.
+                'format': wrk_formats['best_price'],
+                'multi_range': rows_multi_range(priced_rows, unit_price_col)
+            })
 
     # Add list of part numbers and purchase quantities for ordering from this distributor.
     ORDER_START_COL = start_col + 1
@@ -1089,6 +1309,7 @@ Orange -> Too little quantity available.'''
     purch_qty_col = start_col + columns['purch']['col']
     ext_price_col = start_col + columns['ext_price']['col']
     ORDER_HEADER =  PART_INFO_LAST_ROW + 2
+    yield ORDER_HEADER
     wks.write_formula( # Expended many in this distributor.
         ORDER_HEADER, ext_price_col,
         '=SUMIF({count_range},">0",{price_range})'.format(
@@ -1097,7 +1318,7 @@ Orange -> Too little quantity available.'''
             price_range=xl_range(PART_INFO_FIRST_ROW, ext_price_col,
                                  PART_INFO_LAST_ROW, ext_price_col),
         ),
-        wrk_formats['total_cost_currency']
+        wrk_formats['total_cost_currency'], 0 # Nothing purchased yet.
     )
     wks.write_formula( # Quantity of purchased part in this distributor.
         ORDER_HEADER, purch_qty_col,
@@ -1107,7 +1328,7 @@ Orange -> Too little quantity available.'''
             count_range_price=xl_range(PART_INFO_FIRST_ROW, ext_price_col,
                                  PART_INFO_LAST_ROW, ext_price_col)
         ),
-        wrk_formats['found_part_pct']
+        wrk_formats['found_part_pct'], ''
     )
     wks.write_comment(ORDER_HEADER, purch_qty_col,
         'Copy the information below to the BOM import page of the distributor web site.')
@@ -1118,44 +1339,22 @@ Orange -> Too little quantity available.'''
                             d=distributor_dict[dist]['name']
                         ))
     else:
-        # This script enters a function into a spreadsheet cell that
-        # prints the information found in info_col into the order_col column
-        # of the order.
-        # This very complicated spreadsheet function does the following:
-        # 1) Computes the set of row index in the part data that have
-        #    non-empty cells in sel_range1 and sel_range2. (Innermost
-        #    nested IF and ROW commands.) sel_range1 and sel_range2 are
-        #    the part's catalog number and purchase quantity.
-        # 2) Selects the k'th smallest of the row indices where k is the
-        #    number of rows between the current part row in the order and the
-        #    top row of the order. (SMALL() and ROW() commands.)
-        # 3) Gets the cell contents  from the get_range using the k'th
-        #    smallest row index found in step #2. (INDEX() command.)
-        # 4) Converts the cell contents to a string if it is numeric.
-        #    (num_to_text_func is used.) Otherwise, it's already a string.
-        # 5) CONCATENATES the string from step #4 with the delimiter
-        #    that goes between fields of an order for a part.
-        #    (CONCATENATE() command.)
-        # 6) If any error occurs (which usually means the indexed cell
-        #    contents were blank), then a blank is printed. Otherwise,
-        #    the string from step #5 is printed in this cell.
-        order_func = 'IFERROR(CONCATENATE({}),"")'
-        order_info_func_model = '''
-                        INDEX(
-                            {get_range},
-                            SMALL(
-                                IF( ISNUMBER({qty}),
-                                    IF( {qty} > 0,
-                                        IF( {code} <> "",
-                                            ROW({qty}) - MIN(ROW({qty})) + 1
-                                        )
-                                    )
-                                ),
-                                ROW()-ROW({order_first_row})+1
-                            )
-                        )
-        '''
-        order_info_func_model = re.sub('[\s\n]', '', order_info_func_model) # Strip all the whitespace from the function string.
+        # The order list is build in two steps, both linear in the number of parts:
+        # 1) A helper column (hidden, at the left of the order) gets, for each
+        #    part, the running count of parts with non-empty catalog number and
+        #    purchase quantity: the count itself if the part is purchased or
+        #    the count plus 0.5 if not. This makes an increasing sequence where
+        #    the k'th purchased part is the only one with the value k.
+        # 2) The k'th row of the order finds this part by a binary search,
+        #    `MATCH()` of k in the helper column, gets the cell contents of
+        #    each field by `INDEX()` and CONCATENATES them with the delimiter
+        #    of the distributor. If k is bigger than the number of purchased
+        #    parts (the last helper value), or any error occurs (which usually
+        #    means the indexed cell contents were blank), then a blank is printed.
+        # This replaces the `INDEX(SMALL(IF()))` array formula in each order row,
+        # quadratic in the number of parts.
+        order_func = 'IFERROR(IF({k}>{index_last},"",CONCATENATE({info})),"")'
+        order_info_func_model = 'INDEX({get_range},{pos})'
 
         # Create the line order by the fields speficied by each distributor.
         delimier = ',"' + distributor_dict[dist]['order']['delimiter'] + '",' # Function delimiter plus distributor code delimiter.
@@ -1200,44 +1399,160 @@ Orange -> Too little quantity available.'''
                                  PART_INFO_LAST_ROW, info_range)
             order_part_info[-1] = order_part_info[-1].format(
                         get_range=info_range,
-                        qty='{qty}', # keep all other for future replacement.
-                        code='{code}',
-                        order_first_row='{order_first_row}')
+                        pos='{pos}') # keep for future replacement.
         # If already have some information, add the delimiter for
         # Microsoft Excel/LibreOffice Calc function.
-        order_func = order_func.format( delimier.join(order_part_info) )
+        order_func = order_func.format(index_last='{index_last}', pos='{pos}', k='{k}',
+                                       info=delimier.join(order_part_info))
 
         # These are the columns where the part catalog numbers and purchase quantities can be found.
         if 'part_num' in cols:
             purchase_code = start_col + columns['part_num']['col']
         elif 'manf#' in cols:
-            purchase_code = start_col + columns_global['manf#']['col']#TODO columns_global
+            purchase_code = columns_global['manf#']['col']
         else:
             purchase_code = ""
             logger.warning("Not valid  quantity/code field `{f}` for purchase list at {d}.".format(
                         f=col,
                         d=distributor_dict[dist]['name']
                     ))
-        purchase_code = xl_range(PART_INFO_FIRST_ROW, purchase_code,
-                                 PART_INFO_LAST_ROW, purchase_code)
-        purchase_qty = start_col + columns['purch']['col']
-        purchase_qty = xl_range(PART_INFO_FIRST_ROW, purchase_qty,
-                                PART_INFO_LAST_ROW, purchase_qty)
-        # Fill the formula with the control parameters.
-        order_func = order_func.format(
-                        order_first_row=xl_rowcol_to_cell(ORDER_FIRST_ROW, 0, row_abs=True),
-                        code=purchase_code,
-                        qty=purchase_qty
-                    )
-        # Now write the order_func into every row of the order in the given column.
+        purchase_qty_col = start_col + columns['purch']['col']
+        # The helper column of the running count of purchased parts.
+        index_col = ORDER_START_COL - 1
+        index_range = xl_range_abs(ORDER_FIRST_ROW, index_col, ORDER_LAST_ROW, index_col)
+        index_last = xl_rowcol_to_cell(ORDER_LAST_ROW, index_col, row_abs=True, col_abs=True)
+        # Write the helper and the order_func into every row of the order.
         order_col = ORDER_START_COL
-        dist_col = start_col + columns['unit_price']['col']
-        info_col = dist_col
-        for r in range(ORDER_FIRST_ROW, ORDER_LAST_ROW + 1):
-            wks.write_array_formula(
-                xl_range(r, order_col, r, order_col), '{{={f}}}'.format(f=order_func))
+        for i in range(num_parts):
+            order_row = ORDER_FIRST_ROW + i
+            yield order_row
+            part_row = PART_INFO_FIRST_ROW + i
+            index_func = 'IF(ISNUMBER({qty}),IF(AND({qty}>0,{code}<>""),1,0.5),0.5)'.format(
+                            qty=xl_rowcol_to_cell(part_row, purchase_qty_col),
+                            code=xl_rowcol_to_cell(part_row, purchase_code))
+            if i > 0:
+                index_func = 'INT({})+{}'.format(
+                            xl_rowcol_to_cell(order_row - 1, index_col), index_func)
+            # Nothing purchased yet, so the helper values are 0.5 and the order is empty.
+            wks.write_formula(order_row, index_col, '=' + index_func,
+                              wrk_formats['order_index'], 0.5)
+            wks.write_formula(order_row, order_col, '=' + order_func.format(
+                    index_last=index_last, k=i + 1,
+                    pos='MATCH({},{},1)'.format(i + 1, index_range)), None, '')
+
+
+def lookup_price_tiers(price_tiers):
+    '''@brief Prepare the price tiers to the `LOOKUP()` of the unit price.
+
+    Add the price for a single unit, the price of the lowest available
+    quantity, if it doesn't already exist in the tiers and the quantity-zero
+    pricing so LOOKUP works correctly in the spreadsheet.
+    @param price_tiers `dict()` of the price breaks {qty: price}, changed in place.
+    @return Sorted `list()` of the tier quantities.
+    '''
+    min_qty = min(price_tiers.keys())
+    if min_qty > 1:
+        price_tiers[1] = price_tiers[min_qty]
+    price_tiers[0] = 0.00
+    return sorted(price_tiers.keys())
+
+
+def evaluate_formulas(parts, dist_list, num_prj, build_qty, currency=DEFAULT_CURRENCY):
+    '''@brief Evaluate the formulas of the spreadsheet in Python.
+
+    The results are written with the formulas as their cached values, so
+    the viewers that don't calculate (web previews, data only readers) show
+    the costs and the spreadsheet software doesn't need to recalculate the
+    whole workbook when it is opened. They are the values of a new
+    spreadsheet: `build_qty` boards of each project and nothing purchased.
+    @param parts `list()` of the part groups, in the spreadsheet order.
+    @param dist_list `list()` of the distributors.
+    @param num_prj Number of projects (BOM files).
+    @param build_qty Initial quantity of boards of each project.
+    @param currency Currency of the prices in ISO4217.
+    @return `dict()` with the 'qty', 'qty_prj', 'unit_price' and 'ext_price'
+    `list()` of the global columns, the 'total_cost' and 'total_cost_prj'
+    and, by distributor name, a `dict()` with its 'unit_price' and
+    'ext_price' (`None` for the parts without pricing), 'total_cost',
+    'total_cost_prj', 'found' and 'found_prj' values.
+    '''
+    rates = {currency: 1}
+    values = {'qty': [], 'qty_prj': [], 'unit_price': [], 'ext_price': []}
+    for dist in dist_list:
+        values[dist] = {'unit_price': [], 'ext_price': []}
 
-    return start_col + num_cols  # Return column following the globals so we know where to start next set of cells.
+    for part in parts:
+        qty = partgroup_qty_value(part, build_qty)
+        if isinstance(qty, list):
+            qty_prj = qty
+            qty = int(math.ceil(sum(qty_prj))) # `CEILING(SUM())` of the projects.
+        else:
+            qty_prj = [qty] if num_prj == 1 else [0] * num_prj # Blank project quantities.
+        values['qty'].append(qty)
+        values['qty_prj'].append(qty_prj)
+
+        unit_prices = []
+        for dist in dist_list:
+            offer = part.offers[dist]
+            unit_price = ext_price = None
+            if offer.part_num and offer.price_tiers:
+                # `LOOKUP()` of the needed quantity in the tiers, converted to the used currency.
+                price_tiers = dict(offer.price_tiers)
+                qtys = lookup_price_tiers(price_tiers)
+                tier = qtys[bisect.bisect_right(qtys, qty) - 1]
+                if offer.currency not in rates:
+                    rates[offer.currency] = currency_convert(1, offer.currency, currency)
+                unit_price = rates[offer.currency] * price_tiers[tier]
+                ext_price = qty * unit_price
+                unit_prices.append(unit_price)
+            values[dist]['unit_price'].append(unit_price)
+            values[dist]['ext_price'].append(ext_price)
+
+        # `MINA()` of the distributors, zero if no one has pricing.
+        unit_price = min(unit_prices) if unit_prices else 0
+        values['unit_price'].append(unit_price)
+        values['ext_price'].append(qty * unit_price)
+
+    def sumproduct(i_prj, unit_prices):
+        # `SUMPRODUCT()` of the project quantities, the parts without pricing have blank unit price.
+        return sum(q[i_prj] * p for q, p in zip(values['qty_prj'], unit_prices) if p is not None)
+
+    values['total_cost'] = sum(values['ext_price'])
+    values['total_cost_prj'] = [sumproduct(i_prj, values['unit_price']) for i_prj in range(num_prj)]
+    for dist in dist_list:
+        dist_values = values[dist]
+        dist_values['total_cost'] = sum(p for p in dist_values['ext_price'] if p is not None)
+        dist_values['found'] = len([p for p in dist_values['ext_price'] if p is not None])
+        dist_values['total_cost_prj'] = []
+        dist_values['found_prj'] = []
+        for i_prj in range(num_prj):
+            dist_values['total_cost_prj'].append(sumproduct(i_prj, dist_values['unit_price']))
+            # `COUNTIFS()` of the parts with pricing and of all the parts used in the project.
+            dist_values['found_prj'].append((
+                len([p for q, p in zip(values['qty_prj'], dist_values['ext_price']) if p is not None and q[i_prj] != 0]),
+                len([q for q in values['qty_prj'] if q[i_prj] != 0])))
+    return values
+
+
+def rows_multi_range(rows, col):
+    '''@brief Range of cells in a column, joining the consecutive rows.
+    @param rows Increasing `list()` of rows.
+    @param col Column of the cells.
+    @return `str()` of space separated ranges, e.g. "B3:B5 B8".
+    '''
+    ranges = []
+    first = last = rows[0]
+    for row in rows[1:] + [None]:
+        if row == last + 1:
+            last = row
+            continue
+        if first == last:
+            ranges.append(xl_rowcol_to_cell(first, col))
+        else:
+            ranges.append(xl_range(first, col, last, col))
+        if row is not None:
+            first = last = row
+    return ' '.join(ranges)
 
 
 def remove_column(table, name):
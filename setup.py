@@ -22,13 +22,13 @@ with open('HISTORY.md') as history_file:
 # KiCost Python packages requirements to run-time.
 requirements = [
     'beautifulsoup4 >= 4.3.2', # Deal with HTML and XML tags.
-    'XlsxWriter >= 0.7.3', # Write the XLSX output file.
-    #'lxml >= 3.7.2', # Deal with XML files and tags.
+    'XlsxWriter >= 1.1.0', # Write the XLSX output file.
+    'lxml >= 3.7.2', # Deal with XML files and tags.
     #'yattag >= 1.5.2', #Deal with HTML tags.
     'future', # For print statements.
     'tqdm >= 4.30.0', # Progress bar.
     'requests >= 2.18.4', # Scrape, API and web modules.
-    'CurrencyConverter >= 0.13', # Used to convert price to a not available currency in one distributor.
+    'CurrencyConverter >= 0.13', # Its currency rates table is used when not able to download the newest.
     'babel >= 2.6', # For currency format by the language in the spreadsheet.
 #    'wxPython >= 4.0', # Graphical package/library needed to user guide.
 ]
@@ -0,0 +1,402 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+benchmark
+----------------------------------
+
+Timing of the KiCost BOM read and processing steps with synthetic designs.
+Run from the repository root:
+    python -m tests.benchmark altium --size 100000
+    python -m tests.benchmark kicad --size 20000
+    python -m tests.benchmark designs --size 5
+    python -m tests.benchmark group --size 100000 [--processes 4]
+    python -m tests.benchmark refs --size 50000
+    python -m tests.benchmark incremental --size 5000
+    python -m tests.benchmark spreadsheet --size 3000
+    python -m tests.benchmark outputs --size 3000
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import random
+import tempfile
+import time
+import logging
+import gc
+import warnings
+import shutil
+import subprocess
+try:
+    import tracemalloc # Memory measurement, Python 3 only.
+except ImportError:
+    tracemalloc = None
+
+from kicost.edas import eda_modules
+
+
+def make_altium_bom(file_name, num_rows, seed=0):
+    '''Write a synthetic Altium XML BOM with `num_rows` grouped rows.'''
+    rnd = random.Random(seed)
+    columns = ['Comment', 'Description', 'Designator', 'Footprint', 'LibRef', 'Quantity', 'MPN', 'Value']
+    values = ['100nF', '10k', '1uF', '4k7', '22pF', 'BAT54', 'LM358']
+    footprints = ['C_0402_1005Metric', 'R_0603_1608Metric', 'SOT-23', 'SOIC-8']
+    with open(file_name, 'w') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<GRID>\n<COLUMNS>\n')
+        for c in columns:
+            f.write('<COLUMN Name="{0}" Caption="{0}"/>\n'.format(c))
+        f.write('</COLUMNS>\n<ROWS>\n')
+        ref_num = 1
+        for _ in range(num_rows):
+            qty = rnd.randint(1, 4)
+            prefix = rnd.choice(['R', 'C', 'U', 'D', 'TP-'])
+            refs = ', '.join('{}{}'.format(prefix, ref_num + i) for i in range(qty))
+            ref_num += qty
+            if rnd.random() < 0.05:
+                refs += '+' # Exercise the designator cleaning.
+            value = rnd.choice(values)
+            manf_code = rnd.choice(['[NoParam]', 'MPN-' + value, '2:MPN-' + value, 'A-{0}; B-{0}'.format(value)])
+            f.write('<ROW Comment="{v}" Description="desc {v}" Designator="{r}" Footprint="{fp}" LibRef="Lib{p}" Quantity="{q}" MPN="{m}" Value="{v}"/>\n'.format(
+                    v=value, r=refs, fp=rnd.choice(footprints), p=prefix, q=qty, m=manf_code))
+        f.write('</ROWS>\n</GRID>\n')
+
+
+def make_kicad_bom(file_name, num_comps, seed=0, num_libparts=40):
+    '''Write a synthetic KiCad XML BOM with `num_comps` components over a library
+    of `num_libparts` parts.'''
+    rnd = random.Random(seed)
+    libparts = []
+    for i in range(num_libparts):
+        libparts.append(('Lib', 'Part{}'.format(i), [
+                ('manf#', 'MPN-{}'.format(i)), ('manf', 'Manufacturer {}'.format(i % 7)),
+                ('desc', 'Synthetic library part number {}'.format(i)),
+                ('datasheet', 'http://example.com/datasheets/part{}.pdf'.format(i)),
+                ('digikey#', 'DK-{}-ND'.format(i))]))
+    with open(file_name, 'w') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<export version="D">\n<design>\n')
+        f.write('<tool>Eeschema 5.1.0</tool>\n<sheet number="1" name="/" tstamps="/">\n')
+        f.write('<title_block><title>Benchmark</title><company>KiCost</company></title_block>\n')
+        f.write('</sheet>\n</design>\n<components>\n')
+        for n in range(num_comps):
+            lib, part, _ = libparts[rnd.randrange(len(libparts))]
+            f.write('<comp ref="{p}{n}">\n<value>{v}</value>\n<footprint>{fp}</footprint>\n'.format(
+                    p=rnd.choice(['R', 'C', 'U', 'D']), n=n + 1, v=part.lower(),
+                    fp=rnd.choice(['Resistor_SMD:R_0402_1005Metric', 'Capacitor_SMD:C_0402_1005Metric', 'Package_SO:SOIC-8'])))
+            if rnd.random() < 0.1:
+                f.write('<fields><field name="kicost:variant">var{}</field></fields>\n'.format(rnd.randint(1, 3)))
+            f.write('<libsource lib="{}" part="{}"/>\n</comp>\n'.format(lib, part))
+        f.write('</components>\n<libparts>\n')
+        for lib, part, fields in libparts:
+            f.write('<libpart lib="{}" part="{}">\n<fields>\n'.format(lib, part))
+            for name, value in fields:
+                f.write('<field name="{}">{}</field>\n'.format(name, value))
+            f.write('</fields>\n</libpart>\n')
+        f.write('</libparts>\n</export>\n')
+
+
+def measure(function, *args):
+    '''Run `function(*args)` and return its result, the time spent and the
+    memory kept by the result and the peak memory in MB (`None` if unknown).'''
+    if tracemalloc:
+        tracemalloc.start()
+    start = time.time()
+    result = function(*args)
+    spent = time.time() - start
+    if tracemalloc:
+        gc.collect() # Don't count the garbage of the parsers.
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return result, spent, current / 1e6, peak / 1e6
+    return result, spent, None, None
+
+
+def bench_kicad(args):
+    '''Read a synthetic KiCad export with `args.size` components.'''
+    from kicost.edas.tools import subpartqty_split
+    file_name = os.path.join(tempfile.mkdtemp(), 'kicad_bom.xml')
+    make_kicad_bom(file_name, args.size)
+    def read():
+        parts, _ = eda_modules['kicad'].get_part_groups(file_name, [], ' ')
+        return subpartqty_split(parts)
+    parts, spent, current, peak = measure(read)
+    print('kicad: {} components read in {:.2f}s, result {} MB, peak {} MB'.format(
+          len(parts), spent, current, peak))
+    os.remove(file_name)
+
+
+def bench_designs(args):
+    '''Read the `args.size` largest test designs.'''
+    from kicost.edas.tools import subpartqty_split, file_eda_match
+    tests_dir = os.path.dirname(os.path.abspath(__file__))
+    files = [os.path.join(tests_dir, f) for f in os.listdir(tests_dir) if f.endswith(('.xml', '.csv'))]
+    files = sorted(files, key=os.path.getsize, reverse=True)[:args.size]
+    total_current = total_peak = 0
+    for file_name in files:
+        eda_name = file_eda_match(file_name)
+        if not eda_name:
+            continue
+        def read():
+            parts, _ = eda_modules[eda_name].get_part_groups(file_name, [], ' ')
+            return subpartqty_split(parts)
+        parts, spent, current, peak = measure(read)
+        print('{}: {} components read in {:.2f}s, result {} MB, peak {} MB'.format(
+              os.path.basename(file_name), len(parts), spent, current, peak))
+        if tracemalloc:
+            total_current += current
+            total_peak = max(total_peak, peak)
+    if tracemalloc:
+        print('designs: result {:.3f} MB, peak {:.3f} MB'.format(total_current, total_peak))
+
+
+def make_components(num_comps, seed=0):
+    '''Synthetic components, as read by the EDA modules, all with the same value and
+    footprint but with many alternate manufacture and distributor codes.'''
+    rnd = random.Random(seed)
+    num_codes = max(2, int(num_comps ** 0.5))
+    components = {}
+    for n in range(num_comps):
+        fields = {'value': '100nF', 'footprint': 'Capacitor_SMD:C_0402_1005Metric',
+                  'libpart': 'Device:C', 'desc': 'Capacitor {}'.format(rnd.randrange(num_codes))}
+        code = rnd.randrange(num_codes)
+        if code:
+            fields['manf#'] = 'CAP-{}'.format(code)
+            if code % 3:
+                fields['digikey#'] = 'DK-CAP-{}'.format(code)
+        components['C{}'.format(n + 1)] = fields
+    return components
+
+
+def bench_group(args):
+    '''Group synthetic components, from 1k up to `args.size`, also sharded
+    in `args.processes` processes if more than one.'''
+    from kicost.edas.tools import subpartqty_split, group_parts, group_parts_sharded
+    num_comps = 1000
+    while num_comps <= args.size:
+        components = make_components(num_comps)
+        start = time.time()
+        components = subpartqty_split(components)
+        split = time.time() - start
+        if args.processes > 1:
+            start = time.time()
+            sharded = group_parts_sharded(components, args.group_fields, args.processes)
+            print('group: {} components, {} groups in {} processes in {:.2f}s'.format(
+                  num_comps, len(sharded), args.processes, time.time() - start))
+        start = time.time()
+        groups = group_parts(components, args.group_fields)
+        print('group: {} components split in {:.2f}s, {} groups in {:.2f}s'.format(
+              num_comps, split, len(groups), time.time() - start))
+        if args.processes > 1 and [g.refs for g in groups] != [g.refs for g in sharded]:
+            print('group: sharded groups differ!')
+        num_comps *= 10
+
+
+def bench_refs(args):
+    '''Order and split `args.size` references with gaps, ranges and subparts.'''
+    from kicost.edas.tools import order_refs, split_refs
+    rnd = random.Random(0)
+    refs = []
+    for n in range(args.size):
+        if rnd.random() < 0.8: # Leave gaps, so not everything is one range.
+            ref = '{}{}'.format(rnd.choice(['R', 'C', 'U', 'TP-']), n + 1)
+            if rnd.random() < 0.05:
+                ref += '#{}'.format(rnd.randint(1, 3))
+            refs.append(ref)
+    rnd.shuffle(refs)
+    for collapse in (True, False):
+        start = time.time()
+        order_refs(refs, collapse)
+        print('refs: {} references ordered (collapse={}) in {:.2f}s'.format(
+              len(refs), collapse, time.time() - start))
+    start = time.time()
+    split = split_refs(order_refs(refs))
+    print('refs: {} references split in {:.2f}s'.format(len(split), time.time() - start))
+
+
+def bench_incremental(args):
+    '''Run KiCost on a synthetic KiCad export with `args.size` components, change
+    one component and run again, complete and incremental. The web distributors
+    are not accessed, just counted the parts that would be queried.'''
+    from kicost.kicost import kicost
+    from kicost.distributors import init_distributor_dict
+    from kicost.distributors.api_partinfo_kitspace import api_partinfo_kitspace
+    queried = []
+    api_partinfo_kitspace.query_part_info = staticmethod(lambda parts, distributors, currency: queried.extend(parts))
+    work_dir = tempfile.mkdtemp()
+    os.environ['KICOST_CACHE_DIR'] = os.path.join(work_dir, 'cache')
+    file_name = os.path.join(work_dir, 'kicad_bom.xml')
+    make_kicad_bom(file_name, args.size)
+    def run(name, incremental):
+        init_distributor_dict()
+        del queried[:]
+        start = time.time()
+        kicost(file_name, 'kicad', os.path.join(work_dir, 'out.xlsx'), [], [], [], None, ' ',
+               num_processes=1, incremental=incremental)
+        print('incremental: {} in {:.2f}s, {} parts to query'.format(name, time.time() - start, len(queried)))
+    run('first run', True)
+    with open(file_name) as f:
+        bom = f.read()
+    with open(file_name, 'w') as f:
+        f.write(bom.replace('<value>', '<value>changed ', 1))
+    run('one part changed, complete', False)
+    run('one part changed, incremental', True)
+
+
+def fake_pricing(parts, distributors, currency='USD'):
+    '''Fill the distributor offers of the parts with synthetic prices, used in
+    place of the web distributors query.'''
+    for i, part in enumerate(parts):
+        for j, dist in enumerate(sorted(distributors)):
+            if (i + j) % 4 == 0 or dist not in part.offers:
+                continue # Part not found at this distributor.
+            offer = part.offers[dist]
+            price = 0.01 * (1 + (i * 7 + j) % 300)
+            offer.part_num = '{}-{}'.format(dist[:2].upper(), i)
+            offer.url = 'https://example.com/{}/{}'.format(dist, i)
+            offer.qty_avail = (i * 13 + j) % 5000
+            offer.price_tiers = {1: price, 10: round(price * 0.9, 4), 100: round(price * 0.7, 4)}
+
+
+def soffice_load_time(file_name, recalc):
+    '''Time to load `file_name` by LibreOffice headless and convert it to ODS,
+    recalculating all the formulas at the load if `recalc`. Return `None` if
+    LibreOffice is not installed.'''
+    soffice = shutil.which('soffice') if hasattr(shutil, 'which') else None
+    if not soffice:
+        return None
+    work_dir = tempfile.mkdtemp()
+    # Private user profile to force the recalculation mode at the load
+    # of the Excel files (0 = always, 1 = never).
+    profile_dir = os.path.join(work_dir, 'profile', 'user')
+    os.makedirs(profile_dir)
+    with open(os.path.join(profile_dir, 'registrymodifications.xcu'), 'w') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<oor:items xmlns:oor="http://openoffice.org/2001/registry"'
+                ' xmlns:xs="http://www.w3.org/2001/XMLSchema"'
+                ' xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">\n'
+                '<item oor:path="/org.openoffice.Office.Calc/Formula/Load">'
+                '<prop oor:name="OOXMLRecalcMode" oor:op="fuse"><value>{}</value></prop>'
+                '</item>\n</oor:items>\n'.format(0 if recalc else 1))
+    command = [soffice, '-env:UserInstallation=file://' + os.path.join(work_dir, 'profile'),
+               '--headless', '--convert-to', 'ods', '--outdir', work_dir, file_name]
+    with open(os.devnull, 'w') as null:
+        subprocess.call(command, stdout=null, stderr=null) # Create the profile.
+        start = time.time()
+        subprocess.call(command, stdout=null, stderr=null)
+    spent = time.time() - start
+    shutil.rmtree(work_dir, ignore_errors=True)
+    return spent
+
+
+def bench_spreadsheet(args):
+    '''Create the spreadsheet of a synthetic KiCad export with about `args.size`
+    different parts priced at all the web distributors, with each way to
+    write the part details and, if LibreOffice is installed, measure the
+    time to recalculate it.'''
+    from kicost.kicost import kicost
+    from kicost.distributors import init_distributor_dict
+    from kicost.distributors.api_partinfo_kitspace import api_partinfo_kitspace
+    api_partinfo_kitspace.query_part_info = staticmethod(fake_pricing)
+    work_dir = tempfile.mkdtemp()
+    os.environ['KICOST_CACHE_DIR'] = os.path.join(work_dir, 'cache')
+    file_name = os.path.join(work_dir, 'kicad_bom.xml')
+    out_file = os.path.join(work_dir, 'spreadsheet.xlsx')
+    make_kicad_bom(file_name, 2 * args.size, num_libparts=args.size)
+    init_distributor_dict()
+    for part_details in ['comments', 'sheet', 'none']:
+        def create():
+            kicost(file_name, 'kicad', out_file, [], [], [], None, ' ', num_processes=1,
+                   use_cache=False, part_details=part_details)
+        _, spent, _, peak = measure(create)
+        print('spreadsheet ({}): created in {:.2f}s, peak {} MB, file {:.1f} MB'.format(
+              part_details, spent, peak, os.path.getsize(out_file) / 1e6))
+        load = soffice_load_time(out_file, False)
+        if load is None:
+            print('spreadsheet ({}): LibreOffice not found, recalculation not measured'.format(part_details))
+        else:
+            recalc = soffice_load_time(out_file, True)
+            print('spreadsheet ({}): LibreOffice load in {:.2f}s, load and recalculation in {:.2f}s'.format(
+                  part_details, load, recalc))
+    shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def bench_outputs(args):
+    '''Write the cost outputs of a synthetic KiCad export with about `args.size`
+    different parts priced at all the web distributors, in each format.'''
+    from kicost.kicost import kicost
+    from kicost.distributors import init_distributor_dict
+    from kicost.distributors.api_partinfo_kitspace import api_partinfo_kitspace
+    from kicost.outputs import output_modules
+    from kicost.outputs import out_parquet
+    api_partinfo_kitspace.query_part_info = staticmethod(fake_pricing)
+    work_dir = tempfile.mkdtemp()
+    os.environ['KICOST_CACHE_DIR'] = os.path.join(work_dir, 'cache')
+    file_name = os.path.join(work_dir, 'kicad_bom.xml')
+    make_kicad_bom(file_name, 2 * args.size, num_libparts=args.size)
+    init_distributor_dict()
+    # Get the priced parts given to the outputs.
+    class Capture(object):
+        EXTENSION = '.none'
+        @staticmethod
+        def create_output(parts, prj_info, *args):
+            Capture.parts, Capture.prj_info = parts, prj_info
+    output_modules['capture'] = Capture
+    try:
+        kicost(file_name, 'kicad', os.path.join(work_dir, 'bom.xlsx'), [], [], [], None, ' ',
+               num_processes=1, out_formats=['capture'])
+    finally:
+        del output_modules['capture']
+    for out_format in sorted(output_modules):
+        if out_format == 'parquet' and out_parquet.pyarrow is None:
+            print('outputs: pyarrow not found, parquet not measured')
+            continue
+        out_file = os.path.join(work_dir, 'bom' + output_modules[out_format].EXTENSION)
+        _, spent, _, peak = measure(output_modules[out_format].create_output,
+                                    Capture.parts, Capture.prj_info, out_file, 'USD', True, True, [], ' ')
+        print('outputs: {} written in {:.2f}s, peak {} MB, file {:.1f} MB'.format(
+              out_format, spent, peak, os.path.getsize(out_file) / 1e6))
+    shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def bench_altium(args):
+    '''Read a synthetic Altium export with `args.size` rows.'''
+    file_name = os.path.join(tempfile.mkdtemp(), 'altium_bom.xml')
+    make_altium_bom(file_name, args.size)
+    start = time.time()
+    parts, _ = eda_modules['altium'].get_part_groups(file_name, [], ' ')
+    print('altium: {} rows, {} components read in {:.2f}s'.format(
+          args.size, len(parts), time.time() - start))
+    os.remove(file_name)
+
+
+BENCHMARKS = {
+    'altium': bench_altium,
+    'kicad': bench_kicad,
+    'designs': bench_designs,
+    'group': bench_group,
+    'refs': bench_refs,
+    'incremental': bench_incremental,
+    'spreadsheet': bench_spreadsheet,
+    'outputs': bench_outputs,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='KiCost benchmarks.')
+    parser.add_argument('bench', choices=sorted(BENCHMARKS.keys()), nargs='+')
+    parser.add_argument('--size', type=int, default=100000,
+                        help='Size of the synthetic design.')
+    parser.add_argument('--group_fields', nargs='+', default=[], metavar='NAME',
+                        help='Fields to merge when grouping parts.')
+    parser.add_argument('--processes', type=int, default=1,
+                        help='Number of processes to group parts.')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+    warnings.simplefilter('ignore')
+    for bench in args.bench:
+        BENCHMARKS[bench](args)
+
+
+if __name__ == '__main__':
+    main()
@@ -9,8 +9,49 @@ Tests for `kicost` module.
 """
 
 import unittest
+import os
+import sys
+import copy
+import csv
+import io
+import json
+import random
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import zipfile
+import xlsxwriter
+from fractions import Fraction
+from xml.etree import ElementTree
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None # Optional, used to check the Parquet output.
 
 from kicost import kicost
+from kicost.edas import eda_modules
+from kicost.edas.eda_altium import clean_ref
+from kicost.edas.tools import subpartqty_split, group_parts, group_parts_sharded, PartGroup, LayeredFields
+from kicost.edas.tools import partgroup_qty, partgroup_qty_value, qty_formula, qty_number
+from kicost.edas.tools import subpart_list, manf_code_qtypart, order_refs, parse_ref, split_refs
+from kicost.edas.tools import PART_REF_REGEX_NOT_ALLOWED
+from kicost.distributors import init_distributor_dict
+from kicost.distributors.distributor import DistributorOffer, pricing_save, pricing_restore, pricing_expired
+from kicost.spreadsheet import evaluate_formulas, order_parts, create_spreadsheet
+from kicost.distributors.global_vars import distributor_dict
+from kicost.outputs import output_modules
+from kicost.outputs.out_ods import ods_formula
+from kicost.outputs import out_parquet
+from kicost import currency_rates
+from kicost.kicost import read_bom, read_boms
+from kicost.edas.bom_cache import cache_file_load, cache_file_save
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+# LibreOffice, used to check the ODS output.
+SOFFICE = (shutil.which('soffice') or shutil.which('libreoffice')) if hasattr(shutil, 'which') else None
 
 
 class TestKicost(unittest.TestCase):
@@ -24,5 +65,869 @@ class TestKicost(unittest.TestCase):
     def tearDown(self):
         pass
 
+
+class TestAltium(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def test_clean_ref(self):
+        '''The designators cleaned in a pass as by the previous chain of substitutions.'''
+        def clean_ref_subs(ref):
+            ref = re.sub(r'\+$', 'p', ref) # Finishing "+".
+            ref = re.sub(PART_REF_REGEX_NOT_ALLOWED, '', ref)
+            ref = re.sub(r'\-+', '-', ref) # Double "-".
+            ref = re.sub(r'^\-', '', ref) # Starting "-".
+            ref = re.sub(r'\-$', 'n', ref) # Finishing "-".
+            if not re.search(r'\d$', ref):
+                ref += '0'
+            return re.sub(PART_REF_REGEX_NOT_ALLOWED, '', ref)
+        for ref, cleaned in [('C7+', 'C7p0'), ('D3-', 'D3n0'), ('TP--5', 'TP-5'), ('R(1)', 'R1'),
+                             ('-R4', 'R4'), ('--J(2)', 'J2'), ('TP-(-5)', 'TP-5'), ('X(2)+', 'X2p0'),
+                             ('U:1*', 'U1'), ('D3-+', 'D3-p0'), ('SW', 'SW0'), ('U1', 'U1')]:
+            self.assertEqual(clean_ref(ref), cleaned, ref)
+            self.assertEqual(clean_ref(ref), clean_ref_subs(ref), ref)
+
+    def test_mixed_case_header(self):
+        '''The header names are matched to the row attributes without case.'''
+        in_file = os.path.join(self.work_dir, 'bom.xml')
+        with open(in_file, 'w') as f:
+            f.write('<?xml version="1.0" encoding="UTF-8"?>\n<GRID>\n<COLUMNS>\n'
+                    '<COLUMN Name="DESIGNATOR" Caption="Designator"/>\n<Column name="quantity" Caption="Quantity"/>\n'
+                    '<COLUMN Name="Mpn" Caption="MPN"/>\n<COLUMN Name="VALUE" Caption="Value"/>\n'
+                    '<COLUMN Name="footprint" Caption="Footprint"/>\n</COLUMNS>\n<ROWS>\n'
+                    '<ROW Designator="C7+, C8" Quantity="2" MPN="CAP-1, [NoParam]" Value="100nF" Footprint="C_0402"/>\n'
+                    '<ROW Designator="TP--5" Quantity="1" MPN="[NoParam]" Value="TP" Footprint="TP_1mm"/>\n'
+                    '<ROW Designator="R(1), D3-" Quantity="2" MPN="2:RES-1" Value="10k" Footprint="R_0603"/>\n'
+                    '</ROWS>\n</GRID>\n')
+        parts, prj_info = eda_modules['altium'].get_part_groups(in_file, [], ' ')
+        self.assertEqual(list(parts.items()), [
+            ('C7p0', {'manf#': 'CAP-1', 'value': '100nF', 'footprint': 'C_0402'}),
+            ('C8', {'value': '100nF', 'footprint': 'C_0402'}), # Without the '[NoParam]' code.
+            ('TP-5', {'value': 'TP', 'footprint': 'TP_1mm'}),
+            ('R1', {'manf#': '2:RES-1', 'value': '10k', 'footprint': 'R_0603'}), # A value for the row.
+            ('D3n0', {'manf#': '2:RES-1', 'value': '10k', 'footprint': 'R_0603'})])
+        self.assertEqual(prj_info['title'], 'bom.xml')
+
+
+class TestGroupParts(unittest.TestCase):
+
+    def test_sharded_same_as_serial(self):
+        '''The grouping in many processes gives the same groups, in the same order.'''
+        fields_merge = set(['desc', 'var', 'libpart'])
+        for file_name, eda_name in [('StickIt-Hat.xml', 'kicad'), ('acquire-PWM.xml', 'kicad'),
+                                    ('multipart.xml', 'kicad'), ('part_list_big.csv', 'csv')]:
+            parts, _ = eda_modules[eda_name].get_part_groups(os.path.join(TESTS_DIR, file_name), [], ' ')
+            parts = subpartqty_split(parts)
+            serial = group_parts(copy.deepcopy(parts), fields_merge)
+            sharded = group_parts_sharded(copy.deepcopy(parts), fields_merge, 3)
+            self.assertEqual([[getattr(g, a) for a in g.__slots__] for g in serial],
+                             [[getattr(g, a) for a in g.__slots__] for g in sharded], file_name)
+
+
+    def test_split_codes(self):
+        '''Seemingly identical parts split by their codes, each combination of codes in a group.'''
+        components = {'R1': {'value': '10k', 'manf#': 'RC-A'}, 'R2': {'value': '10k', 'manf#': 'RC-B'},
+                      'R3': {'value': '10k'}, 'R4': {'value': '10k', 'manf#': 'RC-A'},
+                      'R5': {'value': '10k', 'manf#': 'RC-B', 'digikey#': 'DK-B'},
+                      'R6': {'value': '10k', 'manf#': 'RC-B'},
+                      'C1': {'value': '1u', 'manf#': 'CAP-1'}, 'C2': {'value': '1u'}}
+        groups = group_parts(components, set(['desc', 'var']))
+        self.assertEqual([(g.refs, g.fields.get('manf#'), g.fields.get('digikey#')) for g in groups],
+                         [(['R1', 'R4'], 'RC-A', None), (['R2', 'R6'], 'RC-B', None),
+                          (['R3'], None, None), # Three codes, the one without code is not propagated.
+                          (['R5'], 'RC-B', 'DK-B'),
+                          (['C1', 'C2'], 'CAP-1', None)]) # One code, propagated.
+
+    def test_group_key_stable(self):
+        '''The group keys don't depend on the hash seed of the Python run.'''
+        script = ('import os, sys, warnings; warnings.simplefilter("ignore")\n'
+                  'from kicost.edas import eda_modules\n'
+                  'from kicost.edas.tools import subpartqty_split, group_parts\n'
+                  'parts, _ = eda_modules["kicad"].get_part_groups(sys.argv[1], [], " ")\n'
+                  'groups = group_parts(subpartqty_split(parts), set(["desc", "var", "libpart"]))\n'
+                  'print(sorted((g.key, sorted(g.refs)) for g in groups))\n')
+        keys = []
+        for seed in ['1', '12345']:
+            env = dict(os.environ, PYTHONHASHSEED=seed)
+            keys.append(subprocess.check_output([sys.executable, '-c', script,
+                                                 os.path.join(TESTS_DIR, 'acquire-PWM.xml')],
+                                                env=env, cwd=os.path.dirname(TESTS_DIR)))
+        self.assertIn(b"'U1202#1'", keys[0])
+        self.assertEqual(keys[1], keys[0])
+
+class TestCodeParser(unittest.TestCase):
+
+    def test_subparts(self):
+        '''Subparts and quantities of the codes, with '-' in the codes and escaped separators.'''
+        code = r' 2:RC0805-10K ; LM358\;B , 0.5 : TP-TEST-1'
+        for _ in range(2): # The second time from the memo.
+            subparts = subpart_list(code)
+            self.assertEqual(subparts, ['2:RC0805-10K', r'LM358\;B', '0.5 : TP-TEST-1'])
+            self.assertEqual([manf_code_qtypart(s) for s in subparts],
+                             [('2', 'RC0805-10K'), ('1', 'LM358;B'), ('0.5', 'TP-TEST-1')])
+            subparts.append('CHANGED') # A new list each call, the memo is not changed.
+        for code, qty_part in [('ADUM3150BRSZ-RL7 :   7', ('7', 'ADUM3150BRSZ-RL7')),
+                               ('4/5  : ADUM3150BRSZ-RL7', ('4/5', 'ADUM3150BRSZ-RL7')),
+                               ('ADUM3150BRSZ-RL7:', ('1', 'ADUM3150BRSZ-RL7')),
+                               ('1234:5', ('5', '1234'))]: # Numeric code, the shortest is the quantity.
+            self.assertEqual(manf_code_qtypart(code), qty_part)
+
+    def test_qty_number(self):
+        '''Exact quantities, 1 when not a number.'''
+        self.assertEqual(qty_number(' 4.5'), Fraction(9, 2))
+        self.assertEqual(qty_number('1 / 3'), Fraction(1, 3))
+        self.assertEqual(qty_number('x'), 1)
+
+class TestQuantities(unittest.TestCase):
+
+    def test_qty_formula(self):
+        '''Exact quantities in the formulas, decimal only when exact.'''
+        for qty, formula in [(Fraction(7), '7'), (Fraction(5, 2), '2.5'), (Fraction(1, 8), '0.125'),
+                             (Fraction(4, 3), '4/3'), (Fraction(7, 30), '7/30')]:
+            self.assertEqual(qty_formula(qty), formula)
+
+    def test_fractional(self):
+        '''The fractional subpart quantities are summed exactly and rounded up only in the total.'''
+        components = {'U1': {'value': 'x', 'manf#': '1/3:CAP-1;2.5:IC-1'},
+                      'U2': {'value': 'x', 'manf#': '1/3:CAP-1;2.5:IC-1'},
+                      'U3': {'value': 'y', 'manf#': 'CAP-1'}}
+        groups = group_parts(subpartqty_split(components), set(['desc', 'var']))
+        self.assertEqual([(g.refs, g.fields['manf#_qty'], partgroup_qty(g), partgroup_qty_value(g, 100))
+                          for g in groups],
+                         [(['U1#1', 'U2#1'], Fraction(2, 3), '=CEILING({}*2/3,1)', 67),
+                          (['U1#2', 'U2#2'], Fraction(5), '={}*5', 500),
+                          (['U3'], Fraction(1), '={}*1', 100)])
+
+    def test_multi_project(self):
+        '''One quantity by project, not rounded up, 0 for the projects without the part.'''
+        part = PartGroup()
+        part.refs = ['prj0:C1', 'prj2:C1', 'prj2:C2']
+        part.fields = {'manf#': 'CAP-1', 'manf#_qty': [Fraction(1, 3), 0, Fraction(5, 2)]}
+        self.assertEqual(partgroup_qty(part), ['={}*1/3', 0, '={}*2.5'])
+        self.assertEqual(partgroup_qty_value(part, 3), [1, 0, 7.5])
+        self.assertEqual(partgroup_qty_value(part, 100)[0], 100 / 3.0)
+        part.fields = {'manf#': 'CAP-1'} # Without quantity, one by reference.
+        self.assertEqual(partgroup_qty(part), '={}*3')
+        self.assertEqual(partgroup_qty_value(part, 10), 30)
+
+class TestLayeredFields(unittest.TestCase):
+
+    def setUp(self):
+        self.base = {'value': '10k', 'footprint': 'R0805', 'manf#': 'RC-10K'}
+        self.fields = LayeredFields(self.base)
+
+    def test_set(self):
+        '''Only the values different of the base are kept by the component.'''
+        self.fields['value'] = '10k'
+        self.fields['footprint'] = 'R0603'
+        self.fields['desc'] = 'Resistor'
+        self.assertEqual(self.fields.local, {'footprint': 'R0603', 'desc': 'Resistor'})
+        self.assertEqual(self.fields['footprint'], 'R0603')
+        self.fields['footprint'] = 'R0805' # Back to the base value.
+        self.assertEqual(self.fields.local, {'desc': 'Resistor'})
+        self.assertEqual(self.base, {'value': '10k', 'footprint': 'R0805', 'manf#': 'RC-10K'})
+
+    def test_delete(self):
+        '''The base fields deleted are hidden by tombstones, without changing the base.'''
+        self.fields['desc'] = 'Resistor'
+        del self.fields['desc']
+        del self.fields['manf#']
+        self.assertNotIn('manf#', self.fields)
+        self.assertIsNone(self.fields.get('manf#'))
+        self.assertRaises(KeyError, lambda: self.fields['manf#'])
+        self.assertEqual(self.fields.removed, set(['manf#']))
+        self.assertEqual(len(self.fields), 2)
+        self.assertEqual(dict(self.fields), {'value': '10k', 'footprint': 'R0805'})
+        self.assertEqual(self.base['manf#'], 'RC-10K')
+        with self.assertRaises(KeyError):
+            del self.fields['manf#']
+        with self.assertRaises(KeyError):
+            del self.fields['desc']
+        self.fields['manf#'] = 'RC-10K-1' # Set again, removes the tombstone.
+        self.assertEqual(self.fields['manf#'], 'RC-10K-1')
+        self.assertFalse(self.fields.removed)
+
+    def test_copy(self):
+        '''The copies share the base, but not the local fields and tombstones.'''
+        self.fields['desc'] = 'Resistor'
+        del self.fields['footprint']
+        fields = self.fields.copy()
+        self.assertIs(fields.base, self.base)
+        fields['desc'] = 'SMD resistor'
+        del fields['value']
+        fields['footprint'] = 'R0402'
+        self.assertEqual(dict(self.fields), {'desc': 'Resistor', 'value': '10k', 'manf#': 'RC-10K'})
+        self.assertEqual(dict(fields), {'desc': 'SMD resistor', 'footprint': 'R0402', 'manf#': 'RC-10K'})
+
+    def test_order(self):
+        '''The local fields are iterated first, then the base ones in their order.'''
+        self.fields['footprint'] = 'R0603'
+        self.fields['desc'] = 'Resistor'
+        del self.fields['value']
+        self.assertEqual(list(self.fields), ['footprint', 'desc', 'manf#'])
+        self.assertEqual(list(self.fields.items()), [('footprint', 'R0603'), ('desc', 'Resistor'), ('manf#', 'RC-10K')])
+
+class TestOrderRefs(unittest.TestCase):
+
+    def test_parse_ref(self):
+        '''Prefix, number and integers to sort, also of prefixes with '-' and subparts.'''
+        self.assertEqual(parse_ref('R10'), ('R', '10', (10,), 10))
+        self.assertEqual(parse_ref('prj0:U2#1'), ('prj0:U', '2#1', (2, 1), None))
+        self.assertEqual(parse_ref('TP-6#2'), ('TP-', '6#2', (6, 2), None))
+        self.assertEqual(parse_ref('C-IN-3'), ('C-IN-', '3', (3,), 3))
+
+    def test_ranges(self):
+        '''Only 3 or more sequential numbers make a range, duplicates included.'''
+        for refs, collapsed in [(['R3', 'R1', 'R2', 'R5'], 'R1-R3,R5'),
+                                (['R8', 'R10', 'R10'], 'R8,R10,R10'),
+                                (['R10', 'R8', 'R10', 'R9'], 'R8-R10,R10'),
+                                (['R8', 'R9', 'R9', 'R10'], 'R8,R9,R9,R10'),
+                                (['C1', 'C1', 'C2', 'C3'], 'C1,C1-C3'),
+                                (['R1', 'R2', 'R4', 'R5', 'R7'], 'R1,R2,R4,R5,R7'), # Gaps.
+                                (['R2', 'R10', 'R1', 'R3', 'C1'], 'R1-R3,R10,C1')]:
+            self.assertEqual(order_refs(refs), collapsed)
+        self.assertEqual(order_refs(['R3', 'R1', 'R2'], collapse=False), 'R1,R2,R3')
+
+    def test_subparts(self):
+        '''The subparts are never in ranges and are ordered after their part.'''
+        for refs, collapsed in [(['TP-4', 'TP-6#2', 'TP-6'], 'TP-4,TP-6,TP-6#2'),
+                                (['TP-6#2', 'TP-6', 'TP-4'], 'TP-4,TP-6,TP-6#2'),
+                                (['TP-4', 'TP-5', 'TP-6'], 'TP-4,TP-5,TP-6'), # 'TP-4-TP-6' would be ambiguous.
+                                (['U1#10', 'U1#2', 'U1'], 'U1,U1#2,U1#10'),
+                                (['U1#1', 'U2#1', 'U3#1', 'U4'], 'U1#1,U2#1,U3#1,U4'),
+                                (['U3', 'U1', 'U2', 'U2#1'], 'U1,U2,U2#1,U3')]: # Nor break the order.
+            self.assertEqual(order_refs(refs), collapsed)
+
+    def test_split(self):
+        '''Ranges and number lists, also of prefixes with '-' and Altium numbers.'''
+        for text, refs in [('D33-D36', ['D33', 'D34', 'D35', 'D36']),
+                           ('D33-36', ['D33', 'D34', 'D35', 'D36']),
+                           ('C17/18/19, C20\\21', ['C17', 'C18', 'C19', 'C20', 'C21']),
+                           ('TP-5-TP-7;TP-9', ['TP-5', 'TP-6', 'TP-7', 'TP-9']),
+                           ('R2.1-R2.3', ['R2.1', 'R2.2', 'R2.3']),
+                           ('U1#1,U1#2 SW', ['U1#1', 'U1#2', 'SW0'])]:
+            self.assertEqual(split_refs(text), refs)
+
+    def test_round_trip(self):
+        '''`split_refs()` gives back the references collapsed by `order_refs()`.'''
+        rnd = random.Random(0)
+        for _ in range(200):
+            refs = ['{}{}{}'.format(rnd.choice(['R', 'C', 'TP-', 'C-IN-', 'U', 'R2.']), rnd.randint(1, 12),
+                                    rnd.choice(['', '', '', '#1', '#2'])) for _ in range(rnd.randint(1, 15))]
+            collapsed = order_refs(refs)
+            self.assertEqual(sorted(split_refs(collapsed)), sorted(refs), collapsed)
+            self.assertEqual(order_refs(split_refs(collapsed)), collapsed)
+
+class TestOrderParts(unittest.TestCase):
+
+    def group(self, refs, manf_code=None):
+        part = PartGroup()
+        part.refs = refs
+        part.fields = {'manf#': manf_code} if manf_code else {}
+        return part
+
+    def test_designs(self):
+        '''Rows ordered by reference prefix, number and subpart, as the previous versions.'''
+        for file_name, order in [
+                ('StickIt-Hat.xml', ['C1,C3', 'C2,C4', 'C5', 'CON1', 'GPIO1', 'GR1-GR3', 'J1', 'J3-J5',
+                                     'JP4,JP7-JP10,TP1', 'JP5,JP6', 'JP1-JP3', 'PM1-PM3', 'R1', 'RN1',
+                                     'SW1', 'U1', 'U2']),
+                ('multipart.xml', ['J1', 'J2', 'J3#1', 'J3#2', 'J3#3', 'R1', 'R2,R3', 'S1#1', 'S1#2', 'S2',
+                                   'SW4#1', 'SW4#2', 'SW4#3', 'SW4#4', 'SW1-SW3,SW5-SW9'])]:
+            parts, _ = eda_modules['kicad'].get_part_groups(os.path.join(TESTS_DIR, file_name), [], ' ')
+            parts = group_parts(subpartqty_split(parts), set(['desc', 'var', 'libpart']))
+            order_parts(parts)
+            self.assertEqual([part.collapsed_refs for part in parts], order, file_name)
+
+    def test_ties(self):
+        '''The same first reference is ordered by the groups key: the ones with 'manf#' first.'''
+        parts = [self.group(['R10']), self.group(['R2', 'R30']), self.group(['R1#2']), self.group(['R1#1']),
+                 self.group(['R1', 'R7']), self.group(['R1', 'R5'], 'RES-1'), self.group(['C9'])]
+        order_parts(parts)
+        self.assertEqual([part.collapsed_refs for part in parts],
+                         ['C9', 'R1,R5', 'R1,R7', 'R1#1', 'R1#2', 'R10', 'R2,R30'])
+
+class TestEvaluateFormulas(unittest.TestCase):
+
+    def offer(self, part_num, price_tiers):
+        offer = DistributorOffer()
+        offer.part_num = part_num
+        offer.price_tiers = price_tiers
+        return offer
+
+    def test_costs(self):
+        '''The cached values are the prices looked up for the board quantity.'''
+        part1 = PartGroup()
+        part1.refs = ['R1', 'R2']
+        part1.fields = {'manf#_qty': [Fraction(3, 2), 0]}
+        part1.offers = {'d1': self.offer('P1', {1: 0.1, 100: 0.05}),
+                        'd2': self.offer('Q1', {10: 0.2})}
+        part2 = PartGroup()
+        part2.refs = ['U1']
+        part2.fields = {'manf#_qty': [0, 2]}
+        part2.offers = {'d1': self.offer('', {1: 5.0}), # Without catalogue code.
+                        'd2': self.offer('Q2', {1: 1.0})}
+        values = evaluate_formulas([part1, part2], ['d1', 'd2'], 2, 100)
+        self.assertEqual(values['qty'], [150, 200])
+        self.assertEqual(values['unit_price'], [0.05, 1.0])
+        self.assertEqual(values['ext_price'], [7.5, 200.0])
+        self.assertEqual(values['total_cost'], 207.5)
+        self.assertEqual(values['d1']['unit_price'], [0.05, None])
+        self.assertEqual(values['d1']['found'], 1)
+        self.assertEqual(values['d2']['ext_price'], [30.0, 200.0])
+        self.assertEqual(values['d2']['total_cost_prj'], [30.0, 200.0])
+        self.assertEqual(values['d2']['found_prj'], [(1, 1), (1, 1)])
+
+
+def read_xlsx(xlsx_file, sheet=1):
+    '''The cells of a worksheet of a XLSX file: {'A1': (formula, value)}, with
+    the strings (shared or inline) as value.'''
+    ns = {'x': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+    with zipfile.ZipFile(xlsx_file) as workbook:
+        strings = []
+        if 'xl/sharedStrings.xml' in workbook.namelist():
+            root = ElementTree.fromstring(workbook.read('xl/sharedStrings.xml'))
+            strings = [''.join(t.text or '' for t in si.iter('{' + ns['x'] + '}t'))
+                       for si in root.findall('x:si', ns)]
+        root = ElementTree.fromstring(workbook.read('xl/worksheets/sheet{}.xml'.format(sheet)))
+    cells = {}
+    for c in root.iter('{' + ns['x'] + '}c'):
+        formula, value = c.find('x:f', ns), c.find('x:v', ns)
+        value = value.text if value is not None else None
+        if c.get('t') == 's':
+            value = strings[int(value)]
+        elif c.get('t') == 'inlineStr':
+            value = ''.join(t.text or '' for t in c.iter('{' + ns['x'] + '}t'))
+        cells[c.get('r')] = (formula.text if formula is not None else None, value)
+    return cells
+
+
+def read_xlsx_comments(xlsx_file, sheet=1):
+    '''The cell comments of a worksheet of a XLSX file: {'A1': text}.'''
+    ns = {'x': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main',
+          'r': 'http://schemas.openxmlformats.org/package/2006/relationships'}
+    rels_name = 'xl/worksheets/_rels/sheet{}.xml.rels'.format(sheet)
+    with zipfile.ZipFile(xlsx_file) as workbook:
+        if rels_name not in workbook.namelist():
+            return {}
+        targets = [r.get('Target') for r in ElementTree.fromstring(workbook.read(rels_name)).findall('r:Relationship', ns)
+                   if r.get('Type').endswith('/comments')]
+        if not targets:
+            return {}
+        root = ElementTree.fromstring(workbook.read('xl/' + targets[0].replace('../', '')))
+    return {c.get('ref'): ''.join(t.text or '' for t in c.iter('{' + ns['x'] + '}t'))
+            for c in root.iter('{' + ns['x'] + '}comment')}
+
+
+class TestOrderList(unittest.TestCase):
+
+    class Blank(object):
+        '''An empty cell: not a number and equal to "".'''
+        def __gt__(self, other):
+            return False
+        def __eq__(self, other):
+            return other == ''
+        def __ne__(self, other):
+            return other != ''
+
+    def setUp(self):
+        # Purchased, not purchased and without catalogue code (nor 'manf#'), with a quantity.
+        self.parts = []
+        for refs, manf_code, part_num in [(['C1'], 'CAP-1', 'DK-CAP-1'), (['C2'], 'CAP-2', 'DK-CAP-2'),
+                                          (['R1'], 'RES-1', 'DK-RES-1'), (['U1'], None, None)]:
+            part = PartGroup()
+            part.refs = refs
+            part.fields = {'manf#': manf_code} if manf_code else {}
+            part.offers = {dist: DistributorOffer() for dist in distributor_dict}
+            if part_num:
+                part.offers['digikey'].part_num = part_num
+                part.offers['digikey'].price_tiers = {1: 0.1}
+            self.parts.append(part)
+        self.purchases = {'C1': 10, 'R1': 5, 'U1': 3}
+        self.cols = distributor_dict['digikey']['order']['cols']
+
+    def tearDown(self):
+        distributor_dict['digikey']['order']['cols'] = self.cols
+
+    def check(self, code_header, codes):
+        out_file = io.BytesIO()
+        output_modules['xlsx'].create_output(self.parts, [{'title': 'Test', 'company': '', 'date': ''}],
+                                             out_file, 'USD', True, True, [], ' ')
+        cells = read_xlsx(out_file)
+        # Column of a header (row 6), in the first columns, from `start`.
+        header = lambda text, start='A': min(ref[0] for ref, (_, value) in cells.items()
+                                             if value == text and ref[1:] == '6' and ref >= start)
+        dist_col = [ref for ref, (_, value) in cells.items() if value == 'Digi-Key'][0][0]
+        purch_col, code_col = header('Purch', dist_col), header(code_header)
+        order_col = chr(ord(dist_col) + 1)
+        rows = [7, 8, 9, 10] # Rows of the parts, the order list starts 3 rows below.
+        helper_range, helper_last = '${0}$13:${0}$16'.format(dist_col), '${}$16'.format(dist_col)
+        # Evaluate the helper column, with the purchased quantities typed by the user.
+        inputs = {purch_col + str(row): self.purchases[cells['A' + str(row)][1]]
+                  for row in rows if cells['A' + str(row)][1] in self.purchases}
+        functions = {'IF': lambda cond, a, b: a if cond else b, 'AND': lambda *args: all(args),
+                     'ISNUMBER': lambda v: isinstance(v, (int, float)), 'INT': int,
+                     'cell': lambda ref: inputs.get(ref, cells.get(ref, (None, None))[1] or self.Blank())}
+        helper = []
+        for k, row in enumerate(rows, 1):
+            index_func = 'IF(ISNUMBER({0}{1}),IF(AND({0}{1}>0,{2}{1}<>""),1,0.5),0.5)'.format(purch_col, row, code_col)
+            if k > 1:
+                index_func = 'INT({}{})+{}'.format(dist_col, row + 5, index_func)
+            formula, value = cells[dist_col + str(row + 6)]
+            self.assertEqual((formula, value), (index_func, '0.5'))
+            inputs[dist_col + str(row + 6)] = eval(re.sub(r'\$?([A-Z]+)\$?(\d+)', r'cell("\1\2")', formula)
+                                                   .replace('<>', '!='), functions)
+            helper.append(inputs[dist_col + str(row + 6)])
+            formula, value = cells[order_col + str(row + 6)]
+            self.assertEqual(value, None)
+            self.assertTrue(formula.startswith('IFERROR(IF({}>{},"",CONCATENATE('.format(k, helper_last)), formula)
+            self.assertIn('INDEX({0}7:{0}10,MATCH({1},{2},1))'.format(code_col, k, helper_range), formula)
+        # The k'th row of the order is the k'th part with code and quantity, by `MATCH()`.
+        self.assertEqual(helper, [1, 1.5, 2, 2.5])
+        ordered = [cells['{}{}'.format(code_col, rows[max(i for i, v in enumerate(helper) if v <= k)])][1]
+                   for k in range(1, len(rows) + 1) if k <= helper[-1]]
+        self.assertEqual(ordered, codes)
+
+    def test_part_num(self):
+        '''The order list by catalogue code.'''
+        self.check('Cat#', ['DK-CAP-1', 'DK-RES-1'])
+
+    def test_manf_code(self):
+        '''The order list by manufacturer code, in the global columns.'''
+        distributor_dict['digikey']['order']['cols'] = ['manf#', 'purch', 'refs']
+        self.check('Manf#', ['CAP-1', 'RES-1'])
+
+
+class TestPartDetails(unittest.TestCase):
+
+    NOT_STOCKED = 'This part is listed but is not normally stocked.'
+
+    def setUp(self):
+        # Not stocked with extra information, stocked and without offer.
+        self.parts = []
+        for refs, part_num, price_tiers, qty_avail in [(['C1', 'C2'], 'DK-CAP-1', {1: 0.1, 100: 0.05}, None),
+                                                       (['U1'], 'DK-IC-1', {1: 1.0}, 10), (['R1'], '', {}, None)]:
+            part = PartGroup()
+            part.refs = refs
+            part.fields = {'manf#': part_num[3:]}
+            part.offers = {dist: DistributorOffer() for dist in distributor_dict}
+            offer = part.offers['digikey']
+            offer.part_num, offer.price_tiers, offer.qty_avail = part_num, price_tiers, qty_avail
+            self.parts.append(part)
+        self.parts[0].offers['digikey'].info_dist = {'tolerance': '10%', 'stock_note': 'no'}
+
+    def create(self, part_details):
+        out_file = io.BytesIO()
+        create_spreadsheet(self.parts, [{'title': 'Test', 'company': '', 'date': ''}], out_file,
+                           user_fields=[], variant=' ', part_details=part_details)
+        with zipfile.ZipFile(out_file) as workbook:
+            root = ElementTree.fromstring(workbook.read('xl/workbook.xml'))
+        sheets = [s.get('name') for s in root.iter('{http://schemas.openxmlformats.org/spreadsheetml/2006/main}sheet')]
+        return out_file, sheets
+
+    def part_comments(self, out_file):
+        '''The comments of the part rows (7 to 9), not of the headers.'''
+        return {ref: text for ref, text in read_xlsx_comments(out_file).items()
+                if 7 <= int(re.sub('[A-Z]+', '', ref)) <= 9}
+
+    def test_comments(self):
+        '''By default, the price breaks and the not stocked note are comments.'''
+        out_file, sheets = self.create('comments')
+        self.assertEqual(len(sheets), 1)
+        comments = self.part_comments(out_file)
+        self.assertIn(self.NOT_STOCKED, comments.values())
+        self.assertIn('Tolerance: 10%', comments.values())
+        self.assertEqual(len([text for text in comments.values() if text.startswith('Qty/Price Breaks')]), 2)
+
+    def test_sheet(self):
+        '''The "Price Breaks" worksheet, in the rows of the parts of the pricing worksheet.'''
+        out_file, sheets = self.create('sheet')
+        self.assertEqual(sheets[1:], ['Price Breaks'])
+        self.assertEqual(self.part_comments(out_file), {})
+        cells, details = read_xlsx(out_file), read_xlsx(out_file, 2)
+        self.assertEqual([details['A' + str(row)][1] for row in range(6, 10)], ['Refs', 'C1,C2', 'R1', 'U1'])
+        self.assertEqual([details['A' + str(row)][1] for row in range(6, 10)],
+                         [cells['A' + str(row)][1] for row in range(6, 10)])
+        col = [ref for ref, (_, value) in details.items() if value == 'Digi-Key'][0][0]
+        info_col, price_col = col, chr(ord(col) + 1)
+        self.assertEqual((details[info_col + '6'][1], details[price_col + '6'][1]), ('Info', 'Price Breaks'))
+        # The not stocked note first, then the extra information shown.
+        self.assertEqual(details[info_col + '7'][1], self.NOT_STOCKED + '\nTolerance: 10%')
+        self.assertEqual(details[price_col + '7'][1], '1: $0.10\n100: $0.05')
+        self.assertNotIn(info_col + '8', details)
+        self.assertNotIn(price_col + '8', details)
+        self.assertNotIn(info_col + '9', details)
+        self.assertEqual(details[price_col + '9'][1], '1: $1.00')
+
+    def test_none(self):
+        '''Neither the comments nor the "Price Breaks" worksheet, the pricing is the same.'''
+        out_file, sheets = self.create('none')
+        self.assertEqual(len(sheets), 1)
+        self.assertEqual(self.part_comments(out_file), {})
+        cells, cells_comments = read_xlsx(out_file), read_xlsx(self.create('comments')[0])
+        del cells['B4'], cells_comments['B4'] # Date of the currency rates, now.
+        self.assertEqual(cells, cells_comments)
+
+
+class TestWriteRows(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        # Two projects, with pricing, not stocked and without offer.
+        self.parts = []
+        for refs, manf_code, qty, part_num, price_tiers, qty_avail in [
+                (['prj0:C1', 'prj1:C1', 'prj1:C2'], 'CAP-1', [1, 2], 'DK-CAP-1', {1: 0.1, 100: 0.05}, None),
+                (['prj0:U1'], 'IC-1', [1, 0], 'DK-IC-1', {1: 1.0}, 10), (['prj1:R1'], None, [0, 1], '', {}, None)]:
+            part = PartGroup()
+            part.refs = refs
+            part.fields = {'manf#_qty': qty, 'manf#': manf_code} if manf_code else {'manf#_qty': qty}
+            part.offers = {dist: DistributorOffer() for dist in distributor_dict}
+            offer = part.offers['digikey']
+            offer.part_num, offer.price_tiers, offer.qty_avail = part_num, price_tiers, qty_avail
+            self.parts.append(part)
+        self.parts[0].offers['digikey'].info_dist = {'tolerance': '10%'}
+        self.prj_info = [{'title': 'First', 'company': 'XESS', 'date': '2019-06-01'},
+                         {'title': 'Second', 'company': 'XESS', 'date': '2019-06-02'}]
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def create(self, name, part_details, workbook_class=None):
+        out_filename = os.path.join(self.work_dir, name)
+        create_spreadsheet(self.parts, self.prj_info, out_filename, user_fields=[], variant=' ',
+                           part_details=part_details, workbook_class=workbook_class)
+        cells = read_xlsx(out_filename)
+        row = [ref for ref, (_, value) in cells.items() if value == '$ date:'][0][1:]
+        del cells['B' + row] # Date of the currency rates, now.
+        return cells, read_xlsx_comments(out_filename), read_xlsx(out_filename, 2) if part_details == 'sheet' else {}
+
+    def test_constant_memory(self):
+        '''The cells written in row order to a `constant_memory` workbook are the ones of a normal workbook.'''
+        for part_details in ['comments', 'sheet']:
+            cells, comments, details = self.create('constant.xlsx', part_details)
+            self.assertEqual((cells, comments, details),
+                             self.create('normal.xlsx', part_details, lambda name, options: xlsxwriter.Workbook(name)))
+            # The project rows, the formulas and the comments are there.
+            self.assertEqual(cells['I2'], ('TotalCost0/BoardQty0', '1.05'))
+            self.assertEqual(cells['I5'], ('TotalCost1/BoardQty1', '0.1'))
+            self.assertTrue(len([formula for formula, _ in cells.values() if formula]) > 50)
+            self.assertEqual('This part is listed but is not normally stocked.' in comments.values(),
+                             part_details == 'comments')
+            self.assertEqual(bool(details), part_details == 'sheet')
+
+
+class TestOutputs(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.parts = []
+        for refs, manf_code in [(['C2', 'C1'], 'CAP-1'), (['U1'], 'IC-1')]:
+            part = PartGroup()
+            part.refs = refs
+            part.fields = {'manf#': manf_code, 'value': manf_code.lower()}
+            part.offers = {dist: DistributorOffer() for dist in distributor_dict}
+            self.parts.append(part)
+        offer = self.parts[0].offers['digikey']
+        offer.part_num = 'DK-CAP-1'
+        offer.price_tiers = {1: 0.1, 100: 0.05}
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def create(self, out_format):
+        out_filename = os.path.join(self.work_dir, 'bom' + output_modules[out_format].EXTENSION)
+        output_modules[out_format].create_output(self.parts, [], out_filename)
+        return out_filename
+
+    def test_jsonl(self):
+        '''A line by part, with its offers.'''
+        with open(self.create('jsonl')) as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual([r['refs'] for r in records], ['C1,C2', 'U1'])
+        self.assertEqual(records[0]['qty'], 200)
+        self.assertEqual(records[0]['ext_price'], 10.0)
+        self.assertEqual(records[0]['offers'][0]['price_tiers'], [[1, 0.1], [100, 0.05]])
+        self.assertEqual(records[1]['offers'], [])
+
+    def test_csv(self):
+        '''A row by offer and a row for the parts without offers.'''
+        with open(self.create('csv')) as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual([(r['refs'], r['dist_part_num']) for r in rows], [('C1,C2', 'DK-CAP-1'), ('U1', '')])
+        self.assertEqual(rows[0]['dist_price_tiers'], '1:0.1;100:0.05')
+        self.assertEqual(float(rows[0]['dist_unit_price']), 0.05)
+
+    @unittest.skipUnless(pyarrow, 'pyarrow not installed')
+    def test_parquet(self):
+        '''The rows of the CSV report, with typed columns, in row groups.'''
+        batch_rows = out_parquet.BATCH_ROWS
+        out_parquet.BATCH_ROWS = 1
+        try:
+            parquet_file = pyarrow.parquet.ParquetFile(self.create('parquet'))
+        finally:
+            out_parquet.BATCH_ROWS = batch_rows
+        self.assertEqual(parquet_file.metadata.num_row_groups, 2)
+        table = parquet_file.read()
+        self.assertEqual(table.schema.names[:6], ['refs', 'value', 'desc', 'footprint', 'manf', 'manf#'])
+        for column, column_type in [('refs', 'string'), ('qty', 'int64'), ('ext_price', 'double'),
+                                    ('dist_qty_avail', 'int64'), ('dist_unit_price', 'double')]:
+            self.assertEqual(str(table.schema.field(column).type), column_type)
+        rows = table.to_pylist()
+        self.assertEqual([(r['refs'], r['dist_part_num']) for r in rows], [('C1,C2', 'DK-CAP-1'), ('U1', None)])
+        self.assertEqual((rows[0]['qty'], rows[0]['ext_price'], rows[0]['dist_unit_price']), (200, 10.0, 0.05))
+        self.assertEqual(rows[0]['dist_price_tiers'], '1:0.1;100:0.05')
+
+    def test_ods(self):
+        '''The spreadsheet, with the formulas translated to OpenFormula.'''
+        self.assertEqual(ods_formula('=iferror(lookup(A1,{0,1},{0.0,2.5}),"a,b")'),
+                         'IFERROR(LOOKUP([.A1];{0;1};{0.0;2.5});"a,b")')
+        self.assertEqual(ods_formula('=SUM($B$2:B9)*BoardQty1'), 'SUM([.$B$2:.B9])*BoardQty1')
+        out_filename = os.path.join(self.work_dir, 'bom.ods')
+        prj_info = [{'title': 'Test', 'company': 'XESS', 'date': '2019-06-01'}]
+        output_modules['ods'].create_output(self.parts, prj_info, out_filename, 'USD', True, True, [], ' ')
+        with zipfile.ZipFile(out_filename) as ods:
+            self.assertEqual(ods.namelist()[0], 'mimetype')
+            self.assertEqual(ods.read('mimetype'), b'application/vnd.oasis.opendocument.spreadsheet')
+            content = ods.read('content.xml').decode('utf-8')
+        self.assertIn('<table:table table:name="bom. ">', content)
+        self.assertIn('table:name="BoardQty"', content)
+        self.assertIn('table:formula="of:=TotalCost/BoardQty"', content)
+        self.assertIn('DK-CAP-1', content)
+
+    @unittest.skipUnless(SOFFICE, 'LibreOffice not installed')
+    def test_ods_libreoffice(self):
+        '''The spreadsheet opened by LibreOffice, with its formulas, conditional formats and styles.'''
+        out_filename = os.path.join(self.work_dir, 'bom.ods')
+        prj_info = [{'title': 'Test', 'company': 'XESS', 'date': '2019-06-01'}]
+        output_modules['ods'].create_output(self.parts, prj_info, out_filename, 'USD', True, True, [], ' ')
+        with zipfile.ZipFile(out_filename) as ods:
+            conditions = ods.read('content.xml').decode('utf-8').count('<calcext:condition ')
+        # Convert to a flat ODS, with the styles and content as LibreOffice read them,
+        # and to CSV, with the values recalculated (the file is from another generator).
+        for out_format in ['fods', 'csv']:
+            subprocess.check_call([SOFFICE, '--headless', '--norestore',
+                                   '-env:UserInstallation=file://' + os.path.join(self.work_dir, 'profile'),
+                                   '--convert-to', out_format, '--outdir', self.work_dir, out_filename])
+        root = ElementTree.parse(os.path.join(self.work_dir, 'bom.fods')).getroot()
+        ns = {'table': 'urn:oasis:names:tc:opendocument:xmlns:table:1.0',
+              'style': 'urn:oasis:names:tc:opendocument:xmlns:style:1.0',
+              'calcext': 'urn:org:documentfoundation:names:experimental:calc:xmlns:calcext:1.0'}
+        attr = lambda prefix, name: '{' + ns[prefix] + '}' + name
+        styles = set(s.get(attr('style', 'name')) for s in root.iter(attr('style', 'style')))
+        applied = [c.get(attr('calcext', 'apply-style-name')) for c in root.iter(attr('calcext', 'condition'))]
+        self.assertEqual(len(applied), conditions)
+        self.assertTrue(applied and set(applied) <= styles)
+        for c in root.iter(attr('calcext', 'condition')):
+            self.assertNotIn('Err:', c.get(attr('calcext', 'value')))
+        formulas = [c.get(attr('table', 'formula')) for c in root.iter(attr('table', 'table-cell'))
+                    if c.get(attr('table', 'formula'))]
+        self.assertIn('of:=TotalCost/BoardQty', formulas)
+        with io.open(os.path.join(self.work_dir, 'bom.csv'), encoding='utf-8') as f:
+            rows = list(csv.reader(f))
+        for row in rows:
+            for value in row:
+                self.assertFalse(value.startswith(('Err:', '#NAME?', '#REF!', '#VALUE!')), value)
+        self.assertIn('0.10', [row[row.index('Unit Cost:') + 1] for row in rows if 'Unit Cost:' in row][0])
+
+    def test_file_object(self):
+        '''Outputs written to binary file objects, that are left open.'''
+        prj_info = [{'title': 'Test', 'company': 'XESS', 'date': '2019-06-01'}]
+        for out_format in ['xlsx', 'ods']:
+            out_file = io.BytesIO()
+            output_modules[out_format].create_output(self.parts, prj_info, out_file, 'USD', True, True, [], ' ')
+            with zipfile.ZipFile(out_file) as workbook:
+                content = workbook.read('xl/workbook.xml' if out_format == 'xlsx' else 'content.xml')
+            self.assertIn(b'KiCost. ', content)
+        out_file = io.BytesIO()
+        output_modules['csv'].create_output(self.parts, prj_info, out_file)
+        self.assertFalse(out_file.closed)
+        self.assertTrue(out_file.getvalue().startswith(b'refs,'))
+
+    def test_concurrent(self):
+        '''Spreadsheets created at the same time by threads don't share their state.'''
+        rates_file = os.path.join(self.work_dir, 'eurofxref.csv')
+        with open(rates_file, 'w') as f:
+            f.write('Date, USD, BRL, \n1 June 2019, 1.25, 5.0, \n')
+        environ = dict(os.environ)
+        os.environ['KICOST_CURRENCY_RATES'] = rates_file
+        currency_rates.RATES = None
+        prj_info = [{'title': 'Test', 'company': 'XESS', 'date': '2019-06-01'}]
+        jobs = [('first-{}.xlsx'.format(i), currency) for i in range(4) for currency in ['USD', 'EUR', 'BRL']]
+        def create(job):
+            out_file = io.BytesIO()
+            out_file.name, currency = job
+            output_modules['xlsx'].create_output(copy.deepcopy(self.parts), prj_info, out_file,
+                                                 currency, True, True, [], ' ')
+            with zipfile.ZipFile(out_file) as workbook:
+                return [workbook.read(f) for f in ['xl/workbook.xml', 'xl/styles.xml']]
+        try:
+            serial = [create(job) for job in jobs]
+            results = {}
+            threads = [threading.Thread(target=lambda i=i: results.update({i: create(jobs[i])}))
+                       for i in range(len(jobs))]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        finally:
+            os.environ.clear()
+            os.environ.update(environ)
+            currency_rates.RATES = None
+        self.assertEqual([results.get(i) for i in range(len(jobs))], serial)
+        self.assertIn(b"'first-3. '!", serial[-1][0])
+        self.assertIn(b'R$', serial[-1][1])
+
+class TestBomCache(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.environ = dict(os.environ)
+        os.environ['KICOST_CACHE_DIR'] = os.path.join(self.work_dir, 'cache')
+
+    def tearDown(self):
+        os.environ.clear()
+        os.environ.update(self.environ)
+        shutil.rmtree(self.work_dir)
+
+    def test_same_content(self):
+        '''Files with the same content don't share the project information.'''
+        for name in ['first.csv', 'second.csv']:
+            shutil.copy(os.path.join(TESTS_DIR, 'part_list_small.csv'), os.path.join(self.work_dir, name))
+        for name in ['first.csv', 'second.csv', 'first.csv']:
+            parts, prj_info = read_bom((os.path.join(self.work_dir, name), 'csv', [], ' ', True))
+            self.assertEqual(prj_info['title'], name)
+        self.assertEqual(len(os.listdir(os.path.join(self.work_dir, 'cache'))), 2)
+
+    def test_multi_boms(self):
+        '''The BOM files read in a pool of processes give the parts of the serial read, in the input order.'''
+        in_file = []
+        for name, bom in [('a.csv', 'R1,10k,RC-10K\nR2,10k,RC-10K\nU1,IC,IC-1\n'),
+                          ('b.csv', 'R1,1k,RC-1K\nC1,100n,2:CAP-1\n'), ('c.csv', 'J1,CON,CON-1\nR1,10k,RC-10K\n')]:
+            in_file.append(os.path.join(self.work_dir, name))
+            with open(in_file[-1], 'w') as f:
+                f.write('Refs,Value,manf#\n' + bom)
+        args = (in_file, ['csv'] * 3, [], [' '] * 3)
+        parts, prj_info = read_boms(*args, use_cache=False, num_processes=1)
+        self.assertEqual([(ref, fields['manf#_qty']) for ref, fields in parts.items()],
+                         [('prj0:R1', [1, 0, 0]), ('prj0:R2', [1, 0, 0]), ('prj0:U1', [1, 0, 0]),
+                          ('prj1:R1', [0, 1, 0]), ('prj1:C1', [0, 2, 0]),
+                          ('prj2:J1', [0, 0, 1]), ('prj2:R1', [0, 0, 1])])
+        self.assertEqual([info['title'] for info in prj_info], ['a.csv', 'b.csv', 'c.csv'])
+        for use_cache in [False, True, True]: # Also from the cache, filled by the processes.
+            pool_parts, pool_prj_info = read_boms(*args, use_cache=use_cache, num_processes=3)
+            self.assertEqual(list(pool_parts.items()), list(parts.items()))
+            self.assertEqual(pool_prj_info, prj_info)
+
+    def test_failed_save(self):
+        '''A failed save doesn't leave a temporary file behind.'''
+        file_name = os.path.join(self.work_dir, 'cache', 'entry.pkl')
+        self.assertFalse(cache_file_save(file_name, lambda: None)) # Not picklable.
+        self.assertEqual(os.listdir(os.path.join(self.work_dir, 'cache')), [])
+        self.assertTrue(cache_file_save(file_name, [1]))
+        self.assertEqual(cache_file_load(file_name), [1])
+
+class TestIncremental(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.environ = dict(os.environ)
+        os.environ['KICOST_CACHE_DIR'] = os.path.join(self.work_dir, 'cache')
+
+    def tearDown(self):
+        os.environ.clear()
+        os.environ.update(self.environ)
+        init_distributor_dict() # Emptied by `dist_list=None`.
+        shutil.rmtree(self.work_dir)
+
+    def run_kicost(self, bom, out_name, incremental):
+        in_file = os.path.join(self.work_dir, 'bom.csv')
+        with open(in_file, 'w') as f:
+            f.write('Refs,Value,manf#\n' + ''.join(','.join(c) + '\n' for c in bom))
+        out_filename = os.path.join(self.work_dir, out_name + '.xlsx')
+        kicost.kicost(in_file=[in_file], eda_name=['csv'], out_filename=out_filename, user_fields=[],
+                      ignore_fields=[], group_fields=[], translate_fields=None, variant=[' '],
+                      dist_list=None, num_processes=1, use_cache=False, incremental=incremental,
+                      out_formats=['jsonl'])
+        with open(os.path.join(self.work_dir, out_name + '.jsonl')) as f:
+            return f.read()
+
+    def test_same_as_full(self):
+        '''An incremental run gives the same parts of a full run, after components are added, removed and edited.'''
+        bom = [('R1', '10k', 'RC-10K'), ('R2', '10k', 'RC-10K'), ('R3', '1k', 'RC-1K'),
+               ('C1', '100n', 'CAP-100N'), ('C2', '100n', 'CAP-100N'), ('U1', 'IC', 'IC-1')]
+        self.run_kicost(bom, 'incremental', True)
+        bom = [('R1', '10k', 'RC-10K'), ('R2', '10k', 'RC-10K'), ('R4', '10k', 'RC-10K'), # R3 removed, R4 added.
+               ('C1', '100n', 'CAP-100N'), ('C2', '10n', 'CAP-10N'), # C2 edited.
+               ('U1', 'IC', 'IC-1'), ('D1', 'LED', 'LED-1')] # New group.
+        incremental = self.run_kicost(bom, 'incremental', True)
+        self.assertIn('"R1,R2,R4"', incremental)
+        self.assertEqual(incremental, self.run_kicost(bom, 'full', False))
+
+    def test_pricing_restore(self):
+        '''The restored offers are copies and the old data is not reused.'''
+        part = PartGroup()
+        part.datasheet, part.lifecycle = 'ds.pdf', 'active'
+        part.offers = {'digikey': DistributorOffer()}
+        part.offers['digikey'].price_tiers = {1: 0.1}
+        pricing = pricing_save(part, distributor_dict)
+        self.assertFalse(pricing_expired(pricing))
+        restored = []
+        for _ in range(2):
+            restored.append(PartGroup())
+            restored[-1].offers = {}
+            pricing_restore(restored[-1], pricing)
+        restored[0].offers['digikey'].price_tiers[1] = 0.2
+        self.assertEqual(restored[1].offers['digikey'].price_tiers, {1: 0.1})
+        self.assertEqual(part.offers['digikey'].price_tiers, {1: 0.1})
+        self.assertEqual(restored[1].datasheet, 'ds.pdf')
+        pricing['time'] -= 2 * 24 * 3600
+        self.assertTrue(pricing_expired(pricing))
+
+class TestCurrencyRates(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.environ = dict(os.environ)
+        currency_rates.RATES = None
+
+    def tearDown(self):
+        os.environ.clear()
+        os.environ.update(self.environ)
+        currency_rates.RATES = None
+        shutil.rmtree(self.work_dir)
+
+    def test_pinned_file(self):
+        '''Rates loaded only to convert, from the pinned file.'''
+        rates_file = os.path.join(self.work_dir, 'eurofxref.csv')
+        with open(rates_file, 'w') as f:
+            f.write('Date, USD, JPY, BRL, \n1 June 2019, 1.25, N/A, 5.0, \n')
+        os.environ['KICOST_CURRENCY_RATES'] = rates_file
+        self.assertEqual(currency_rates.currency_convert(2, 'USD', 'USD'), 2.0)
+        self.assertIsNone(currency_rates.RATES)
+        self.assertEqual(currency_rates.currency_convert(2, 'EUR', 'USD'), 2.5)
+        self.assertEqual(currency_rates.currency_convert(5, 'BRL', 'USD'), 1.25)
+        self.assertRaises(ValueError, currency_rates.currency_convert, 1, 'JPY', 'USD')
+
+    def test_download_failed(self):
+        '''Without download, the package or the old cached rates are used, and not cached as new.'''
+        os.environ.pop('KICOST_CURRENCY_RATES', None)
+        os.environ['KICOST_CACHE_DIR'] = self.work_dir
+        ecb_url = currency_rates.ECB_URL
+        currency_rates.ECB_URL = 'http://127.0.0.1:1/eurofxref.zip' # Nothing listening.
+        try:
+            self.assertEqual(currency_rates.get_rates(), currency_rates.package_rates())
+            self.assertEqual(os.listdir(self.work_dir), [])
+            cache_file = os.path.join(self.work_dir, currency_rates.RATES_CACHE_FILE)
+            cache_file_save(cache_file, {'time': 0, 'rates': {'EUR': 1.0, 'USD': 1.5}})
+            currency_rates.RATES = None
+            self.assertEqual(currency_rates.currency_convert(2, 'EUR', 'USD'), 3.0)
+            self.assertEqual(cache_file_load(cache_file)['time'], 0)
+        finally:
+            currency_rates.ECB_URL = ecb_url
+
 if __name__ == '__main__':
     unittest.main()